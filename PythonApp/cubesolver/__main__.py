@@ -1,20 +1,64 @@
 """
 __main__.py
 Launch script intended to start the application
+
+Without arguments the interactive menu is started. python3 cubesolver solve-batch
+solves a file of cubes instead, see src/solve_batch.py
 """
 
 __author__ = "Tyler Limbach"
 
+import argparse
 import os
 import sys
 
 
+def parse_args(argv=None):
+    """ read the command line
+
+    :param argv: list of arguments, sys.argv[1:] if None
+    :return: argparse.Namespace, command is None for the menu
+    """
+    parser = argparse.ArgumentParser(prog="cubesolver", description="Rubik's cube simulator and solver")
+    commands = parser.add_subparsers(dest="command")
+    batch = commands.add_parser("solve-batch", help="solve cubes from a file or stdin, one JSON line per cube")
+    batch.add_argument("input", nargs="?", default="-",
+                       help="file with one scramble or 54 digit state per line (default: stdin)")
+    batch.add_argument("-o", "--output", default="-", help="file to write the JSON lines to (default: stdout)")
+    batch.add_argument("-m", "--method", choices=("cfop", "kociemba"), default="cfop")
+    batch.add_argument("-w", "--workers", type=int, default=None,
+                       help="number of worker processes (default: one per CPU)")
+    batch.add_argument("--unordered", action="store_true",
+                       help="write results as soon as they are ready instead of in input order")
+    batch.add_argument("--window", type=int, default=None,
+                       help="maximum number of cubes in flight (default: 4 per worker)")
+    batch.add_argument("--target-length", type=int, default=21, help="kociemba: good enough solution length")
+    batch.add_argument("--time-budget", type=float, default=1.0, help="kociemba: seconds per cube")
+    batch.add_argument("--color-neutral", action="store_true",
+                       help="cfop: build the cross on the best of the six faces")
+    batch.add_argument("--f2l", choices=("search", "table", "cheapest"), default="cheapest",
+                       help="cfop: insert F2L pairs by search or by case table lookup (default: cheapest)")
+    batch.add_argument("--time-limit", type=float, default=None,
+                       help="seconds per cube: return the best solution found by then, improving the first one")
+    batch.add_argument("--cache", action="store_true",
+                       help="reuse the cached solutions of cubes symmetric to ones solved before")
+    return parser.parse_args(argv)
+
+
 def main():
     """ Main function to start app
     """
+    args = parse_args()
+
     # set the script path
     sys.path.append(os.path.dirname(__file__))
 
+    if args.command == "solve-batch":
+        from src.solve_batch import run
+
+        sys.exit(run(args.input, args.output, args.method, args.workers, not args.unordered, args.window,
+                     args.target_length, args.time_budget, args.color_neutral, args.f2l, args.cache, args.time_limit))
+
     from src.menu import menu_loop
 
     menu_loop()
@@ -372,3 +372,16 @@ ACTIONS_3x3 = {"R": turn_r, "R'": turn_ri, "L": turn_l, "L'": turn_li, "U": turn
            "r2": turn_rw2, "l2": turn_lw2, "u2": turn_uw2, "d2": turn_dw2, "f2": turn_fw2,
            "b2": turn_bw2, "x2": rot_x2, "y2": rot_y2, "z2": rot_z2}
 
+
+
+# composite actions expressed as the base actions their functions above perform in order.
+# the flat engine (facelet.py) compiles these into a single permutation table
+COMPOSITE_ACTIONS_3x3 = {"R2": ("R", "R"), "L2": ("L", "L"), "U2": ("U", "U"), "D2": ("D", "D"),
+                         "F2": ("F", "F"), "B2": ("B", "B"), "M2": ("M", "M"), "E2": ("E", "E"),
+                         "S2": ("S", "S"), "r": ("R", "M'"), "r'": ("R'", "M"), "l": ("L", "M"),
+                         "l'": ("L'", "M'"), "u": ("U", "E'"), "u'": ("U'", "E"), "d": ("D", "E"),
+                         "d'": ("D'", "E'"), "f": ("F", "S"), "f'": ("F'", "S'"), "b": ("B", "S'"),
+                         "b'": ("B'", "S"), "r2": ("r", "r"), "l2": ("l", "l"), "u2": ("u", "u"),
+                         "d2": ("d", "d"), "f2": ("f", "f"), "b2": ("b", "b"), "x": ("r", "L'"),
+                         "x'": ("r'", "L"), "y": ("u", "D'"), "y'": ("u'", "D"), "z": ("f", "B'"),
+                         "z'": ("f'", "B"), "x2": ("x", "x"), "y2": ("y", "y"), "z2": ("z", "z")}
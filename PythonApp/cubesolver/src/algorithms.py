@@ -0,0 +1,222 @@
+"""
+algorithms.py
+Module for loading the algorithm sets (F2L, OLL, PLL, ...) shipped in src/resources
+
+Algorithm files hold one algorithm per line in 3x3 notation. They are read through
+importlib.resources, so they are found wherever the package is installed and whatever
+the working directory, and each set is parsed once per process, on first use. Extra
+sets (COLL, ZBLL, ...) are registered by name and cost nothing until they are used.
+
+A loaded set holds the moves of every algorithm and its composed facelet permutation
+(see facelet.py). Both can be kept in a compiled pack, a binary file in the table cache
+(see tables.py) that is memory-mapped instead of parsed and composed again:
+
+    header    "<4sHII": magic, version, checksum of the source text and actions, count
+    offsets   count + 1 unsigned ints, start of each algorithm in the moves block
+    perms     count * 54 bytes, the permutation of each algorithm
+    moves     one byte per move, the index of the action in ACTIONS_3x3
+"""
+from array import array
+from importlib import resources
+import mmap
+import os
+import struct
+import zlib
+
+from .actions import ACTIONS_3x3
+from .facelet import N_FACELETS
+from .facelet import compile_sequence
+from .tables import table_path
+from .tables import write_atomic
+
+ACTION_NAMES = tuple(ACTIONS_3x3)
+ACTION_INDEX = {action: i for i, action in enumerate(ACTION_NAMES)}
+
+PACK_MAGIC = b"CSAL"
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct("<4sHII")
+
+# set name -> file name in src/resources, or the path of a file outside the package
+ALGORITHM_FILES = {"oll": "oll.txt", "pll": "pll.txt", "f2l": "f2l.txt"}
+
+_sets = {}
+
+
+class AlgorithmSet:
+    """ the algorithms of one set, indexable like a list of move tuples
+
+    moves and permutations are decoded from the underlying buffer when accessed, so a set
+    backed by a memory-mapped pack only reads the pages it uses
+    """
+
+    def __init__(self, name, offsets, perms, moves):
+        """
+        :param name: name of the set
+        :param offsets: sequence of len + 1 ints, algorithm i is moves[offsets[i]:offsets[i + 1]]
+        :param perms: buffer of len * 54 bytes, the permutation of each algorithm
+        :param moves: buffer of action indices (see ACTION_NAMES)
+        """
+        self.name = name
+        self.offsets = offsets
+        self.perms = perms
+        self.moves = moves
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        """ :return: the moves of algorithm i as a tuple of actions
+        """
+        if not 0 <= i < len(self):
+            raise IndexError("algorithm index out of range")
+        return tuple(ACTION_NAMES[m] for m in self.moves[self.offsets[i]:self.offsets[i + 1]])
+
+    def permutation(self, i):
+        """ :return: the facelet permutation of algorithm i, new[j] == old[perm[j]]
+        """
+        return bytes(self.perms[i * N_FACELETS:(i + 1) * N_FACELETS])
+
+    @classmethod
+    def from_text(cls, name, text):
+        """ parse and compile an algorithm file
+
+        :param name: name of the set
+        :param text: one algorithm per line, blank lines are skipped
+        :return: an AlgorithmSet held in memory
+        :raises ValueError: if a line has an unknown move
+        """
+        offsets = array('I', [0])
+        perms = bytearray()
+        moves = bytearray()
+        for number, line in enumerate(text.splitlines(), 1):
+            alg = line.split()
+            if not alg:
+                continue
+            unknown = [move for move in alg if move not in ACTION_INDEX]
+            if unknown:
+                raise ValueError("%s line %d: unknown moves %s" % (name, number, " ".join(unknown)))
+            moves.extend(ACTION_INDEX[move] for move in alg)
+            offsets.append(len(moves))
+            perms.extend(compile_sequence(alg))
+        return cls(name, offsets, bytes(perms), bytes(moves))
+
+    def to_pack(self, checksum):
+        """ :return: the bytes of a compiled pack holding this set, see the module docstring
+        """
+        offsets = array('I', self.offsets)
+        return b"".join((PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, checksum, len(self)),
+                         offsets.tobytes(), bytes(self.perms), bytes(self.moves)))
+
+    @classmethod
+    def from_pack(cls, name, data, checksum):
+        """ read a compiled pack without copying it
+
+        :param name: name of the set
+        :param data: the pack, bytes or a memory map
+        :param checksum: expected checksum, see source_checksum
+        :return: an AlgorithmSet backed by data
+        :raises ValueError: if the pack is damaged or was compiled from another source
+        """
+        if len(data) < PACK_HEADER.size:
+            raise ValueError("pack of %s is truncated" % name)
+        magic, version, pack_checksum, count = PACK_HEADER.unpack_from(data)
+        if magic != PACK_MAGIC or version != PACK_VERSION or pack_checksum != checksum:
+            raise ValueError("pack of %s is stale or not an algorithm pack" % name)
+        view = memoryview(data)
+        start = PACK_HEADER.size
+        offsets = view[start:start + (count + 1) * 4].cast('I')
+        start += (count + 1) * 4
+        perms = view[start:start + count * N_FACELETS]
+        start += count * N_FACELETS
+        moves = view[start:]
+        if len(offsets) != count + 1 or len(moves) != offsets[count]:
+            raise ValueError("pack of %s is truncated" % name)
+        return cls(name, offsets, perms, moves)
+
+
+def register_algorithm_set(name, source):
+    """ make an extra algorithm set available to algorithm_set, nothing is read yet
+
+    :param name: name of the set, such as "coll"
+    :param source: file name in src/resources, or the path of an algorithm file
+    """
+    ALGORITHM_FILES[name] = source
+    _sets.pop(name, None)
+
+
+def read_source(name):
+    """ :return: the text of the algorithm file of a set
+    :raises KeyError: if no set of that name is registered
+    :raises OSError: if the file can not be read
+    """
+    source = ALGORITHM_FILES[name]
+    if os.path.dirname(source):
+        with open(source, 'r') as f:
+            return f.read()
+    return (resources.files(__package__) / "resources" / source).read_text()
+
+
+def source_checksum(text):
+    """ :return: checksum of an algorithm file and the action table its moves are numbered by
+    """
+    return zlib.crc32(" ".join(ACTION_NAMES).encode(), zlib.crc32(text.encode()))
+
+
+def pack_name(name):
+    """ :return: the file name of the compiled pack of a set in the table cache
+    """
+    return "algs_%s_v%d.pack" % (name, PACK_VERSION)
+
+
+def load_pack(name, checksum):
+    """ memory-map the compiled pack of a set
+
+    :return: an AlgorithmSet backed by the mapped file
+    :raises OSError: if there is no pack
+    :raises ValueError: if the pack is damaged or stale
+    """
+    with open(table_path(pack_name(name)), 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            raise ValueError("pack of %s is empty" % name)
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return AlgorithmSet.from_pack(name, data, checksum)
+
+
+def compile_pack(name):
+    """ parse a set and write its compiled pack to the table cache
+
+    :return: the AlgorithmSet that was written
+    """
+    text = read_source(name)
+    compiled = AlgorithmSet.from_text(name, text)
+    write_atomic(table_path(pack_name(name)), compiled.to_pack(source_checksum(text)))
+    return compiled
+
+
+def algorithm_set(name, use_pack=True):
+    """ the algorithms of a set, loaded once per process
+
+    with use_pack the compiled pack is memory-mapped, and compiled first if it is missing
+    or older than the algorithm file. without it the file is parsed
+
+    :param name: "oll", "pll" or a set added with register_algorithm_set
+    :param use_pack: read the set from its compiled pack
+    :return: an AlgorithmSet
+    :raises KeyError: if no set of that name is registered
+    :raises OSError: if the algorithm file can not be read
+    """
+    if name in _sets:
+        return _sets[name]
+    text = read_source(name)
+    if use_pack:
+        try:
+            loaded = load_pack(name, source_checksum(text))
+        except (OSError, ValueError):
+            try:
+                loaded = compile_pack(name)
+            except OSError:  # read only cache directory, keep the set in memory
+                loaded = AlgorithmSet.from_text(name, text)
+    else:
+        loaded = AlgorithmSet.from_text(name, text)
+    _sets[name] = loaded
+    return loaded
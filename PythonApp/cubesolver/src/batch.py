@@ -0,0 +1,294 @@
+"""
+batch.py
+Module for simulating many cubes at once with NumPy
+
+A BatchCube holds N flat facelet vectors (see facelet.py) as one (N, 54) uint8
+array. Actions are applied to every cube with one vectorized gather through the
+same permutation tables as the single cube engines, either the same action for
+the whole batch or a different action per row.
+
+NumPy is optional for the rest of the application, it is only needed here.
+"""
+from .actions import ACTIONS_3x3
+from . import facelet
+from .masks import BOTTOM
+from .masks import CROSS_EDGES
+from .masks import F2L_SLOTS
+from .masks import OLL_STICKERS
+from .masks import SIDE_BOTTOM_CORNERS
+from .masks import TOP_CORNERS
+from .masks import TOP_EDGES
+from . import symmetry
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - depends on the environment
+    np = None
+
+# row i of the permutation array is the table of ACTION_NAMES[i]
+ACTION_NAMES = tuple(ACTIONS_3x3)
+ACTION_INDEX = {action: i for i, action in enumerate(ACTION_NAMES)}
+FACE_TURNS = ("U", "U'", "R", "R'", "L", "L'", "D", "D'", "F", "F'", "B", "B'")
+
+CENTERS = tuple(facelet.facelet_index(face, 1, 1) for face in range(6))
+
+_arrays = {}
+
+
+def require_numpy():
+    """ :raises ImportError: if NumPy is not installed
+    """
+    if np is None:
+        raise ImportError("the batched cube engine needs NumPy, install it with: pip install numpy")
+
+
+def permutation_array():
+    """ get all permutation tables as one array, built on first use
+
+    :return: (len(ACTION_NAMES), 54) intp array, row i is the table of ACTION_NAMES[i]
+    """
+    require_numpy()
+    if "perms" not in _arrays:
+        _arrays["perms"] = np.array([facelet.PERMUTATIONS[action] for action in ACTION_NAMES], dtype=np.intp)
+        face_of = np.arange(facelet.N_FACELETS) // 9
+        _arrays["centers"] = np.array(CENTERS, dtype=np.intp)[face_of]
+        _arrays["oll"] = np.array(OLL_STICKERS, dtype=np.intp)
+        # sticker groups of the CFOP heuristics, solved when every sticker matches its center
+        _arrays["cross"] = np.array([(edge, down) for edge, _, down in CROSS_EDGES], dtype=np.intp)
+        _arrays["slots"] = np.array([(corner,) + tuple(sticker for sticker, _ in stickers)
+                                     for corner, stickers in F2L_SLOTS], dtype=np.intp)
+        for name, stickers in (("top edges", TOP_EDGES), ("top corners", TOP_CORNERS),
+                               ("side bottom corners", SIDE_BOTTOM_CORNERS)):
+            _arrays[name] = np.array(stickers, dtype=np.intp)
+        _arrays["symmetries"] = np.array(symmetry.SYMMETRY_PERMUTATIONS, dtype=np.intp)
+        _arrays["recolor"] = np.array([list(table) for table in symmetry.RECOLOR], dtype=np.uint8)
+        _arrays["solved centers"] = np.frombuffer(symmetry.SOLVED_CENTERS, dtype=np.uint8)
+    return _arrays["perms"]
+
+
+def action_indices(actions):
+    """ convert actions to rows of permutation_array
+
+    :param actions: a sequence of actions in 3x3 Rubiks notation
+    :return: intp array of action indices
+    """
+    require_numpy()
+    return np.array([ACTION_INDEX[action] for action in actions], dtype=np.intp)
+
+
+class BatchCube:
+    """ N cubes stored as an (N, 54) uint8 array of flat facelet vectors
+    """
+
+    def __init__(self, states):
+        require_numpy()
+        permutation_array()
+        self.states = np.ascontiguousarray(states, dtype=np.uint8)
+
+    @classmethod
+    def from_facelets(cls, facelets, count):
+        """ create a batch of identical cubes
+
+        :param facelets: flat facelet vector (see facelet.py) copied into every row
+        :param count: number of cubes in the batch
+        :return: a BatchCube
+        """
+        require_numpy()
+        return cls(np.tile(np.frombuffer(bytes(facelets), dtype=np.uint8), (count, 1)))
+
+    @classmethod
+    def from_cubes(cls, cubes):
+        """ create a batch from Cube (or FlatCube) objects
+
+        :param cubes: iterable of cubes with integer colors
+        :return: a BatchCube
+        """
+        require_numpy()
+        return cls(np.array([list(cube.to_facelets()) for cube in cubes], dtype=np.uint8))
+
+    @classmethod
+    def children(cls, facelets, actions=FACE_TURNS):
+        """ create a batch holding every child of a cube, to evaluate them all at once
+
+        :param facelets: flat facelet vector of the parent cube
+        :param actions: the actions to apply, one child per action
+        :return: a BatchCube, row i is the parent after actions[i]
+        """
+        require_numpy()
+        parent = np.frombuffer(bytes(facelets), dtype=np.uint8)
+        return cls(parent[permutation_array()[action_indices(actions)]])
+
+    def __len__(self):
+        return len(self.states)
+
+    def facelets(self, i):
+        """ :return: the flat facelet vector of cube i as bytes
+        """
+        return self.states[i].tobytes()
+
+    def execute_action(self, action):
+        """ perform the same action on every cube in place
+
+        :param action: string representation of the action in 3x3 Rubiks notation
+        """
+        # take keeps the array row major, which the per cube gathers depend on
+        self.states = np.take(self.states, permutation_array()[ACTION_INDEX[action]], axis=1)
+
+    def execute_action_sequence(self, actions):
+        """ perform the same sequence on every cube in place, compiled into one gather
+
+        :param actions: a space separated string or a list/tuple of actions
+        """
+        perm = np.array(facelet.compile_sequence(actions), dtype=np.intp)
+        self.states = np.take(self.states, perm, axis=1)
+
+    def execute_actions(self, moves):
+        """ perform a different action on every cube in place
+
+        :param moves: one action per cube, as action strings or rows of permutation_array
+        """
+        moves = np.asarray(moves)
+        if moves.dtype.kind not in "iu":
+            moves = action_indices(moves)
+        perms = permutation_array()
+        # one gather per distinct action is much cheaper than an (N, 54) index array
+        moved = np.empty_like(self.states)
+        for action in np.unique(moves):
+            rows = np.flatnonzero(moves == action)
+            moved[rows] = np.take(self.states[rows], perms[action], axis=1)
+        self.states = moved
+
+    def scramble(self, length=25, rng=None, moves=FACE_TURNS):
+        """ scramble every cube with its own random sequence of moves
+
+        unlike Cube.scramble no moves are filtered, the sequences are plain random walks
+
+        :param length: number of moves per cube
+        :param rng: a numpy Generator, a fresh one if None
+        :param moves: the actions to pick from
+        :return: (N, length) array of action indices that were applied
+        """
+        if rng is None:
+            rng = np.random.default_rng()
+        choices = action_indices(moves)
+        sequences = choices[rng.integers(0, len(choices), size=(len(self), length))]
+        for column in sequences.T:
+            self.execute_actions(column)
+        return sequences
+
+    def goal_test_solved(self):
+        """ vectorized goal_test_solved: every sticker matches the center of its face
+
+        :return: boolean array with one entry per cube
+        """
+        centers = self.states[:, _arrays["centers"]]
+        return (self.states == centers).all(axis=1)
+
+    def goal_test_oll(self):
+        """ vectorized goal_test_oll: solved except for the top row of the side faces
+
+        :return: boolean array with one entry per cube
+        """
+        oll = _arrays["oll"]
+        centers = self.states[:, _arrays["centers"][oll]]
+        return (self.states[:, oll] == centers).all(axis=1)
+
+    def canonical(self, chunk=4096):
+        """ vectorized symmetry.canonical: the representative of every cube's class under the 48
+        symmetries and color relabeling
+
+        the copies of `chunk` cubes are compared one sticker column at a time, only building the
+        columns needed, for the cubes that still have more than one smallest copy
+
+        :param chunk: cubes per step
+        :return: ((N, 54) uint8 array of representatives, intp array of the symmetry of each cube)
+        """
+        perms = _arrays["symmetries"]
+        recolor = _arrays["recolor"]
+        symmetries_column = np.arange(symmetry.N_SYMMETRIES)
+        representatives = np.empty_like(self.states)
+        symmetries = np.empty(len(self), dtype=np.intp)
+        for begin in range(0, len(self), chunk):
+            states = self.states[begin:begin + chunk]
+            rows = np.arange(len(states))[:, None]
+            # relabel: each color becomes the solved color of the face whose center shows it
+            colors = np.zeros((len(states), 256), dtype=np.uint8)
+            colors[rows, states[:, list(CENTERS)]] = _arrays["solved centers"]
+            relabeled = colors[rows, states]
+            candidates = np.ones((len(states), symmetry.N_SYMMETRIES), dtype=bool)
+            active = np.arange(len(states))  # cubes with more than one smallest copy so far
+            for column in range(facelet.N_FACELETS):
+                values = recolor[symmetries_column, relabeled[active[:, None], perms[:, column]]]
+                left = candidates[active]
+                values[~left] = 255
+                left &= values == values.min(axis=1, keepdims=True)
+                candidates[active] = left
+                active = active[left.sum(axis=1) > 1]
+                if not len(active):
+                    break
+            best = candidates.argmax(axis=1)  # the smallest symmetry among equal copies
+            representatives[begin:begin + chunk] = recolor[best[:, None], relabeled[rows, perms[best]]]
+            symmetries[begin:begin + chunk] = best
+        return representatives, symmetries
+
+    def mismatches(self):
+        """ :return: (N, 54) boolean array, True for every sticker not matching its center
+        """
+        return self.states != self.states[:, _arrays["centers"]]
+
+    def count_color(self, name, color):
+        """ :return: how many stickers of a group in _arrays have a color, per cube
+        """
+        return (self.states[:, _arrays[name]] == color[:, None]).sum(axis=1)
+
+    def cross_cost(self, wrong=None):
+        """ vectorized solver.cross_cost
+
+        :param wrong: the result of mismatches, computed if None
+        :return: int array with one entry per cube
+        """
+        if wrong is None:
+            wrong = self.mismatches()
+        bottom = self.states[:, BOTTOM]
+        return wrong[:, _arrays["cross"]].any(axis=2).sum(axis=1) + self.count_color("top edges", bottom)
+
+    def count_bad_slots(self, wrong=None):
+        """ vectorized solver.count_bad_slots
+
+        :param wrong: the result of mismatches, computed if None
+        :return: int array with one entry per cube
+        """
+        if wrong is None:
+            wrong = self.mismatches()
+        return wrong[:, _arrays["slots"]].any(axis=2).sum(axis=1)
+
+    def h_cross(self):
+        """ :return: solver.h_cross_flat of every cube as an int array
+        """
+        return self.cross_cost()
+
+    def h_layer1_1(self):
+        """ :return: solver.h_layer1_1_flat of every cube as an int array
+        """
+        wrong = self.mismatches()
+        return self.cross_cost(wrong) + (self.count_bad_slots(wrong) == 4)
+
+    def h_layer1_2(self):
+        """ :return: solver.h_layer1_2_flat of every cube as an int array
+        """
+        wrong = self.mismatches()
+        return self.cross_cost(wrong) + np.maximum(self.count_bad_slots(wrong) - 2, 0)
+
+    def h_layer1_3(self):
+        """ :return: solver.h_layer1_3_flat of every cube as an int array
+        """
+        wrong = self.mismatches()
+        return (self.cross_cost(wrong) + np.maximum(self.count_bad_slots(wrong) - 1, 0)) * 2
+
+    def h_layer1_4(self):
+        """ :return: solver.h_layer1_4_flat of every cube as an int array
+        """
+        wrong = self.mismatches()
+        bottom = self.states[:, BOTTOM]
+        return (self.cross_cost(wrong) + self.count_bad_slots(wrong) + 2 * self.count_color("top corners", bottom) +
+                self.count_color("side bottom corners", bottom)) * 2
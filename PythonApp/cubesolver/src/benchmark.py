@@ -0,0 +1,475 @@
+"""
+benchmark.py
+Module for timing the cube engines and solvers against each other
+
+Run from the cubesolver directory with: python3 -m src.benchmark
+"""
+import os
+import random
+import time
+import tracemalloc
+
+from .cube import Cube
+from .cube import FlatCube
+from .cube import deepcopy_state
+from .cube import solved_state_ints
+from .actions import ACTIONS_3x3
+from . import facelet
+from . import solver
+from . import batch
+from . import cross
+from . import f2l
+from . import f2lcases
+from . import kociemba
+from . import search
+from . import symmetry
+from .cubie import CubieCube
+from .parallel import ParallelSearch
+from .transposition import TranspositionTable
+
+
+def time_call(func, repeat=3):
+    """ time a function call, keeping the fastest of several runs
+
+    :param func: a function taking no arguments
+    :param repeat: how many times to run it
+    :return: the fastest wall time in seconds
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def random_moves(count, seed=0):
+    """ generate a reproducible random sequence of actions
+
+    :param count: length of the sequence
+    :param seed: random seed
+    :return: list of actions from ACTIONS_3x3
+    """
+    rng = random.Random(seed)
+    actions = list(ACTIONS_3x3)
+    return [rng.choice(actions) for _ in range(count)]
+
+
+def bench_engines(count=20000):
+    """ compare the 3d list Cube against the flat FlatCube on the same random moves
+
+    :param count: number of actions to execute on each engine
+    :return: dict mapping engine name to actions per second
+    """
+    moves = random_moves(count)
+
+    def run_list():
+        cube = Cube(solved_state_ints)
+        for move in moves:
+            cube = cube.execute_action(move)
+
+    def run_flat():
+        cube = FlatCube.from_state(solved_state_ints)
+        for move in moves:
+            cube = cube.execute_action(move)
+
+    return {"Cube (3d list)": count / time_call(run_list),
+            "FlatCube": count / time_call(run_flat)}
+
+
+def bench_sequences(length=20, count=2000):
+    """ compare replaying one algorithm move by move against its compiled permutation
+
+    :param length: number of actions in the algorithm
+    :param count: how many times the algorithm is replayed
+    :return: dict mapping method name to algorithm replays per second
+    """
+    alg = random_moves(length, seed=1)
+
+    def run_actions():
+        state = deepcopy_state(solved_state_ints)
+        for _ in range(count):
+            for action in alg:
+                ACTIONS_3x3[action](state, 2)
+
+    def run_list():
+        cube = Cube(solved_state_ints)
+        for _ in range(count):
+            cube = cube.execute_action_sequence(alg)
+
+    def run_flat():
+        facelets = facelet.state_to_facelets(solved_state_ints)
+        for _ in range(count):
+            facelets = facelet.execute_action_sequence(facelets, alg)
+
+    return {"actions.py in place": count / time_call(run_actions),
+            "Cube (compiled)": count / time_call(run_list),
+            "FlatCube (compiled)": count / time_call(run_flat)}
+
+
+def bench_batch(size=100000, length=20, count=20000):
+    """ compare single cube moves against the NumPy BatchCube (needs NumPy)
+
+    :param size: number of cubes in the batch
+    :param length: number of moves applied to the batch
+    :param count: number of moves timed on the single cube engines
+    :return: dict mapping engine name to cube moves per second
+    """
+    results = bench_engines(count)
+    start = facelet.state_to_facelets(solved_state_ints)
+    cubes = batch.BatchCube.from_facelets(start, size)
+    moves = random_moves(length, seed=2)
+
+    def run_same():
+        for move in moves:
+            cubes.execute_action(move)
+
+    results["BatchCube same move"] = size * length / time_call(run_same)
+    results["BatchCube move per cube"] = size * length / time_call(lambda: cubes.scramble(length))
+    return results
+
+
+def bench_node_keys(count=20000):
+    """ compare the old str(state) hash and nested list equality against Node.key
+
+    :param count: number of hash + equality checks
+    :return: dict mapping method name to checks per second
+    """
+    nodes = scrambled_nodes(2)
+
+    def run_str():
+        a, b = nodes
+        for _ in range(count):
+            hash(str(a.cube.state))
+            a.cube.state == b.cube.state
+
+    def run_key():
+        a, b = nodes
+        for _ in range(count):
+            hash(a)
+            a == b
+
+    return {"str(state)": count / time_call(run_str),
+            "Node.key": count / time_call(run_key)}
+
+
+def bench_evaluation(count=2000, size=10000):
+    """ compare heuristic and goal test evaluation one cube at a time and on a BatchCube
+
+    :param count: number of parents whose face turn children are evaluated
+    :param size: number of cubes in the batch
+    :return: dict mapping method name to evaluations per second
+    """
+    parents = [node.cube.key() for node in scrambled_nodes(count)]
+    children = [facelet.execute_action(key, action) for key in parents for action in batch.FACE_TURNS]
+    nodes = [solver.Node(FlatCube(key), None, None) for key in children]
+
+    def run_heuristic():
+        for key in children:
+            solver.h_layer1_4_flat(key)
+
+    def run_goal_tests():
+        for node in nodes:
+            solver.goal_test_solved(node)
+            solver.goal_test_oll(node)
+
+    results = {"h_layer1_4_flat": len(children) / time_call(run_heuristic),
+               "goal tests": len(nodes) / time_call(run_goal_tests)}
+    if batch.np is not None:
+        cubes = batch.BatchCube(batch.np.array([list(key) for key in children[:size]], dtype=batch.np.uint8))
+
+        def run_children():
+            for key in parents:
+                batch.BatchCube.children(key).h_layer1_4()
+
+        results["BatchCube.children"] = len(children) / time_call(run_children)
+        results["BatchCube h_layer1_4"] = len(cubes) / time_call(cubes.h_layer1_4)
+        results["BatchCube goal tests"] = len(cubes) / time_call(
+            lambda: (cubes.goal_test_solved(), cubes.goal_test_oll()))
+    return results
+
+
+def bench_symmetry(count=2000, size=100000):
+    """ time canonicalization under the 48 symmetries, one cube at a time and on a BatchCube,
+    and conjugation of cubie cubes and coordinates
+
+    :param count: number of scrambled cubes
+    :param size: number of cubes in the batch
+    :return: dict mapping method name to operations per minute
+    """
+    keys = [node.cube.key() for node in scrambled_nodes(count)]
+    cubies = [CubieCube.from_facelets(key) for key in keys]
+    corners = symmetry.conjugate_table("corners")
+    coordinates = [cube.get_corners() for cube in cubies]
+
+    def run_canonical():
+        for key in keys:
+            symmetry.canonical(key)
+
+    def run_conjugate():
+        for cube in cubies:
+            symmetry.conjugate_cubie(cube, 47)
+
+    def run_table():
+        for s in range(symmetry.N_SYMMETRIES):
+            offset = s * symmetry.N_CORNERS_PERM
+            for coordinate in coordinates:
+                corners[offset + coordinate]
+
+    results = {"canonical": 60 * count / time_call(run_canonical),
+               "conjugate_cubie": 60 * count / time_call(run_conjugate),
+               "corners conjugate table": 60 * count * symmetry.N_SYMMETRIES / time_call(run_table)}
+    if batch.np is not None:
+        cubes = batch.BatchCube.from_facelets(keys[0], size)
+        cubes.scramble(rng=batch.np.random.default_rng(0))
+        results["BatchCube.canonical"] = 60 * len(cubes) / time_call(cubes.canonical)
+    return results
+
+
+def scrambled_nodes(count, seed=0):
+    """ create reproducible scrambled root nodes
+
+    :param count: number of scrambles
+    :param seed: random seed
+    :return: list of Node
+    """
+    random.seed(seed)
+    return [solver.Node(Cube(solved_state_ints).scramble()[0], None, None) for _ in range(count)]
+
+
+def bench_cross_search(count=5):
+    """ compare idas (a Node per child), idas_inplace (apply/undo), the iterative ida_star and
+    the pattern database on the cross
+
+    :param count: number of scrambles to solve the cross for
+    :return: dict mapping driver name to (crosses per second, peak traced memory in KiB)
+    """
+    nodes = scrambled_nodes(count)
+    cross.cross_table()
+    drivers = {"idas": lambda node: solver.idas(node, solver.h_cross),
+               "idas_inplace": lambda node: solver.idas_inplace(node, solver.h_cross_flat),
+               "search.ida_star": lambda node: search.ida_star(node.cube.key(), solver.h_cross_flat).path,
+               "pattern database": lambda node: cross.solve_cross(node.cube.key())}
+    results = {}
+    for name, driver in drivers.items():
+        seconds = time_call(lambda: [driver(node) for node in nodes], repeat=1)
+        tracemalloc.start()
+        driver(nodes[0])
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results[name] = (count / seconds, peak / 1024)
+    return results
+
+
+def bench_f2l_search(count=3):
+    """ compare the h_layer1_* heuristics against the F2L pair pattern databases and the case table
+
+    all start from the same optimal cross and insert the four pairs one after another
+
+    :param count: number of scrambles to solve F2L for
+    :return: dict mapping method name to (seconds per F2L, nodes per F2L, moves per F2L)
+    """
+    starts = []
+    for node in scrambled_nodes(count):
+        key = node.cube.key()
+        starts.append(facelet.execute_action_sequence(key, cross.solve_cross(key)))
+    for slot in range(len(f2l.SLOTS)):
+        f2l.pair_table(slot)
+
+    def run_heuristics(facelets):
+        nodes = 0
+        moves = 0
+
+        def counted(h_func):
+            def h(f):
+                nonlocal nodes
+                nodes += 1
+                return h_func(f)
+            return h
+
+        node = solver.Node(FlatCube(facelets), None, None)
+        for h_func in (solver.h_layer1_1_flat, solver.h_layer1_2_flat,
+                       solver.h_layer1_3_flat, solver.h_layer1_4_flat):
+            path = solver.idas_inplace(node, counted(h_func))
+            node.cube = node.cube.execute_action_sequence(path)
+            moves += len(path)
+        return nodes, moves
+
+    def inserting(mode):
+        def run(facelets):
+            nodes = 0
+            moves = 0
+            done = []
+            while len(done) < len(f2l.SLOTS):
+                path, slot, expanded = f2lcases.insert_pair(facelets, done, mode)
+                facelets = facelet.execute_action_sequence(facelets, path)
+                done.append(slot)
+                nodes += expanded
+                moves += len(path)
+            return nodes, moves
+        return run
+
+    f2lcases.case_index()
+    results = {}
+    for name, run in (("h_layer1_*", run_heuristics), ("pair databases", inserting("search")),
+                      ("case table", inserting("table")), ("cheapest case", inserting("cheapest"))):
+        start = time.perf_counter()
+        totals = [run(facelets) for facelets in starts]
+        seconds = time.perf_counter() - start
+        results[name] = (seconds / count, sum(t[0] for t in totals) / count, sum(t[1] for t in totals) / count)
+    return results
+
+
+def bench_transposition(count=3, sizes=(None, 1 << 12, 1 << 20)):
+    """ compare idas_inplace on the first three F2L phases without and with transposition tables
+
+    :param count: number of scrambles, searched from their optimal cross
+    :param sizes: table sizes to try, None for no table
+    :return: dict mapping table description to (seconds, nodes, hit rate)
+    """
+    starts = []
+    for node in scrambled_nodes(count):
+        key = node.cube.key()
+        starts.append(facelet.execute_action_sequence(key, cross.solve_cross(key)))
+
+    results = {}
+    for size in sizes:
+        for policy in ("lru", "depth") if size else (None,):
+            nodes = 0
+            hits = lookups = 0
+
+            def counted(h_func):
+                def h(f):
+                    nonlocal nodes
+                    nodes += 1
+                    return h_func(f)
+                return h
+
+            start = time.perf_counter()
+            for facelets in starts:
+                node = solver.Node(FlatCube(facelets), None, None)
+                for h_func in (solver.h_layer1_1_flat, solver.h_layer1_2_flat, solver.h_layer1_3_flat):
+                    table = TranspositionTable(size, policy) if size else None
+                    path = solver.idas_inplace(node, counted(h_func), table)
+                    node.cube = node.cube.execute_action_sequence(path)
+                    if table is not None:
+                        hits += table.hits
+                        lookups += table.hits + table.misses
+            name = "%s %d" % (policy, size) if size else "no table"
+            results[name] = (time.perf_counter() - start, nodes, hits / lookups if lookups else 0.0)
+    return results
+
+
+def bench_move_ordering(count=3):
+    """ compare the successor tables of search.py on optimal cross searches with search.ida_star
+
+    :param count: number of scrambles
+    :return: dict mapping table description to (branching factor, seconds, nodes, moves)
+    """
+    nodes = [node.cube.key() for node in scrambled_nodes(count)]
+    results = {}
+    for metric in ("qtm", "htm"):
+        for canonical in (False, True):
+            start = time.perf_counter()
+            totals = [search.ida_star(key, solver.h_cross_flat, metric=metric, canonical=canonical)
+                      for key in nodes]
+            seconds = time.perf_counter() - start
+            name = "%s%s" % (metric, " canonical" if canonical else "")
+            results[name] = (search.branching_factor(metric, canonical), seconds,
+                             sum(result.nodes for result in totals), sum(len(result.path) for result in totals) / count)
+    return results
+
+
+def bench_parallel(count=3, workers=(2, 4, 8, 16)):
+    """ compare serial ida_star against ParallelSearch on the first two F2L phases
+
+    the pools are started before timing, as a solver would keep one for many cubes
+
+    :param count: number of scrambles, searched from their optimal cross
+    :param workers: pool sizes to try
+    :return: dict mapping method name to seconds per search
+    """
+    starts = []
+    for node in scrambled_nodes(count):
+        key = node.cube.key()
+        starts.append(facelet.execute_action_sequence(key, cross.solve_cross(key)))
+    phases = (solver.h_layer1_1_flat, solver.h_layer1_2_flat)
+
+    def run(ida_star):
+        for facelets in starts:
+            for h_func in phases:
+                facelets = facelet.execute_action_sequence(facelets, ida_star(facelets, h_func).path)
+
+    searches = count * len(phases)
+    results = {"serial": time_call(lambda: run(search.ida_star), repeat=1) / searches}
+    for size in workers:
+        with ParallelSearch(size) as pool:
+            results["%d workers" % size] = time_call(lambda: run(pool.ida_star), repeat=1) / searches
+    return results
+
+
+def bench_kociemba(count=10, target_lengths=(22, 21, 20)):
+    """ time the two-phase solver for several target lengths
+
+    :param count: number of scrambles
+    :param target_lengths: target lengths to try, each with a 1 second budget
+    :return: dict mapping target length to (seconds per solve, average solution length)
+    """
+    cubes = [node.cube.key() for node in scrambled_nodes(count)]
+    two_phase = kociemba.TwoPhaseSolver()
+    results = {}
+    for target in target_lengths:
+        start = time.perf_counter()
+        lengths = [len(two_phase.solve(facelets, target, 1.0)) for facelets in cubes]
+        results[target] = ((time.perf_counter() - start) / count, sum(lengths) / count)
+    return results
+
+
+def print_results(title, results, unit):
+    print("-" * 45)
+    print(title)
+    base = None
+    for name, value in results.items():
+        if base is None:
+            base = value
+        print("  %-24s: %12.0f %s  (x%.1f)" % (name, value, unit, value / base))
+
+
+def main():
+    print_results("Engines", bench_engines(), "moves/s")
+    print_results("20 move algorithm", bench_sequences(), "algs/s")
+    if batch.np is not None:
+        print_results("Batched engine", bench_batch(), "moves/s")
+    print_results("Node hash + equality", bench_node_keys(), "checks/s")
+    print_results("Heuristic and goal test evaluation", bench_evaluation(), "cubes/s")
+    print_results("Symmetry (48 symmetries)", bench_symmetry(), "ops/min")
+    search = bench_cross_search()
+    print_results("Cross", {name: value[0] for name, value in search.items()}, "solves/s")
+    for name, value in search.items():
+        print("  %-24s: %12.1f KiB peak" % (name, value[1]))
+    search = bench_f2l_search()
+    print("-" * 45)
+    print("F2L (per solve)")
+    for name, (seconds, nodes, moves) in search.items():
+        print("  %-24s: %8.3f s %10.0f nodes %5.1f moves" % (name, seconds, nodes, moves))
+    print("-" * 45)
+    print("Move ordering (cross, search.ida_star)")
+    for name, (branching, seconds, nodes, moves) in bench_move_ordering().items():
+        print("  %-24s: b=%5.2f %8.3f s %10.0f nodes %5.1f moves" % (name, branching, seconds, nodes, moves))
+    print("-" * 45)
+    print("Transposition table (F2L phases 1-3)")
+    for name, (seconds, nodes, hit_rate) in bench_transposition().items():
+        print("  %-24s: %8.3f s %10.0f nodes %5.1f%% hits" % (name, seconds, nodes, hit_rate * 100))
+    print("-" * 45)
+    print("Parallel IDA* (F2L phases 1-2, %d CPUs)" % (os.cpu_count() or 1))
+    results = bench_parallel()
+    for name, seconds in results.items():
+        print("  %-24s: %8.3f s  (x%.1f)" % (name, seconds, results["serial"] / seconds))
+    print("-" * 45)
+    print("Two-phase (per solve, 1 s budget)")
+    for target, (seconds, moves) in bench_kociemba().items():
+        print("  target %-17d: %8.3f s %5.1f moves" % (target, seconds, moves))
+
+
+if __name__ == '__main__':
+    main()
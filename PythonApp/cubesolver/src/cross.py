@@ -0,0 +1,139 @@
+"""
+cross.py
+Module for solving the bottom cross optimally with a pattern database
+
+The cross only depends on the 4 bottom edges: 12 * 11 * 10 * 9 ordered positions
+times 2^4 flips = 190,080 states. A breadth first search from the solved cross
+gives the exact distance of every state, stored nibble packed on disk (see
+tables.py). An optimal cross is then read off by always taking a move that
+lowers the distance, no search needed.
+"""
+from .cubie import CubieCube
+from .cubie import EDGE_CODE_MOVES
+from .cubie import FACE_MOVES
+from .cubie import N_MOVES
+from .cubie import edge_code
+from .tables import NibbleTable
+from .tables import load_nibble_table
+
+CROSS_EDGES = (4, 5, 6, 7)  # DR, DF, DL, DB
+N_CROSS = 12 * 11 * 10 * 9 * 16
+SOLVED_CODES = tuple(piece * 2 for piece in CROSS_EDGES)
+TABLE_NAME = "cross_v1.nib"
+
+_table = []
+
+
+def edges_index(codes):
+    """ rank a tuple of distinct edge codes (position * 2 + flip)
+
+    :param codes: codes of 1 to 12 edges, in a fixed piece order
+    :return: the index of the ordered positions, times 2^len(codes), plus the flips
+    """
+    index = 0
+    flips = 0
+    used = 0
+    available = 12
+    for code in codes:
+        position = code >> 1
+        # position among the positions not taken by the previous pieces
+        index = index * available + position - bin(used & ((1 << position) - 1)).count("1")
+        used |= 1 << position
+        available -= 1
+        flips = (flips << 1) | (code & 1)
+    return (index << len(codes)) | flips
+
+
+def edges_unrank(index, count):
+    """ invert edges_index
+
+    :param index: an index returned by edges_index
+    :param count: number of edges it ranks
+    :return: tuple of count edge codes
+    """
+    flips = index & ((1 << count) - 1)
+    index >>= count
+    ranks = []
+    for available in range(12 - count + 1, 13):
+        index, rank = divmod(index, available)
+        ranks.append(rank)
+    free = list(range(12))
+    codes = []
+    for i, rank in enumerate(reversed(ranks)):
+        codes.append(free.pop(rank) * 2 + ((flips >> (count - 1 - i)) & 1))
+    return tuple(codes)
+
+
+def cross_index(codes):
+    """ :return: the pattern database index of the 4 cross edge codes
+    """
+    return edges_index(codes)
+
+
+def build_cross_table():
+    """ breadth first search over every placement of the cross edges
+
+    :return: NibbleTable of the number of face moves needed to solve the cross
+    """
+    distances = bytearray([0xF]) * N_CROSS
+    distances[cross_index(SOLVED_CODES)] = 0
+    frontier = [SOLVED_CODES]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for codes in frontier:
+            for moves in EDGE_CODE_MOVES:
+                moved = (moves[codes[0]], moves[codes[1]], moves[codes[2]], moves[codes[3]])
+                index = cross_index(moved)
+                if distances[index] == 0xF:
+                    distances[index] = depth
+                    next_frontier.append(moved)
+        frontier = next_frontier
+    return NibbleTable.from_bytes(distances)
+
+
+def cross_table():
+    """ :return: the cross pattern database, loaded from disk or built on first use
+    """
+    if not _table:
+        _table.append(load_nibble_table(TABLE_NAME, N_CROSS, build_cross_table))
+    return _table[0]
+
+
+def cross_codes(facelets):
+    """ locate the cross edges of a cube
+
+    :param facelets: flat facelet vector of the cube (see facelet.py)
+    :return: tuple of the 4 cross edge codes
+    """
+    cube = CubieCube.from_facelets(facelets)
+    return tuple(edge_code(cube, piece) for piece in CROSS_EDGES)
+
+
+def cross_distance(facelets):
+    """ :return: the exact number of face moves needed to solve the bottom cross
+    """
+    return cross_table()[cross_index(cross_codes(facelets))]
+
+
+def solve_cross(facelets):
+    """ find an optimal (fewest face moves) solution for the bottom cross
+
+    :param facelets: flat facelet vector of the cube (see facelet.py)
+    :return: list of actions that solve the cross
+    """
+    table = cross_table()
+    codes = cross_codes(facelets)
+    distance = table[cross_index(codes)]
+    path = []
+    while distance > 0:
+        for m in range(N_MOVES):
+            moves = EDGE_CODE_MOVES[m]
+            moved = (moves[codes[0]], moves[codes[1]], moves[codes[2]], moves[codes[3]])
+            if table[cross_index(moved)] == distance - 1:
+                path.append(FACE_MOVES[m])
+                codes = moved
+                distance -= 1
+                break
+    return path
@@ -6,6 +6,7 @@ from math import sqrt
 import random
 
 from .actions import ACTIONS_3x3
+from . import facelet
 
 # color escape sequences for xterm-256color bgs
 ORANGE_BG = "\033[48;5;208m  \033[0;0m"
@@ -15,14 +16,18 @@ GREEN_BG = "\033[48;5;10m  \033[0;0m"  # 2
 BLUE_BG = "\033[48;5;12m  \033[0;0m"  # 21
 WHITE_BG = "\033[48;5;254m  \033[0;0m"
 
+# integer color of each color letter, the same pairs as pick_color
+COLOR_INTS = {'W': 0, 'G': 1, 'O': 2, 'B': 3, 'R': 4, 'Y': 5}
+
 
 class Cube:
     """ data structure to represent a rubiks cube
     """
 
-    def __init__(self, state):
+    def __init__(self, state, key=None):
         self.size = int(len(state[0]))
         self.state = state
+        self._key = key
 
     def display_text(self):
         """ prints to terminal a text representation of the cube
@@ -81,10 +86,31 @@ class Cube:
                 print(pick_color(color), end='')
             print()
 
+    def key(self):
+        """ compact key of the cube state, usable as a dictionary key
+
+        the key is the flat facelet vector (54 bytes, see facelet.py). it is computed once per
+        Cube, and cubes created by execute_action get it for free from the gather that moved them.
+        equal states have equal keys, and bytes cache their own hash
+
+        :return: bytes of length 54, one color per sticker
+        """
+        if self._key is None:
+            self._key = facelet.state_to_facelets(self.state)
+        return self._key
+
+    def to_facelets(self):
+        """ get the flat facelet vector of the cube (see facelet.py)
+
+        :return: bytes of length 54, one color per sticker
+        """
+        return self.key()
+
     def execute_action(self, action):
         """ simulates a turn or rotation of the cube
 
-        actions.py contains the functions that modify the state in order to perform each action
+        actions.py contains the functions that define each action. they are precomputed
+        into permutation tables (see facelet.py) so an action is a single gather
 
         Args:
             action (string): string representation of the action to perform in 3x3 Rubiks notation
@@ -99,27 +125,23 @@ class Cube:
         Returns:
             Cube: a Cube reflecting the new state after the action is performed
         """
-        state = deepcopy_state(self.state)
-        max_idx = self.size - 1
-
-        ACTIONS_3x3[action](state, max_idx)
-        return Cube(state)
+        moved = facelet.GATHERS[action](self.key())
+        return Cube(facelet.facelets_to_state(moved), bytes(moved))
 
     def execute_action_sequence(self, actions):
         """simulates a series of actions on the cube (turns or rotations)
 
+        the whole sequence is compiled into one permutation (see facelet.compile_sequence)
+        so its cost does not depend on the number of actions
+
         Args:
             actions (string list): sequence of actions to simulate on the cube
 
         Returns:
             Cube: a Cube reflecting the new state after the sequence is performed
         """
-        state = deepcopy_state(self.state)
-
-        cube = Cube(state)
-        for action in actions:
-            cube = cube.execute_action(action)
-        return cube
+        moved = facelet.compile_gather(actions)(self.key())
+        return Cube(facelet.facelets_to_state(moved), bytes(moved))
 
     def scramble(self):
         """performs a 25 move random scramble on the cube struct
@@ -142,13 +164,91 @@ class Cube:
             if not is_previous_inverse and not is_triple_duplicate:
                 move_sequence.append(move)
 
-        cube = Cube(self.state)
+        cube = self
         for move in move_sequence:
             cube = cube.execute_action(move)
 
         return cube, move_sequence
 
 
+class FlatCube(Cube):
+    """ a Cube stored as a flat 54 byte facelet vector (see facelet.py)
+
+    actions are a single gather through a precomputed permutation table instead of
+    a deepcopy of the 3d list. the 3d list state is still available through the state
+    property so the display functions and the solver keep working
+    """
+
+    def __init__(self, facelets):
+        self.size = facelet.SIZE
+        self.facelets = bytes(facelets)
+
+    @classmethod
+    def from_state(cls, state):
+        """ create a FlatCube from a 3d list cube state
+
+        :param state: a 3d list cube state holding integer colors
+        :return: the equivalent FlatCube
+        """
+        return cls(facelet.state_to_facelets(state))
+
+    @property
+    def state(self):
+        return facelet.facelets_to_state(self.facelets)
+
+    def to_cube(self):
+        """ convert back to the 3d list representation
+
+        :return: a Cube with the same state
+        """
+        return Cube(self.state)
+
+    def key(self):
+        return bytes(self.facelets)
+
+    def execute_action(self, action):
+        """ simulates a turn or rotation of the cube, see Cube.execute_action
+
+        :param action: string representation of the action in 3x3 Rubiks notation
+        :return: a FlatCube reflecting the new state after the action is performed
+        """
+        return FlatCube(facelet.execute_action(self.facelets, action))
+
+    def execute_action_sequence(self, actions):
+        """ simulates a series of actions on the cube, see Cube.execute_action_sequence
+
+        :param actions: sequence of actions to simulate on the cube
+        :return: a FlatCube reflecting the new state after the sequence is performed
+        """
+        return FlatCube(facelet.execute_action_sequence(self.facelets, actions))
+
+
+class MutableCube(FlatCube):
+    """ a FlatCube that can be modified in place with apply and undo
+
+    searches only need one live state: apply an action before expanding a child and undo
+    it when backtracking, instead of allocating a new cube for every node
+    """
+
+    def __init__(self, facelets):
+        self.size = facelet.SIZE
+        self.facelets = bytearray(facelets)
+
+    def apply(self, action):
+        """ perform an action on this cube in place
+
+        :param action: string representation of the action in 3x3 Rubiks notation
+        """
+        self.facelets[:] = facelet.GATHERS[action](self.facelets)
+
+    def undo(self, action):
+        """ revert an action previously performed with apply
+
+        :param action: string representation of the action in 3x3 Rubiks notation
+        """
+        self.facelets[:] = facelet.INVERSE_GATHERS[action](self.facelets)
+
+
 def pick_color(char):
     """ match a char or num to it's color code
 
@@ -187,13 +287,16 @@ def deepcopy_state(state):
 def string_to_state(string):
     """ convert a single string into a cube state
 
+    colors are read as integers, digits 0-5 or the letters of COLOR_INTS, since the
+    permutation tables (see facelet.py) only move integer colors
+
     Args:
-        string (string): a string representing cube state
+        string (string): a string representing cube state, one color per sticker separated by spaces
 
     Returns:
         3d list: a useable cube state
     """
-    state_1d = list(string.split(' '))
+    state_1d = [COLOR_INTS[x] if x in COLOR_INTS else int(x) for x in string.split(' ')]
     size = int(sqrt(len(state_1d) // 6))
     state_3d = []
     for i in range(6):
@@ -208,7 +311,3 @@ def string_to_state(string):
 
 
 solved_state_ints = string_to_state('0' + ' 0' * 8 + " 3" * 9 + " 4" * 9 + " 1" * 9 + " 2" * 9 + " 5" * 9)
-for i in range(6):
-    for j in range(3):
-        for k in range(3):
-            solved_state_ints[i][j][k] = int(solved_state_ints[i][j][k])
@@ -0,0 +1,466 @@
+"""
+cubie.py
+Module for the cubie level representation of a 3x3 cube and its coordinates
+
+A CubieCube stores which corner/edge piece sits in every position and how it is
+oriented, instead of 54 sticker colors. Corners and edges use the usual ordering
+(URF, UFL, ULB, UBR, DFR, DLF, DBL, DRB and UR, UF, UL, UB, DR, DF, DL, DB, FR, FL,
+BL, BR). Pieces are identified by the colors of the centers, so any whole cube
+orientation can be read.
+
+Coordinates encode parts of a CubieCube as a single integer (twist, flip, slice...)
+and move tables give the coordinate after each of the 18 face moves, so table driven
+searches update their state in O(1) per move.
+"""
+from array import array
+from math import comb
+
+from .facelet import PERMUTATIONS
+from .facelet import facelet_index
+from .tables import load_array
+
+# face order of the cubie model, mapped to the face index of the 3d list state
+U, R, F, D, L, B = range(6)
+FACE_TO_STATE = (5, 2, 1, 0, 4, 3)
+FACE_NAMES = "URFDLB"
+
+N_CORNERS = 8
+N_EDGES = 12
+N_TWIST = 2187  # 3^7 corner orientations
+N_FLIP = 2048  # 2^11 edge orientations
+N_SLICE = 495  # positions of the 4 UD-slice edges, ignoring their order (12 choose 4)
+N_SLICE_SORTED = 11880  # positions and order of the 4 UD-slice edges (12! / 8!)
+N_CORNERS_PERM = 40320  # 8! corner permutations
+N_UD_EDGES = 40320  # 8! permutations of the U and D layer edges, only valid in phase 2
+
+# the 18 face moves used by every coordinate move table, in table order
+FACE_MOVES = ("U", "U2", "U'", "R", "R2", "R'", "F", "F2", "F'",
+              "D", "D2", "D'", "L", "L2", "L'", "B", "B2", "B'")
+N_MOVES = len(FACE_MOVES)
+# moves that keep the UD-slice edges inside the slice (the G1 subgroup generators)
+PHASE2_MOVES = tuple(m for m, move in enumerate(FACE_MOVES) if move[0] in "UD" or move[1:] == "2")
+INVALID = 0xFFFF
+
+
+def _sticker(face, number):
+    """ flat facelet index of sticker number (1-9, row major) of a cubie model face
+    """
+    return facelet_index(FACE_TO_STATE[face], (number - 1) // 3, (number - 1) % 3)
+
+
+# stickers of every corner/edge position, clockwise for corners, U/D sticker first
+CORNER_FACELETS = ((_sticker(U, 9), _sticker(R, 1), _sticker(F, 3)),
+                   (_sticker(U, 7), _sticker(F, 1), _sticker(L, 3)),
+                   (_sticker(U, 1), _sticker(L, 1), _sticker(B, 3)),
+                   (_sticker(U, 3), _sticker(B, 1), _sticker(R, 3)),
+                   (_sticker(D, 3), _sticker(F, 9), _sticker(R, 7)),
+                   (_sticker(D, 1), _sticker(L, 9), _sticker(F, 7)),
+                   (_sticker(D, 7), _sticker(B, 9), _sticker(L, 7)),
+                   (_sticker(D, 9), _sticker(R, 9), _sticker(B, 7)))
+EDGE_FACELETS = ((_sticker(U, 6), _sticker(R, 2)), (_sticker(U, 8), _sticker(F, 2)),
+                 (_sticker(U, 4), _sticker(L, 2)), (_sticker(U, 2), _sticker(B, 2)),
+                 (_sticker(D, 6), _sticker(R, 8)), (_sticker(D, 2), _sticker(F, 8)),
+                 (_sticker(D, 4), _sticker(L, 8)), (_sticker(D, 8), _sticker(B, 8)),
+                 (_sticker(F, 6), _sticker(R, 4)), (_sticker(F, 4), _sticker(L, 6)),
+                 (_sticker(B, 6), _sticker(L, 4)), (_sticker(B, 4), _sticker(R, 6)))
+CENTER_FACELETS = tuple(_sticker(face, 5) for face in range(6))
+
+# faces (colors) of every piece in its solved position
+CORNER_COLORS = ((U, R, F), (U, F, L), (U, L, B), (U, B, R),
+                 (D, F, R), (D, L, F), (D, B, L), (D, R, B))
+EDGE_COLORS = ((U, R), (U, F), (U, L), (U, B), (D, R), (D, F),
+               (D, L), (D, B), (F, R), (F, L), (B, L), (B, R))
+
+# sticker colors read clockwise from a position -> (piece, orientation)
+_CORNER_LOOKUP = {}
+for _piece, _colors in enumerate(CORNER_COLORS):
+    for _ori in range(3):
+        _CORNER_LOOKUP[tuple(_colors[(n - _ori) % 3] for n in range(3))] = (_piece, _ori)
+_EDGE_LOOKUP = {}
+for _piece, _colors in enumerate(EDGE_COLORS):
+    _EDGE_LOOKUP[_colors] = (_piece, 0)
+    _EDGE_LOOKUP[_colors[::-1]] = (_piece, 1)
+
+# the color scheme of solved_state_ints, in cubie model face order
+DEFAULT_SCHEME = (5, 4, 3, 0, 2, 1)
+
+
+def rotate_left(arr, left, right):
+    """ rotate arr[left..right] one step to the left
+    """
+    temp = arr[left]
+    arr[left:right] = arr[left + 1:right + 1]
+    arr[right] = temp
+
+
+def rotate_right(arr, left, right):
+    """ rotate arr[left..right] one step to the right
+    """
+    temp = arr[right]
+    arr[left + 1:right + 1] = arr[left:right]
+    arr[left] = temp
+
+
+class CubieCube:
+    """ cube represented by corner/edge permutation and orientation
+
+    cp[i] is the corner piece sitting in corner position i and co[i] its twist (0-2),
+    ep[i] and eo[i] (0-1) are the same for edges
+    """
+
+    def __init__(self, cp=None, co=None, ep=None, eo=None):
+        self.cp = list(cp) if cp is not None else list(range(N_CORNERS))
+        self.co = list(co) if co is not None else [0] * N_CORNERS
+        self.ep = list(ep) if ep is not None else list(range(N_EDGES))
+        self.eo = list(eo) if eo is not None else [0] * N_EDGES
+
+    def __eq__(self, other):
+        return (self.cp == other.cp and self.co == other.co
+                and self.ep == other.ep and self.eo == other.eo)
+
+    def __repr__(self):
+        return "CubieCube(cp=%s, co=%s, ep=%s, eo=%s)" % (self.cp, self.co, self.ep, self.eo)
+
+    def copy(self):
+        return CubieCube(self.cp, self.co, self.ep, self.eo)
+
+    @classmethod
+    def from_facelets(cls, facelets):
+        """ read the pieces of a flat facelet vector
+
+        colors are matched to faces through the center stickers, so the result is
+        relative to the current orientation of the cube
+
+        :param facelets: flat facelet vector of the cube (see facelet.py)
+        :return: the equivalent CubieCube
+        :raises ValueError: if the stickers do not describe valid pieces
+        """
+        face_of = {facelets[center]: face for face, center in enumerate(CENTER_FACELETS)}
+        if len(face_of) != len(CENTER_FACELETS):
+            raise ValueError("the centers of a cube must have six different colors")
+        cube = cls()
+        try:
+            faces = [face_of[color] for color in facelets]
+            for i, (a, b, c) in enumerate(CORNER_FACELETS):
+                cube.cp[i], cube.co[i] = _CORNER_LOOKUP[faces[a], faces[b], faces[c]]
+            for i, (a, b) in enumerate(EDGE_FACELETS):
+                cube.ep[i], cube.eo[i] = _EDGE_LOOKUP[faces[a], faces[b]]
+        except KeyError:
+            raise ValueError("facelets do not describe a valid cube")
+        return cube
+
+    @classmethod
+    def from_state(cls, state):
+        """ read the pieces of a 3d list cube state, see from_facelets
+        """
+        return cls.from_facelets([x for face in state for row in face for x in row])
+
+    def to_facelets(self, scheme=DEFAULT_SCHEME):
+        """ write the cube as a flat facelet vector
+
+        :param scheme: color of each face (cubie model face order, see center_colors)
+        :return: bytes of length 54, one color per sticker
+        """
+        facelets = bytearray(54)
+        for face, center in enumerate(CENTER_FACELETS):
+            facelets[center] = scheme[face]
+        for i, stickers in enumerate(CORNER_FACELETS):
+            colors = CORNER_COLORS[self.cp[i]]
+            ori = self.co[i]
+            for n in range(3):
+                facelets[stickers[(n + ori) % 3]] = scheme[colors[n]]
+        for i, stickers in enumerate(EDGE_FACELETS):
+            colors = EDGE_COLORS[self.ep[i]]
+            ori = self.eo[i]
+            for n in range(2):
+                facelets[stickers[(n + ori) % 2]] = scheme[colors[n]]
+        return bytes(facelets)
+
+    def to_state(self, scheme=DEFAULT_SCHEME):
+        """ write the cube as a 3d list state usable by Cube, see to_facelets
+        """
+        facelets = self.to_facelets(scheme)
+        return [[list(facelets[i:i + 3]) for i in range(face * 9, face * 9 + 9, 3)] for face in range(6)]
+
+    def corner_multiply(self, other):
+        """ apply the corner part of other (a move or any CubieCube) to this cube in place
+        """
+        cp = self.cp
+        co = self.co
+        self.cp = [cp[i] for i in other.cp]
+        self.co = [(co[j] + o) % 3 for j, o in zip(other.cp, other.co)]
+
+    def edge_multiply(self, other):
+        """ apply the edge part of other (a move or any CubieCube) to this cube in place
+        """
+        ep = self.ep
+        eo = self.eo
+        self.ep = [ep[i] for i in other.ep]
+        self.eo = [(eo[j] + o) % 2 for j, o in zip(other.ep, other.eo)]
+
+    def multiply(self, other):
+        """ apply other (a move or any CubieCube) to this cube in place
+        """
+        self.corner_multiply(other)
+        self.edge_multiply(other)
+
+    def inverse(self):
+        """ :return: the CubieCube that undoes this one
+        """
+        inv = CubieCube()
+        for i, piece in enumerate(self.cp):
+            inv.cp[piece] = i
+            inv.co[piece] = (3 - self.co[i]) % 3
+        for i, piece in enumerate(self.ep):
+            inv.ep[piece] = i
+            inv.eo[piece] = self.eo[i]
+        return inv
+
+    def is_solvable(self):
+        """ check that the permutation parities and orientation sums are reachable by turns
+
+        :return: True if the cube can be solved
+        """
+        return (sorted(self.cp) == list(range(N_CORNERS)) and sorted(self.ep) == list(range(N_EDGES))
+                and sum(self.co) % 3 == 0 and sum(self.eo) % 2 == 0
+                and permutation_parity(self.cp) == permutation_parity(self.ep))
+
+    # ---------------------------------------------------------------- coordinates
+    def get_twist(self):
+        """ :return: corner orientation coordinate (0-2186)
+        """
+        twist = 0
+        for i in range(N_CORNERS - 1):
+            twist = 3 * twist + self.co[i]
+        return twist
+
+    def set_twist(self, twist):
+        total = 0
+        for i in range(N_CORNERS - 2, -1, -1):
+            self.co[i] = twist % 3
+            total += self.co[i]
+            twist //= 3
+        self.co[N_CORNERS - 1] = -total % 3
+
+    def get_flip(self):
+        """ :return: edge orientation coordinate (0-2047)
+        """
+        flip = 0
+        for i in range(N_EDGES - 1):
+            flip = 2 * flip + self.eo[i]
+        return flip
+
+    def set_flip(self, flip):
+        total = 0
+        for i in range(N_EDGES - 2, -1, -1):
+            self.eo[i] = flip % 2
+            total += self.eo[i]
+            flip //= 2
+        self.eo[N_EDGES - 1] = total % 2
+
+    def get_slice_sorted(self):
+        """ :return: positions and order of the FR, FL, BL, BR edges (0-11879), 0 when solved
+        """
+        a = x = 0
+        edge4 = [0] * 4
+        for j in range(N_EDGES - 1, -1, -1):
+            if self.ep[j] >= 8:
+                a += comb(11 - j, x + 1)
+                edge4[3 - x] = self.ep[j]
+                x += 1
+        b = 0
+        for j in range(3, 0, -1):
+            k = 0
+            while edge4[j] != j + 8:
+                rotate_left(edge4, 0, j)
+                k += 1
+            b = (j + 1) * b + k
+        return 24 * a + b
+
+    def set_slice_sorted(self, idx):
+        slice_edges = [8, 9, 10, 11]
+        other_edges = [0, 1, 2, 3, 4, 5, 6, 7]
+        b = idx % 24
+        a = idx // 24
+        self.ep = [-1] * N_EDGES
+        for j in range(1, 4):
+            k = b % (j + 1)
+            b //= j + 1
+            while k > 0:
+                rotate_right(slice_edges, 0, j)
+                k -= 1
+        x = 4
+        for j in range(N_EDGES):
+            if x > 0 and a - comb(11 - j, x) >= 0:
+                self.ep[j] = slice_edges[4 - x]
+                a -= comb(11 - j, x)
+                x -= 1
+        x = 0
+        for j in range(N_EDGES):
+            if self.ep[j] == -1:
+                self.ep[j] = other_edges[x]
+                x += 1
+
+    def get_slice(self):
+        """ :return: positions of the UD-slice edges ignoring their order (0-494), 0 when solved
+        """
+        return self.get_slice_sorted() // 24
+
+    def set_slice(self, idx):
+        self.set_slice_sorted(idx * 24)
+
+    def get_corners(self):
+        """ :return: corner permutation coordinate (0-40319)
+        """
+        return _get_permutation(self.cp)
+
+    def set_corners(self, idx):
+        self.cp = _set_permutation(idx, N_CORNERS)
+
+    def get_ud_edges(self):
+        """ :return: permutation of the 8 U and D layer edges (0-40319)
+        :raises ValueError: if a UD-slice edge is in the U or D layer
+        """
+        if max(self.ep[:8]) >= 8:
+            raise ValueError("U and D edges are not in the U and D layers")
+        return _get_permutation(self.ep[:8])
+
+    def set_ud_edges(self, idx):
+        self.ep[:8] = _set_permutation(idx, 8)
+        self.ep[8:] = [8, 9, 10, 11]
+
+
+def _get_permutation(perm):
+    perm = list(perm)
+    b = 0
+    for j in range(len(perm) - 1, 0, -1):
+        k = 0
+        while perm[j] != j:
+            rotate_left(perm, 0, j)
+            k += 1
+        b = (j + 1) * b + k
+    return b
+
+
+def _set_permutation(idx, n):
+    perm = list(range(n))
+    for j in range(n):
+        k = idx % (j + 1)
+        idx //= j + 1
+        while k > 0:
+            rotate_right(perm, 0, j)
+            k -= 1
+    return perm
+
+
+def permutation_parity(perm):
+    """ :return: 0 for an even permutation, 1 for an odd one
+    """
+    parity = 0
+    for i in range(len(perm)):
+        for j in range(i):
+            if perm[j] > perm[i]:
+                parity ^= 1
+    return parity
+
+
+def center_colors(facelets):
+    """ read the color scheme of a facelet vector, to write it back with to_facelets
+
+    :param facelets: flat facelet vector of the cube
+    :return: tuple with the color of each face in cubie model order
+    """
+    return tuple(facelets[center] for center in CENTER_FACELETS)
+
+
+def _move_cube(action):
+    """ derive the CubieCube of an action from its facelet permutation table
+    """
+    solved = bytearray(54)
+    for face in range(6):
+        for n in range(1, 10):
+            solved[_sticker(face, n)] = DEFAULT_SCHEME[face]
+    return CubieCube.from_facelets(bytes(solved[i] for i in PERMUTATIONS[action]))
+
+
+MOVE_CUBES = tuple(_move_cube(action) for action in FACE_MOVES)
+
+
+def _piece_code_moves():
+    """ move tables for single pieces, used to track a few pieces without a full CubieCube
+
+    a piece is coded as position * 3 + twist for corners and position * 2 + flip for edges.
+    CORNER_CODE_MOVES[m][code] is the code of the same corner after FACE_MOVES[m]
+    """
+    corner_moves = []
+    edge_moves = []
+    for move in MOVE_CUBES:
+        corners = [0] * (N_CORNERS * 3)
+        for i, (origin, twist) in enumerate(zip(move.cp, move.co)):
+            for ori in range(3):
+                corners[origin * 3 + ori] = i * 3 + (ori + twist) % 3
+        edges = [0] * (N_EDGES * 2)
+        for i, (origin, flip) in enumerate(zip(move.ep, move.eo)):
+            for ori in range(2):
+                edges[origin * 2 + ori] = i * 2 + (ori ^ flip)
+        corner_moves.append(tuple(corners))
+        edge_moves.append(tuple(edges))
+    return tuple(corner_moves), tuple(edge_moves)
+
+
+CORNER_CODE_MOVES, EDGE_CODE_MOVES = _piece_code_moves()
+
+
+def corner_code(cube, piece):
+    """ :return: position * 3 + twist of a corner piece in a CubieCube
+    """
+    i = cube.cp.index(piece)
+    return i * 3 + cube.co[i]
+
+
+def edge_code(cube, piece):
+    """ :return: position * 2 + flip of an edge piece in a CubieCube
+    """
+    i = cube.ep.index(piece)
+    return i * 2 + cube.eo[i]
+
+
+# ---------------------------------------------------------------- move tables
+def _build_move_table(n, getter, setter, multiply, moves=tuple(range(N_MOVES))):
+    table = array('H', [INVALID]) * (n * N_MOVES)
+    cube = CubieCube()
+    for i in range(n):
+        setter(cube, i)
+        for m in moves:
+            moved = cube.copy()
+            multiply(moved, MOVE_CUBES[m])
+            table[N_MOVES * i + m] = getter(moved)
+    return table
+
+
+_MOVE_TABLE_SPECS = {
+    "twist": (N_TWIST, CubieCube.get_twist, CubieCube.set_twist, CubieCube.corner_multiply),
+    "flip": (N_FLIP, CubieCube.get_flip, CubieCube.set_flip, CubieCube.edge_multiply),
+    "slice_sorted": (N_SLICE_SORTED, CubieCube.get_slice_sorted, CubieCube.set_slice_sorted,
+                     CubieCube.edge_multiply),
+    "corners": (N_CORNERS_PERM, CubieCube.get_corners, CubieCube.set_corners, CubieCube.corner_multiply),
+    "ud_edges": (N_UD_EDGES, CubieCube.get_ud_edges, CubieCube.set_ud_edges, CubieCube.edge_multiply,
+                 PHASE2_MOVES),
+}
+_move_tables = {}
+
+
+def move_table(name):
+    """ get the move table of a coordinate, loaded from disk or built on first use
+
+    table[coord * N_MOVES + m] is the coordinate after FACE_MOVES[m]. the ud_edges
+    table is only filled for PHASE2_MOVES (U, D, R2, L2, F2, B2), other entries are INVALID
+
+    :param name: one of twist, flip, slice_sorted, corners, ud_edges
+    :return: array of unsigned shorts
+    """
+    if name not in _move_tables:
+        spec = _MOVE_TABLE_SPECS[name]
+        _move_tables[name] = load_array("move_%s_v1.arr" % name, 'H', spec[0] * N_MOVES,
+                                        lambda: _build_move_table(*spec))
+    return _move_tables[name]
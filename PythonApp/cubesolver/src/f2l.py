@@ -0,0 +1,232 @@
+"""
+f2l.py
+Module for solving F2L pairs with pattern databases
+
+Each F2L slot gets a pattern database over its corner, its edge and the two cross
+edges next to it: 24 corner codes * 12 * 11 * 10 edge positions * 2^3 flips =
+253,440 states, built by breadth first search and cached on disk (see tables.py).
+A pair is inserted with an IDA* search over the tracked pieces only, using the
+maximum of the cross database and the databases of every slot that must be solved
+as an admissible heuristic, so the pair is always inserted in the fewest moves.
+"""
+import time
+
+from .cross import CROSS_EDGES
+from .cross import cross_index
+from .cross import cross_table
+from .cross import edges_index
+from .cubie import CORNER_CODE_MOVES
+from .cubie import CubieCube
+from .cubie import EDGE_CODE_MOVES
+from .cubie import FACE_MOVES
+from .cubie import N_MOVES
+from .cubie import corner_code
+from .cubie import edge_code
+from .facelet import execute_action_sequence
+from .search import next_moves
+from .tables import NibbleTable
+from .tables import load_nibble_table
+
+# (corner, edge, cross edges next to the slot) for the FR, FL, BL and BR slots
+SLOTS = ((4, 8, (5, 4)), (5, 9, (5, 6)), (6, 10, (7, 6)), (7, 11, (7, 4)))
+N_PAIR_EDGES = 12 * 11 * 10 * 8
+N_PAIR = 24 * N_PAIR_EDGES
+DEADLINE_MASK = (1 << 10) - 1  # a search checks its deadline when nodes & DEADLINE_MASK == 0
+
+# moves allowed after each move (the last entry is for the first move), see search.next_moves
+NEXT_MOVES = next_moves(FACE_MOVES)
+NO_MOVE = N_MOVES  # index into NEXT_MOVES at the root
+
+_tables = {}
+
+
+def pair_index(corner, edges):
+    """ :return: the pattern database index of a slot corner code and its 3 edge codes
+    """
+    return corner * N_PAIR_EDGES + edges_index(edges)
+
+
+def build_pair_table(slot):
+    """ breadth first search over every placement of a slot's pair and its two cross edges
+
+    :param slot: slot index (0-3, FR FL BL BR)
+    :return: NibbleTable of the number of face moves needed to solve them
+    """
+    corner, edge, (cross_a, cross_b) = SLOTS[slot]
+    start = (corner * 3, (edge * 2, cross_a * 2, cross_b * 2))
+    distances = bytearray([0xF]) * N_PAIR
+    distances[pair_index(*start)] = 0
+    frontier = [start]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for corner_code_, edges in frontier:
+            for corner_moves, edge_moves in zip(CORNER_CODE_MOVES, EDGE_CODE_MOVES):
+                moved = (corner_moves[corner_code_],
+                         (edge_moves[edges[0]], edge_moves[edges[1]], edge_moves[edges[2]]))
+                index = pair_index(*moved)
+                if distances[index] == 0xF:
+                    distances[index] = depth
+                    next_frontier.append(moved)
+        frontier = next_frontier
+    return NibbleTable.from_bytes(distances)
+
+
+def pair_table(slot):
+    """ :return: the pattern database of a slot, loaded from disk or built on first use
+    """
+    if slot not in _tables:
+        _tables[slot] = load_nibble_table("f2l_pair%d_v1.nib" % slot, N_PAIR, lambda: build_pair_table(slot))
+    return _tables[slot]
+
+
+class PairSearch:
+    """ IDA* over the pieces that matter for inserting F2L pairs
+
+    the state is a tuple of corner codes (one per goal slot) and a tuple of edge codes
+    (the 4 cross edges followed by one edge per goal slot)
+    """
+
+    def __init__(self, slots, deadline=None):
+        """
+        :param slots: the slots to insert
+        :param deadline: time.perf_counter() value to give up at, None for no limit
+        """
+        self.slots = tuple(slots)
+        self.deadline = deadline
+        self.cross = cross_table()
+        self.tables = [pair_table(slot) for slot in self.slots]
+        # position of each slot's cross edges in the edge tuple
+        self.cross_positions = [tuple(CROSS_EDGES.index(piece) for piece in SLOTS[slot][2])
+                                for slot in self.slots]
+        self.nodes = 0
+
+    def start(self, cube):
+        """ :return: the search state of a CubieCube
+        """
+        corners = tuple(corner_code(cube, SLOTS[slot][0]) for slot in self.slots)
+        edges = tuple(edge_code(cube, piece) for piece in CROSS_EDGES) \
+            + tuple(edge_code(cube, SLOTS[slot][1]) for slot in self.slots)
+        return corners, edges
+
+    def heuristic(self, corners, edges):
+        h = self.cross[cross_index(edges[:4])]
+        for k, table in enumerate(self.tables):
+            a, b = self.cross_positions[k]
+            h = max(h, table[pair_index(corners[k], (edges[4 + k], edges[a], edges[b]))])
+        return h
+
+    def solve(self, cube):
+        """ find the shortest sequence that solves the cross and every slot of the search
+
+        :param cube: a CubieCube with the cross solved or not
+        :return: list of actions, None if the deadline passed first
+        """
+        return self.solve_codes(*self.start(cube))
+
+    def solve_codes(self, corners, edges):
+        """ solve, see solve, from a search state instead of a cube
+
+        :param corners: corner codes, one per slot of the search
+        :param edges: edge codes of the 4 cross edges, then one per slot of the search
+        :return: list of actions, None if the deadline passed first
+        """
+        bound = self.heuristic(corners, edges)
+        path = []
+        while True:
+            t = self.search(corners, edges, 0, bound, path, NO_MOVE)
+            if t == "FOUND":
+                return path
+            if t == "STOP":
+                return None
+            bound = t
+
+    def search(self, corners, edges, g, bound, path, last):
+        self.nodes += 1
+        if self.deadline is not None and not self.nodes & DEADLINE_MASK and time.perf_counter() > self.deadline:
+            return "STOP"
+        h = self.heuristic(corners, edges)
+        if h == 0:
+            return "FOUND"
+        f = g + h
+        if f > bound:
+            return f
+        minimum = float('inf')
+        for m in NEXT_MOVES[last]:
+            corner_moves = CORNER_CODE_MOVES[m]
+            edge_moves = EDGE_CODE_MOVES[m]
+            path.append(FACE_MOVES[m])
+            t = self.search(tuple([corner_moves[c] for c in corners]), tuple([edge_moves[e] for e in edges]),
+                            g + 1, bound, path, m)
+            if t == "FOUND" or t == "STOP":
+                return t
+            if t < minimum:
+                minimum = t
+            path.pop()
+        return minimum
+
+
+def solved_slots(cube):
+    """ :return: list of the slots whose corner and edge are both solved in a CubieCube
+    """
+    return [slot for slot, (corner, edge, _) in enumerate(SLOTS)
+            if corner_code(cube, corner) == corner * 3 and edge_code(cube, edge) == edge * 2]
+
+
+def slot_distances(cube, slots):
+    """ read the database of each slot, a lower bound on the moves to insert its pair alone
+
+    :param cube: a CubieCube
+    :param slots: slot indices
+    :return: dict slot -> distance, which includes solving the cross edges next to the slot
+    """
+    distances = {}
+    for slot in slots:
+        single = PairSearch([slot])
+        distances[slot] = single.heuristic(*single.start(cube))
+    return distances
+
+
+def f2l_estimate(facelets):
+    """ estimate the F2L length of a cube as the sum of the 4 slot distances
+
+    not a lower bound: a pair can be inserted for free while solving another one
+
+    :param facelets: flat facelet vector of the cube
+    :return: int
+    """
+    return sum(slot_distances(CubieCube.from_facelets(facelets), range(len(SLOTS))).values())
+
+
+def solve_pair(facelets, done, deadline=None):
+    """ insert the cheapest next F2L pair, keeping the cross and the pairs already done
+
+    :param facelets: flat facelet vector of the cube (see facelet.py)
+    :param done: slots that are already solved and must stay solved
+    :param deadline: time.perf_counter() value to give up at, None for no limit
+    :return: (list of actions or None at the deadline, slot that was solved, nodes expanded)
+    """
+    cube = CubieCube.from_facelets(facelets)
+    candidates = [slot for slot in range(len(SLOTS)) if slot not in done]
+    # cheapest slot according to its own database
+    distances = slot_distances(cube, candidates)
+    best = min(candidates, key=distances.get)
+    search = PairSearch(list(done) + [best], deadline)
+    return search.solve(cube), best, search.nodes
+
+
+def solve_f2l(facelets):
+    """ solve the F2L pairs one at a time, each one optimally
+
+    :param facelets: flat facelet vector of a cube (the cross does not need to be solved)
+    :return: list of 4 action lists, one per inserted pair
+    """
+    done = []
+    paths = []
+    while len(done) < len(SLOTS):
+        path, slot, _ = solve_pair(facelets, done)
+        facelets = execute_action_sequence(facelets, path)
+        done.append(slot)
+        paths.append(path)
+    return paths
@@ -0,0 +1,205 @@
+"""
+f2lcases.py
+Module for inserting F2L pairs by looking up their case
+
+A pair whose corner and edge are both in the U layer or in their own slot is one of the
+41 standard F2L cases (149 placements per slot, 41 once the U turn before the algorithm
+is ignored). src/resources/f2l.txt holds one algorithm per case and slot, generated
+offline by generate_algorithms: the shortest sequence that solves the pair while keeping
+the cross and the three other slots, whatever is in them. As in lastlayer.py, the case an
+algorithm solves is read from its permutation with each pre-AUF, so the index maps
+
+    (slot, corner code, edge code) -> (pre-AUF, algorithm)
+
+Pairs stuck in another slot, and cubes without the cross, fall back to the search of
+f2l.py. insert_pair chooses between the two, see F2L_MODES.
+"""
+import os
+
+from .algorithms import algorithm_set
+from .cross import CROSS_EDGES
+from .cross import SOLVED_CODES
+from .cubie import CORNER_CODE_MOVES
+from .cubie import CubieCube
+from .cubie import EDGE_CODE_MOVES
+from .cubie import FACE_MOVES
+from .cubie import corner_code
+from .cubie import edge_code
+from .f2l import PairSearch
+from .f2l import SLOTS
+from .f2l import solve_pair
+from .facelet import IDENTITY
+from .facelet import PERMUTATIONS
+from .facelet import apply_permutation
+from .facelet import compose_permutations
+from .facelet import invert_permutation
+from .lastlayer import SOLVED
+
+# search: each pair by IDA*, cheapest slot first (f2l.solve_pair)
+# table: slots in order, by case lookup when the pair is in a standard case, else by search
+# cheapest: the slot whose case algorithm is the shortest, search only when no pair has a case
+F2L_MODES = ("search", "table", "cheapest")
+
+PRE_AUFS = ((), ("U",), ("U'",), ("U2",))
+AUF_PERMUTATIONS = {auf: PERMUTATIONS[auf[0]] if auf else IDENTITY for auf in PRE_AUFS}
+U_CORNERS = (0, 1, 2, 3)
+U_EDGES = (0, 1, 2, 3)
+U_MOVE = FACE_MOVES.index("U")
+
+_index = {}
+
+
+def case_codes(slot):
+    """ list every placement of a slot's pair in the U layer or its own slot
+
+    :param slot: slot index (0-3, FR FL BL BR)
+    :return: list of (corner code, edge code), the solved pair excluded
+    """
+    corner, edge, _ = SLOTS[slot]
+    codes = [(c * 3 + twist, e * 2 + flip)
+             for c in U_CORNERS + (corner,) for twist in range(3)
+             for e in U_EDGES + (edge,) for flip in range(2)]
+    return [code for code in codes if code != (corner * 3, edge * 2)]
+
+
+def case_representatives(slot):
+    """ :return: one placement per case of a slot, the smallest of its U turns
+    """
+    representatives = set()
+    for corner, edge in case_codes(slot):
+        orbit = [(corner, edge)]
+        for _ in range(3):
+            corner, edge = CORNER_CODE_MOVES[U_MOVE][corner], EDGE_CODE_MOVES[U_MOVE][edge]
+            orbit.append((corner, edge))
+        representatives.add(min(orbit))
+    return sorted(representatives)
+
+
+def generate_algorithms():
+    """ find the shortest algorithm of every case, keeping the cross and the other slots
+
+    takes a few minutes, the result is saved in src/resources/f2l.txt by write_algorithms
+
+    :return: list of action lists, slot by slot
+    """
+    search = PairSearch(range(len(SLOTS)))
+    algorithms = []
+    for slot in range(len(SLOTS)):
+        for corner, edge in case_representatives(slot):
+            corners = [SLOTS[k][0] * 3 for k in range(len(SLOTS))]
+            edges = list(SOLVED_CODES) + [SLOTS[k][1] * 2 for k in range(len(SLOTS))]
+            corners[slot] = corner
+            edges[len(CROSS_EDGES) + slot] = edge
+            algorithms.append(search.solve_codes(tuple(corners), tuple(edges)))
+    return algorithms
+
+
+def write_algorithms(path=None):
+    """ generate the algorithms and write them one per line
+
+    :param path: file to write, src/resources/f2l.txt if None
+    """
+    path = path or os.path.join(os.path.dirname(__file__), "resources", "f2l.txt")
+    lines = [" ".join(alg) + "\n" for alg in generate_algorithms()]
+    with open(path, 'w') as f:
+        f.writelines(lines)
+
+
+def pair_case(cube, slot):
+    """ :return: the index key of a slot's pair in a CubieCube, see the module docstring
+    """
+    corner, edge, _ = SLOTS[slot]
+    return slot, corner_code(cube, corner), edge_code(cube, edge)
+
+
+def cross_solved(cube):
+    """ :return: True if the cross edges of a CubieCube are solved
+    """
+    return tuple(edge_code(cube, piece) for piece in CROSS_EDGES) == SOLVED_CODES
+
+
+def build_index(algorithms):
+    """ map every case the algorithms solve to (pre-AUF, algorithm)
+
+    :param algorithms: an AlgorithmSet
+    :return: dict (slot, corner code, edge code) -> (tuple of AUF moves, tuple of algorithm moves)
+    """
+    index = {}
+    for i in range(len(algorithms)):
+        alg = algorithms[i]
+        perm = algorithms.permutation(i)
+        for pre in PRE_AUFS:
+            # the cube this sequence solves
+            full = compose_permutations(AUF_PERMUTATIONS[pre], perm)
+            cube = CubieCube.from_facelets(apply_permutation(SOLVED, invert_permutation(full)))
+            if not cross_solved(cube):
+                continue
+            unsolved = [slot for slot in range(len(SLOTS)) if pair_case(cube, slot)[1:] != (
+                SLOTS[slot][0] * 3, SLOTS[slot][1] * 2)]
+            if len(unsolved) == 1:
+                index.setdefault(pair_case(cube, unsolved[0]), (pre, alg))
+    return index
+
+
+def case_index():
+    """ :return: the index of the "f2l" algorithm set, built on first use
+    """
+    if not _index:
+        _index.update(build_index(algorithm_set("f2l")))
+    return _index
+
+
+def case_algorithm(cube, slot):
+    """ look up the algorithm inserting a slot's pair
+
+    :param cube: a CubieCube
+    :param slot: slot index
+    :return: list of actions including the pre-AUF, None if the cross is not solved or
+        the pair is not in a standard case
+    """
+    if not cross_solved(cube):
+        return None
+    case = case_index().get(pair_case(cube, slot))
+    if case is None:
+        return None
+    pre, alg = case
+    return list(pre + alg)
+
+
+def insert_pair(facelets, done, mode="cheapest", slot=None, deadline=None):
+    """ insert the next F2L pair, keeping the cross and the pairs already done
+
+    :param facelets: flat facelet vector of the cube (see facelet.py)
+    :param done: slots that are already solved and must stay solved
+    :param mode: one of F2L_MODES
+    :param slot: the slot to insert, None to let the mode pick it. "search" then finds the
+        shortest insertion of that slot, "table" and "cheapest" look it up
+    :param deadline: time.perf_counter() value the searches give up at, None for no limit
+    :return: (list of actions or None at the deadline, slot that was solved, nodes expanded by
+        the search, 0 for a lookup)
+    :raises ValueError: for an unknown mode
+    """
+    if mode not in F2L_MODES:
+        raise ValueError("mode must be one of %s, not %r" % (", ".join(F2L_MODES), mode))
+    if mode == "search" and slot is None:
+        return solve_pair(facelets, done, deadline)
+    cube = CubieCube.from_facelets(facelets)
+    candidates = [slot for slot in range(len(SLOTS)) if slot not in done]
+    if slot is not None or mode == "table":
+        slot = candidates[0] if slot is None else slot
+        alg = case_algorithm(cube, slot) if mode != "search" else None
+        if alg is not None:
+            return alg, slot, 0
+        search = PairSearch(list(done) + [slot], deadline)
+        return search.solve(cube), slot, search.nodes
+
+    algs = {slot: case_algorithm(cube, slot) for slot in candidates}
+    algs = {slot: alg for slot, alg in algs.items() if alg is not None}
+    if not algs:
+        return solve_pair(facelets, done, deadline)
+    slot = min(algs, key=lambda k: len(algs[k]))
+    return algs[slot], slot, 0
+
+
+if __name__ == "__main__":
+    write_algorithms()
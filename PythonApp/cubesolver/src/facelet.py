@@ -0,0 +1,183 @@
+"""
+facelet.py
+Module for the flat facelet (sticker) representation of a 3x3 cube
+
+A flat state is a 54 byte vector holding the color of every sticker. Sticker
+(face, row, col) of the 3d list state lives at index face * 9 + row * 3 + col.
+Every action in ACTIONS_3x3 is precomputed as a 54 entry permutation table, so
+performing an action is a single indexed gather instead of a deepcopy and a
+series of swaps. Whole sequences (algorithms, scrambles) compile down to one
+composed permutation, so replaying them costs the same as a single action.
+"""
+from functools import lru_cache
+from operator import itemgetter
+
+from .actions import ACTIONS_3x3
+from .actions import COMPOSITE_ACTIONS_3x3
+
+SIZE = 3
+N_FACELETS = 6 * SIZE * SIZE
+
+
+def facelet_index(face, row, col):
+    """ convert a 3d list position into a flat facelet index
+
+    :param face: face index of the sticker (0-5)
+    :param row: row index of the sticker on its face
+    :param col: column index of the sticker on its face
+    :return: the index of the sticker in a flat state
+    """
+    return face * SIZE * SIZE + row * SIZE + col
+
+
+def state_to_facelets(state):
+    """ convert a 3d list cube state into a flat facelet vector
+
+    :param state: a 3d list cube state holding integer colors (0-5)
+    :return: bytes of length 54, one color per sticker
+    """
+    return bytes([x for face in state for row in face for x in row])
+
+
+def facelets_to_state(facelets):
+    """ convert a flat facelet vector back into a 3d list cube state
+
+    :param facelets: a sequence of 54 colors (bytes, bytearray, list...)
+    :return: a 3d list cube state usable by Cube
+    """
+    return [[[facelets[face * SIZE * SIZE + row * SIZE + col] for col in range(SIZE)]
+             for row in range(SIZE)] for face in range(6)]
+
+
+def derive_permutation(action_func):
+    """ build the permutation table of an action from its actions.py function
+
+    the function is run once on a state whose stickers are labelled with their own
+    flat index, so the resulting state lists which old sticker lands on each index
+
+    :param action_func: a function from actions.py that modifies a 3d list state
+    :return: tuple perm such that new_facelets[i] == old_facelets[perm[i]]
+    """
+    labelled = facelets_to_state(range(N_FACELETS))
+    action_func(labelled, SIZE - 1)
+    return tuple(x for face in labelled for row in face for x in row)
+
+
+def apply_permutation(facelets, perm):
+    """ permute a flat facelet vector
+
+    :param facelets: bytes holding the current sticker colors
+    :param perm: permutation table to apply
+    :return: bytes holding the permuted sticker colors
+    """
+    return bytes([facelets[i] for i in perm])
+
+
+def invert_permutation(perm):
+    """ build the permutation that undoes perm
+
+    :param perm: a permutation table
+    :return: tuple inverse such that applying perm and then inverse is the identity
+    """
+    inverse = [0] * len(perm)
+    for i, j in enumerate(perm):
+        inverse[j] = i
+    return tuple(inverse)
+
+
+def compose_permutations(first, second):
+    """ combine two permutation tables into one
+
+    :param first: permutation applied first
+    :param second: permutation applied second
+    :return: a permutation equivalent to applying first and then second
+    """
+    return tuple([first[i] for i in second])
+
+
+IDENTITY = tuple(range(N_FACELETS))
+
+
+def build_permutations():
+    """ build the permutation table of every action in ACTIONS_3x3
+
+    base actions come straight from their actions.py function. composite actions
+    (doubles, wide turns, rotations) are compiled from the tables of their parts
+
+    :return: dict mapping each action to its permutation table
+    """
+    perms = {action: derive_permutation(func) for action, func in ACTIONS_3x3.items()
+             if action not in COMPOSITE_ACTIONS_3x3}
+    for action, sequence in COMPOSITE_ACTIONS_3x3.items():
+        perm = IDENTITY
+        for part in sequence:
+            perm = compose_permutations(perm, perms[part])
+        perms[action] = perm
+    return {action: perms[action] for action in ACTIONS_3x3}
+
+
+PERMUTATIONS = build_permutations()
+
+# itemgetters are the fastest pure python gather, used on the hot path
+GATHERS = {action: itemgetter(*perm) for action, perm in PERMUTATIONS.items()}
+INVERSE_GATHERS = {action: itemgetter(*invert_permutation(perm)) for action, perm in PERMUTATIONS.items()}
+
+
+def parse_sequence(actions):
+    """ normalize a move sequence into the hashable form used as a cache key
+
+    :param actions: a space separated string or a list/tuple of actions
+    :return: tuple of actions
+    """
+    if isinstance(actions, str):
+        return tuple(actions.split())
+    return tuple(actions)
+
+
+@lru_cache(maxsize=4096)
+def _compile(actions):
+    perm = IDENTITY
+    for action in actions:
+        perm = compose_permutations(perm, PERMUTATIONS[action])
+    return perm, itemgetter(*perm)
+
+
+def compile_sequence(actions):
+    """ compile a sequence of actions into one permutation table
+
+    results are kept in an LRU cache keyed on the sequence, so algorithms that are
+    replayed many times (OLL/PLL lines, AUF variants) are only composed once
+
+    :param actions: a space separated string or a list/tuple of actions
+    :return: tuple perm such that applying it equals applying every action in order
+    """
+    return _compile(parse_sequence(actions))[0]
+
+
+def compile_gather(actions):
+    """ compile a sequence of actions into a gather function
+
+    :param actions: a space separated string or a list/tuple of actions
+    :return: a function taking a facelet sequence and returning the permuted stickers as a tuple
+    """
+    return _compile(parse_sequence(actions))[1]
+
+
+def execute_action(facelets, action):
+    """ simulates a turn or rotation on a flat facelet vector
+
+    :param facelets: bytes holding the current sticker colors
+    :param action: string representation of the action in 3x3 Rubiks notation
+    :return: bytes holding the sticker colors after the action
+    """
+    return bytes(GATHERS[action](facelets))
+
+
+def execute_action_sequence(facelets, actions):
+    """ simulates a sequence of actions on a flat facelet vector with one gather
+
+    :param facelets: bytes holding the current sticker colors
+    :param actions: a space separated string or a list/tuple of actions
+    :return: bytes holding the sticker colors after the sequence
+    """
+    return bytes(compile_gather(actions)(facelets))
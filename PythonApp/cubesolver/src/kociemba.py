@@ -0,0 +1,280 @@
+"""
+kociemba.py
+Module for Kociemba's two-phase algorithm
+
+Phase 1 brings the cube into the subgroup G1 = <U, D, R2, L2, F2, B2>, where every
+corner and edge is oriented and the FR, FL, BL, BR edges are in the middle layer.
+Phase 2 solves the cube using only the moves of G1. Both phases run IDA* on
+coordinates (see cubie.py) with pruning tables built by breadth first search:
+
+- phase 1: slice * twist and slice * flip (about 1M entries each)
+- phase 2: slice order * corners and slice order * U/D edges (967,680 entries each)
+
+The tables are cached on disk (see tables.py). Once a solution is found, phase 1 keeps
+going deeper with a tighter bound for phase 2, so the solution gets shorter until the
+target length or the time budget is reached.
+"""
+import time
+
+from .cubie import CubieCube
+from .cubie import FACE_MOVES
+from .cubie import MOVE_CUBES
+from .cubie import N_CORNERS_PERM
+from .cubie import N_FLIP
+from .cubie import N_MOVES
+from .cubie import N_SLICE
+from .cubie import N_TWIST
+from .cubie import N_UD_EDGES
+from .cubie import PHASE2_MOVES
+from .cubie import move_table
+from .search import next_moves
+from .tables import NibbleTable
+from .tables import load_nibble_table
+
+N_SLICE_PERM = 24  # order of the 4 UD-slice edges once they are in the middle layer
+
+# moves allowed after each move (the last entry is for the first move), see search.next_moves
+NEXT_MOVES = next_moves(FACE_MOVES)
+NEXT_PHASE2_MOVES = tuple(tuple(m for m in moves if m in PHASE2_MOVES) for moves in NEXT_MOVES)
+NO_MOVE = N_MOVES
+IS_PHASE2_MOVE = tuple(m in PHASE2_MOVES for m in range(N_MOVES))
+
+
+def build_pruning_table(coord_table, n_coord, moves, slice_factor):
+    """ breadth first search over a coordinate combined with the UD-slice edges
+
+    the index of a state is slice * n_coord + coord. the slice is read from the slice_sorted
+    move table divided by slice_factor, so the same table serves the phase 1 slice
+    (factor 24, positions only) and the phase 2 slice order (factor 1)
+
+    :param coord_table: move table of the coordinate
+    :param n_coord: number of values of the coordinate
+    :param moves: indices of the moves to search with
+    :param slice_factor: scale of the slice coordinate in the slice_sorted table
+    :return: NibbleTable of the number of moves needed to reach index 0
+    """
+    slice_table = move_table("slice_sorted")
+    size = n_coord * (N_SLICE if slice_factor > 1 else N_SLICE_PERM)
+    distances = bytearray([0xF]) * size
+    distances[0] = 0
+    frontier = [0]
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = []
+        for index in frontier:
+            slice_, coord = divmod(index, n_coord)
+            slice_row = slice_ * slice_factor * N_MOVES
+            coord_row = coord * N_MOVES
+            for m in moves:
+                moved = slice_table[slice_row + m] // slice_factor * n_coord + coord_table[coord_row + m]
+                if distances[moved] == 0xF:
+                    distances[moved] = depth
+                    next_frontier.append(moved)
+        frontier = next_frontier
+    return NibbleTable.from_bytes(distances)
+
+
+def pruning_table(name, coord, n_coord, moves, slice_factor):
+    """ load a pruning table, see build_pruning_table
+
+    :return: bytearray with one distance per byte
+    """
+    size = n_coord * (N_SLICE if slice_factor > 1 else N_SLICE_PERM)
+    table = load_nibble_table(name, size,
+                              lambda: build_pruning_table(move_table(coord), n_coord, moves, slice_factor))
+    return table.unpack()
+
+
+class TwoPhaseSolver:
+    """ Kociemba's two-phase solver, see the module docstring
+
+    tables are loaded once when the solver is created, so reuse one solver for many cubes
+    """
+
+    def __init__(self):
+        all_moves = tuple(range(N_MOVES))
+        self.twist_move = move_table("twist")
+        self.flip_move = move_table("flip")
+        self.slice_move = move_table("slice_sorted")
+        self.corners_move = move_table("corners")
+        self.ud_edges_move = move_table("ud_edges")
+        # the slice coordinate is slice_sorted // 24, both come from the same move table
+        self.slice_twist = pruning_table("kociemba_slice_twist_v1.nib", "twist", N_TWIST,
+                                         all_moves, N_SLICE_PERM)
+        self.slice_flip = pruning_table("kociemba_slice_flip_v1.nib", "flip", N_FLIP,
+                                        all_moves, N_SLICE_PERM)
+        self.slice_corners = pruning_table("kociemba_slice_corners_v1.nib", "corners", N_CORNERS_PERM,
+                                           PHASE2_MOVES, 1)
+        self.slice_edges = pruning_table("kociemba_slice_edges_v1.nib", "ud_edges", N_UD_EDGES,
+                                         PHASE2_MOVES, 1)
+        self.nodes = 0
+        self.first_length = None  # length of the first solution of the last solve, before improving it
+
+    def solve(self, facelets, target_length=21, time_budget=1.0, max_length=30):
+        """ find a short solution, shorter ones are searched for until a stop condition is met
+
+        the search stops as soon as a solution of at most target_length moves is found, or when
+        time_budget is used up and some solution was found
+
+        :param facelets: flat facelet vector of the cube (see facelet.py)
+        :param target_length: number of moves that is good enough
+        :param time_budget: seconds to spend improving the solution
+        :param max_length: longest solution accepted
+        :return: list of face turns
+        :raises ValueError: if the facelets do not describe a solvable cube
+        """
+        cube = CubieCube.from_facelets(facelets)
+        if not cube.is_solvable():
+            raise ValueError("the cube cannot be solved, it was not built with valid moves")
+        self.cube = cube
+        self.deadline = time.perf_counter() + time_budget
+        self.target_length = target_length
+        self.best = None
+        self.first_length = None
+        self.max_length = max_length
+        self.nodes = 0
+
+        twist = cube.get_twist()
+        flip = cube.get_flip()
+        slice_sorted = cube.get_slice_sorted()
+        corners = cube.get_corners()
+        path = []
+        depth = self.phase1_distance(twist, flip, slice_sorted // N_SLICE_PERM)
+        while depth <= self.max_length:
+            if self.phase1(twist, flip, slice_sorted, corners, depth, path, NO_MOVE) == "STOP":
+                break
+            depth += 1
+        return [FACE_MOVES[m] for m in self.best] if self.best is not None else None
+
+    def phase1_distance(self, twist, flip, slice_):
+        a = self.slice_twist[slice_ * N_TWIST + twist]
+        b = self.slice_flip[slice_ * N_FLIP + flip]
+        return a if a > b else b
+
+    def phase2_distance(self, corners, ud_edges, slice_perm):
+        a = self.slice_corners[slice_perm * N_CORNERS_PERM + corners]
+        b = self.slice_edges[slice_perm * N_UD_EDGES + ud_edges]
+        return a if a > b else b
+
+    def phase1(self, twist, flip, slice_sorted, corners, togo, path, last):
+        """ depth limited search for phase 1 solutions of exactly len(path) + togo moves
+
+        children are only visited when the pruning tables allow them to reach G1 in time,
+        which avoids most function calls. a phase 1 solution ending with a G1 move is skipped,
+        it was already tried one level shallower
+
+        :return: "STOP" when the search is over, else None
+        """
+        self.nodes += 1
+        if togo == 0:
+            return self.start_phase2(corners, slice_sorted, path)
+        slice_twist = self.slice_twist
+        slice_flip = self.slice_flip
+        twist_move = self.twist_move
+        flip_move = self.flip_move
+        slice_move = self.slice_move
+        twist_row = twist * N_MOVES
+        flip_row = flip * N_MOVES
+        slice_row = slice_sorted * N_MOVES
+        corners_row = corners * N_MOVES
+        togo -= 1
+        for m in NEXT_MOVES[last]:
+            if togo == 0 and IS_PHASE2_MOVE[m]:
+                continue
+            new_twist = twist_move[twist_row + m]
+            new_flip = flip_move[flip_row + m]
+            new_slice = slice_move[slice_row + m]
+            slice_ = new_slice // N_SLICE_PERM
+            if slice_twist[slice_ * N_TWIST + new_twist] > togo or slice_flip[slice_ * N_FLIP + new_flip] > togo:
+                continue
+            path.append(m)
+            result = self.phase1(new_twist, new_flip, new_slice, self.corners_move[corners_row + m],
+                                 togo, path, m)
+            path.pop()
+            if result == "STOP":
+                return result
+        return None
+
+    def start_phase2(self, corners, slice_perm, path):
+        """ run phase 2 from the end of a phase 1 solution, keeping it if it is the best so far
+        """
+        if time.perf_counter() > self.deadline and self.best is not None:
+            return "STOP"
+        limit = self.max_length - len(path)
+        if self.slice_corners[slice_perm * N_CORNERS_PERM + corners] > limit:
+            return None
+
+        # the U/D edge permutation is only a valid coordinate in G1, so replay the edges here
+        cube = self.cube.copy()
+        for m in path:
+            cube.edge_multiply(MOVE_CUBES[m])
+        ud_edges = cube.get_ud_edges()
+
+        last = path[-1] if path else NO_MOVE
+        depth = self.phase2_distance(corners, ud_edges, slice_perm)
+        phase2_path = []
+        while depth <= limit:
+            if self.phase2(corners, ud_edges, slice_perm, depth, phase2_path, last):
+                self.best = path + phase2_path
+                if self.first_length is None:
+                    self.first_length = len(self.best)
+                self.max_length = len(self.best) - 1
+                if len(self.best) <= self.target_length:
+                    return "STOP"
+                return None
+            depth += 1
+        return None
+
+    def phase2(self, corners, ud_edges, slice_perm, togo, path, last):
+        """ depth limited search for phase 2 solutions of at most togo moves
+
+        :return: True if the cube is solved at the end of path
+        """
+        self.nodes += 1
+        if corners == 0 and ud_edges == 0 and slice_perm == 0:
+            return True
+        slice_corners = self.slice_corners
+        slice_edges = self.slice_edges
+        corners_move = self.corners_move
+        ud_edges_move = self.ud_edges_move
+        slice_move = self.slice_move
+        corners_row = corners * N_MOVES
+        edges_row = ud_edges * N_MOVES
+        slice_row = slice_perm * N_MOVES
+        togo -= 1
+        for m in NEXT_PHASE2_MOVES[last]:
+            new_corners = corners_move[corners_row + m]
+            new_slice = slice_move[slice_row + m]
+            if slice_corners[new_slice * N_CORNERS_PERM + new_corners] > togo:
+                continue
+            new_edges = ud_edges_move[edges_row + m]
+            if slice_edges[new_slice * N_UD_EDGES + new_edges] > togo:
+                continue
+            path.append(m)
+            if self.phase2(new_corners, new_edges, new_slice, togo, path, m):
+                return True
+            path.pop()
+        return False
+
+
+_solver = []
+
+
+def two_phase_solver():
+    """ :return: the TwoPhaseSolver shared by this process, created on first use
+    """
+    if not _solver:
+        _solver.append(TwoPhaseSolver())
+    return _solver[0]
+
+
+def solve(facelets, target_length=21, time_budget=1.0):
+    """ solve a cube with the two-phase algorithm, see TwoPhaseSolver.solve
+
+    :param facelets: flat facelet vector of the cube (see facelet.py)
+    :param target_length: number of moves that is good enough
+    :param time_budget: seconds to spend improving the solution
+    :return: list of face turns
+    """
+    return two_phase_solver().solve(facelets, target_length, time_budget)
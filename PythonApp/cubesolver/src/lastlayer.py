@@ -0,0 +1,168 @@
+"""
+lastlayer.py
+Module for looking up OLL and PLL algorithms by last layer case
+
+Once F2L is done, the only thing that matters for OLL is which last layer stickers
+show the top color, and for PLL the colors of the 12 side stickers of the last layer.
+The permutation of every algorithm (see algorithms.py) is composed once with each AUF
+(U turn) before it and, for PLL, after it. From the permutation we read
+the case it solves, so the indexes map a case signature straight to its algorithm:
+
+- OLL: sorted last layer sticker indices that show the top color -> (pre-AUF, algorithm)
+- PLL: colors of the 12 last layer side stickers -> (pre-AUF, algorithm, post-AUF)
+
+The indexes are built on first use and kept for the life of the process. When several
+algorithms solve the same case, the first one in the file wins, tried with the AUFs in
+the same order as the old trial and error search.
+"""
+from .algorithms import algorithm_set
+from .cube import solved_state_ints
+from .facelet import IDENTITY
+from .facelet import PERMUTATIONS
+from .facelet import compose_permutations
+from .facelet import facelet_index
+from .facelet import state_to_facelets
+
+TOP = 5  # face index of the last layer
+SOLVED = state_to_facelets(solved_state_ints)
+TOP_CENTER = facelet_index(TOP, 1, 1)
+CENTERS = tuple(facelet_index(face, 1, 1) for face in range(6))
+LAST_LAYER_TOP = tuple(facelet_index(TOP, row, col) for row in range(3) for col in range(3))
+LAST_LAYER_SIDES = tuple(facelet_index(face, 0, col) for face in range(1, 5) for col in range(3))
+LAST_LAYER = frozenset(LAST_LAYER_TOP + LAST_LAYER_SIDES)
+
+OLL_PRE_AUFS = ((), ("U",), ("U'",), ("U2",))
+PLL_PRE_AUFS = ((), ("U",), ("U2",), ("U'",))
+PLL_POST_AUFS = ((), ("U",), ("U'",), ("U2",))
+AUF_PERMUTATIONS = {auf: PERMUTATIONS[auf[0]] if auf else IDENTITY for auf in OLL_PRE_AUFS}
+
+_indexes = {}
+
+
+def required_state(perm, goal_positions):
+    """ find the stickers a cube needs so that perm leaves the goal positions solved
+
+    solved means matching the center of the face, wherever the centers end up, so
+    algorithms with slice moves or rotations are handled too
+
+    :param perm: facelet permutation of the whole sequence
+    :param goal_positions: facelet indices that must be solved afterwards
+    :return: dict facelet index -> color, for the stickers that are constrained
+    """
+    required = {}
+    for i in goal_positions:
+        center = perm[i - i % 9 + 4]
+        required[perm[i]] = SOLVED[center]
+    return required
+
+
+def keeps_first_layers(required):
+    """ :return: True if a cube with F2L done meets every requirement outside the last layer
+    """
+    return all(i in required and required[i] == SOLVED[i] for i in range(len(SOLVED)) if i not in LAST_LAYER)
+
+
+def oll_signature(facelets):
+    """ :return: the OLL case key of a cube with F2L done, see the module docstring
+    """
+    top = facelets[TOP_CENTER]
+    return tuple(i for i in sorted(LAST_LAYER) if facelets[i] == top)
+
+
+def pll_signature(facelets):
+    """ :return: the PLL case key of a cube with OLL done, see the module docstring
+
+    colors are relabeled to the solved scheme through the centers, so the key does not
+    depend on the color scheme or on the orientation of the cube
+    """
+    relabel = {facelets[center]: SOLVED[center] for center in CENTERS}
+    return bytes(relabel[facelets[i]] for i in LAST_LAYER_SIDES)
+
+
+def build_oll_index(algorithms):
+    """ map every OLL case the algorithms solve to (pre-AUF, algorithm)
+
+    :param algorithms: an AlgorithmSet
+    :return: dict signature -> (tuple of AUF moves, tuple of algorithm moves)
+    """
+    goal = [i for i in range(len(SOLVED)) if i not in LAST_LAYER_SIDES]
+    index = {}
+    for i in range(len(algorithms)):
+        alg = algorithms[i]
+        perm = algorithms.permutation(i)
+        for pre in OLL_PRE_AUFS:
+            required = required_state(compose_permutations(AUF_PERMUTATIONS[pre], perm), goal)
+            if not keeps_first_layers(required):
+                continue
+            top = SOLVED[TOP_CENTER]
+            signature = tuple(i for i in sorted(LAST_LAYER) if required.get(i) == top)
+            index.setdefault(signature, (pre, alg))
+    return index
+
+
+def build_pll_index(algorithms):
+    """ map every PLL case the algorithms solve to (pre-AUF, algorithm, post-AUF)
+
+    :param algorithms: an AlgorithmSet
+    :return: dict signature -> (tuple of AUF moves, tuple of algorithm moves, tuple of AUF moves)
+    """
+    goal = range(len(SOLVED))
+    index = {}
+    for i in range(len(algorithms)):
+        alg = algorithms[i]
+        perm = algorithms.permutation(i)
+        for pre in PLL_PRE_AUFS:
+            for post in PLL_POST_AUFS:
+                full = compose_permutations(compose_permutations(AUF_PERMUTATIONS[pre], perm),
+                                            AUF_PERMUTATIONS[post])
+                required = required_state(full, goal)
+                if not keeps_first_layers(required) or \
+                        any(required[i] != SOLVED[TOP_CENTER] for i in LAST_LAYER_TOP):
+                    continue
+                signature = bytes(required[i] for i in LAST_LAYER_SIDES)
+                index.setdefault(signature, (pre, alg, post))
+    return index
+
+
+def oll_index():
+    """ :return: the OLL index of the "oll" algorithm set, built on first use
+    :raises IOError: if the algorithm file can not be read
+    """
+    if "oll" not in _indexes:
+        _indexes["oll"] = build_oll_index(algorithm_set("oll"))
+    return _indexes["oll"]
+
+
+def pll_index():
+    """ :return: the PLL index of the "pll" algorithm set, built on first use
+    :raises IOError: if the algorithm file can not be read
+    """
+    if "pll" not in _indexes:
+        _indexes["pll"] = build_pll_index(algorithm_set("pll"))
+    return _indexes["pll"]
+
+
+def oll_algorithm(facelets):
+    """ look up the OLL algorithm of a cube with F2L done
+
+    :param facelets: flat facelet vector of the cube
+    :return: list of moves including the pre-AUF, None if no algorithm solves the case
+    """
+    case = oll_index().get(oll_signature(facelets))
+    if case is None:
+        return None
+    pre, alg = case
+    return list(pre + alg)
+
+
+def pll_algorithm(facelets):
+    """ look up the PLL algorithm of a cube with OLL done
+
+    :param facelets: flat facelet vector of the cube
+    :return: list of moves including both AUFs, None if no algorithm solves the case
+    """
+    case = pll_index().get(pll_signature(facelets))
+    if case is None:
+        return None
+    pre, alg, post = case
+    return list(pre + alg + post)
@@ -0,0 +1,102 @@
+"""
+masks.py
+Module for goal tests as masked comparisons of flat facelet vectors, and the sticker sets
+the goal tests and CFOP heuristics look at
+
+A goal such as "solved" or "solved but the last layer sides" is the set of stickers that
+must match the center of their face. Instead of comparing those stickers one at a time,
+the cube is compared with the solved cube of the same center colors in a few C level
+operations:
+
+- solved: one bytes equality with the target
+- partial goals: the facelets and the target read as 54 byte integers, xor-ed and masked
+
+Targets are cached by center colors, so rotations and slice moves are handled too.
+The heuristics count unsolved groups of stickers (an edge, a slot...), which plain
+indexing (solver.py) does faster than masks one cube at a time. BatchCube (batch.py)
+evaluates the goal tests and the heuristics on a whole batch of cubes at once.
+"""
+from .facelet import N_FACELETS
+from .facelet import facelet_index
+
+CENTERS = slice(4, N_FACELETS, 9)  # facelets[CENTERS] are the 6 center colors, face by face
+# stickers checked by goal_test_oll: everything but the top row of the four side faces
+OLL_STICKERS = tuple(i for i in range(N_FACELETS) if not (1 <= i // 9 <= 4 and i % 9 < 3))
+
+# flat facelet indices of the stickers the CFOP heuristics look at
+BOTTOM = facelet_index(0, 1, 1)
+# (side edge sticker, side center, bottom edge sticker) for each cross edge
+CROSS_EDGES = ((facelet_index(1, 2, 1), facelet_index(1, 1, 1), facelet_index(0, 0, 1)),
+               (facelet_index(2, 2, 1), facelet_index(2, 1, 1), facelet_index(0, 1, 2)),
+               (facelet_index(3, 2, 1), facelet_index(3, 1, 1), facelet_index(0, 2, 1)),
+               (facelet_index(4, 2, 1), facelet_index(4, 1, 1), facelet_index(0, 1, 0)))
+TOP_EDGES = (facelet_index(5, 0, 1), facelet_index(5, 2, 1), facelet_index(5, 1, 0), facelet_index(5, 1, 2))
+TOP_CORNERS = (facelet_index(5, 0, 2), facelet_index(5, 2, 0), facelet_index(5, 0, 0), facelet_index(5, 2, 2))
+SIDE_BOTTOM_CORNERS = tuple(facelet_index(face, 2, col) for face in range(1, 5) for col in (0, 2))
+# (bottom corner sticker, ((sticker, center), ...)) for the corner and edge of each F2L slot
+F2L_SLOTS = ((facelet_index(0, 0, 0), ((facelet_index(4, 2, 2), facelet_index(4, 1, 1)),
+                                       (facelet_index(1, 2, 0), facelet_index(1, 1, 1)),
+                                       (facelet_index(4, 1, 2), facelet_index(4, 1, 1)),
+                                       (facelet_index(1, 1, 0), facelet_index(1, 1, 1)))),
+             (facelet_index(0, 0, 2), ((facelet_index(1, 2, 2), facelet_index(1, 1, 1)),
+                                       (facelet_index(2, 2, 0), facelet_index(2, 1, 1)),
+                                       (facelet_index(1, 1, 2), facelet_index(1, 1, 1)),
+                                       (facelet_index(2, 1, 0), facelet_index(2, 1, 1)))),
+             (facelet_index(0, 2, 2), ((facelet_index(2, 2, 2), facelet_index(2, 1, 1)),
+                                       (facelet_index(3, 2, 0), facelet_index(3, 1, 1)),
+                                       (facelet_index(2, 1, 2), facelet_index(2, 1, 1)),
+                                       (facelet_index(3, 1, 0), facelet_index(3, 1, 1)))),
+             (facelet_index(0, 2, 0), ((facelet_index(3, 2, 2), facelet_index(3, 1, 1)),
+                                       (facelet_index(4, 2, 0), facelet_index(4, 1, 1)),
+                                       (facelet_index(3, 1, 2), facelet_index(3, 1, 1)),
+                                       (facelet_index(4, 1, 0), facelet_index(4, 1, 1)))))
+
+_targets = {}  # center colors -> (target bytes, target int)
+_last = [None, None]  # the center colors and target of the last call
+
+
+def sticker_mask(indices):
+    """ :return: int with 0xFF at each sticker index of a facelet vector read big endian
+    """
+    mask = 0
+    for i in indices:
+        mask |= 0xFF << ((N_FACELETS - 1 - i) * 8)
+    return mask
+
+
+OLL_MASK = sticker_mask(OLL_STICKERS)
+
+
+def target(facelets):
+    """ the solved cube with the same centers
+
+    :param facelets: flat facelet vector, bytes or bytearray
+    :return: (bytes, the same read as a big endian int)
+    """
+    centers = facelets[CENTERS]
+    if centers != _last[0]:  # searches only move the centers for rotations and slice moves
+        key = bytes(centers)
+        if key not in _targets:
+            solved = bytes(key[i // 9] for i in range(N_FACELETS))
+            _targets[key] = solved, int.from_bytes(solved, 'big')
+        _last[:] = key, _targets[key]
+    return _last[1]
+
+
+def is_solved(facelets):
+    """ :return: True if every sticker matches its center
+    """
+    return facelets == target(facelets)[0]
+
+
+def difference(facelets):
+    """ :return: the facelets xor the target as an int, a non zero byte for every sticker not
+        matching its center
+    """
+    return int.from_bytes(facelets, 'big') ^ target(facelets)[1]
+
+
+def matches(facelets, mask):
+    """ :return: True if every sticker of a sticker_mask matches its center
+    """
+    return not difference(facelets) & mask
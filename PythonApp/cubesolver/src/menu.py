@@ -9,14 +9,23 @@ import os
 from .actions import ACTIONS_3x3
 from .cube import solved_state_ints
 from .cube import Cube
+from .optimal import BUILD_COMMAND
+from .optimal import databases_ready
+from .solvecache import solve_cache
 from .solver import Node
 from .solver import solve_cfop
+from .solver import solve_kociemba
+from .solver import solve_optimal
 
 
 def clear():
     os.system("clear")
 
 
+def print_search_progress(depth, nodes, seconds):
+    print("depth %d, %d nodes, %.0f s" % (depth, nodes, seconds), flush=True)
+
+
 def menu_loop():
     """ Starts a menu loop that accepts commands and runs until the user quits
     """
@@ -28,6 +37,7 @@ def menu_loop():
     time_taken = 0.0
     help_toggle = False
     text_display_toggle = False
+    cache = None
 
     # gen root and set to start puzzle
     solved_cube = Cube(start_state)
@@ -36,7 +46,7 @@ def menu_loop():
 
     while True:
         display_menu(old_root, root, scramble_sequence, user_moves, solution_sequence, time_taken,
-                     seed, help_toggle, text_display_toggle)
+                     seed, help_toggle, text_display_toggle, cache)
         if seed is not None:
             random.seed(int(seed))
         else:
@@ -65,20 +75,32 @@ def menu_loop():
         elif command == '3':
             old_root = Node(root.cube, None, None)
             print("Solving...")
-            solution_sequence, root = solve_cfop(root)
+            solution_sequence, root = solve_cfop(root, cache=cache)
         elif command == '4':
             print("Enter a seed integer:  ", end="")
             seed = int(input())
         elif command == '5':
             seed = None
-        # elif command == '6':
-        #     old_root = Node(root.cube, None, None)
-        #     print("Solving...")
-        #     solution_sequence, root = solve_kociemba(root)
+        elif command == '6':
+            old_root = Node(root.cube, None, None)
+            print("Solving...")
+            solution_sequence, root = solve_kociemba(root, cache=cache)
+        elif command == '7':
+            if not databases_ready():
+                print("The optimal solver needs its pattern databases, which take hours to build.")
+                print("Build them first with: %s (from the cubesolver directory)" % BUILD_COMMAND)
+                print("Press Enter to continue", end="")
+                input()
+                continue
+            old_root = Node(root.cube, None, None)
+            print("Solving, this can take hours...")
+            solution_sequence, root = solve_optimal(root, print_search_progress, cache=cache)
         elif command == 'Q' or command == 'q':
             exit()
         elif command == 'T' or command == "t":
             text_display_toggle = not text_display_toggle
+        elif command == 'C' or command == "c":
+            cache = solve_cache() if cache is None else None
         command_list = command.split()
         if set(command_list).issubset(set(ACTIONS_3x3)):
             old_root = Node(root.cube, None, None)
@@ -91,7 +113,7 @@ def menu_loop():
 
 def display_menu(old_node, node, scramble_sequence="", user_moves="",
                  solution_sequence="", time_taken="0.00", seed="",
-                 help_toggle=False, is_text_mode=False):
+                 help_toggle=False, is_text_mode=False, cache=None):
     """ Clear console and display the updated menu
 
     :param old_node: a Node containing the "previous" cube state
@@ -103,6 +125,7 @@ def display_menu(old_node, node, scramble_sequence="", user_moves="",
     :param seed: optional random seed integer
     :param help_toggle: boolean to toggle help menu for moves
     :param is_text_mode: boolean to toggle text vs color display mode
+    :param cache: the SolveCache the solves use, None if it is off
     """
     clear()
     if seed is None:
@@ -125,10 +148,12 @@ def display_menu(old_node, node, scramble_sequence="", user_moves="",
     print("3. CFOP Solve")
     print("4. Set Random Seed")
     print("5. Remove Random Seed")
-    # print("6. Kociemba Solve")
+    print("6. Kociemba Solve")
+    print("7. Optimal Solve")
     print()
     print("H. Toggle Move Help")
     print("T. Toggle Text Mode")
+    print("C. Toggle Solve Cache")
     print("Q. Quit")
     print("------------------ Before -------------------")
     if is_text_mode:
@@ -145,6 +170,10 @@ def display_menu(old_node, node, scramble_sequence="", user_moves="",
     print("Random seed        : ", seed)
     print("Current scramble   : ", " ".join(scramble_sequence))
     print("Move History       : ", " ".join(user_moves))
+    if cache is not None:
+        cache_stats = cache.stats()
+        print("Solve cache        :  %d solutions, %d hits out of %d solves" %
+              (cache_stats["size"], cache_stats["hits"], cache_stats["hits"] + cache_stats["misses"]))
     print("Solution sequence  :  ", end="")
     for idx, move in enumerate(solution_sequence):
         if idx % 25 == 0 and idx > 0:
@@ -0,0 +1,80 @@
+"""
+neutral.py
+Module for color neutral CFOP: picking the face to build the cross on
+
+The solver always builds the cross on the bottom face. Any other face can be brought
+to the bottom with a whole cube rotation first, which changes the cross and every phase
+after it. For each candidate face the optimal cross is read from the cross pattern
+database (cross.py) and the F2L that follows is estimated from the pair databases
+(f2l.py). The face with the lowest cross + estimate wins. Candidates are evaluated
+concurrently on a process pool, or in this process when there is only one worker.
+
+Faces are named by their position before the rotation: D, U, F, B, R, L.
+"""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import os
+
+from .cross import solve_cross
+from .f2l import f2l_estimate
+from .facelet import execute_action_sequence
+
+# rotation that brings each face to the bottom
+CROSS_ROTATIONS = {"D": (), "U": ("x2",), "F": ("x'",), "B": ("x",), "R": ("z",), "L": ("z'",)}
+FACES = tuple(CROSS_ROTATIONS)
+
+CrossCandidate = namedtuple("CrossCandidate", ("face", "rotation", "cross", "f2l_estimate"))
+CrossCandidate.__doc__ = """ the cross of one candidate face
+
+face: face the cross is built on, named before the rotation
+rotation: tuple of rotations bringing that face to the bottom
+cross: list of actions solving the cross after the rotation
+f2l_estimate: estimated F2L length after the cross, see f2l.f2l_estimate
+"""
+
+
+def evaluate_face(facelets, face):
+    """ solve the cross on one face and estimate the F2L after it
+
+    :param facelets: flat facelet vector of the cube
+    :param face: one of FACES
+    :return: CrossCandidate
+    """
+    rotation = CROSS_ROTATIONS[face]
+    rotated = execute_action_sequence(facelets, rotation) if rotation else bytes(facelets)
+    cross = solve_cross(rotated)
+    return CrossCandidate(face, rotation, cross, f2l_estimate(execute_action_sequence(rotated, cross)))
+
+
+def candidate_cost(candidate):
+    """ :return: cross length + estimated F2L length of a CrossCandidate
+    """
+    return len(candidate.cross) + candidate.f2l_estimate
+
+
+def evaluate_faces(facelets, faces=FACES, workers=None):
+    """ evaluate several cross faces at once
+
+    :param facelets: flat facelet vector of the cube
+    :param faces: faces to try, a subset of FACES
+    :param workers: number of processes, one per CPU (at most one per face) if None. 1 runs in this process
+    :return: list of CrossCandidate, in the order of faces
+    :raises ValueError: for an unknown face
+    """
+    unknown = [face for face in faces if face not in CROSS_ROTATIONS]
+    if unknown:
+        raise ValueError("unknown cross faces: %s" % " ".join(unknown))
+    workers = min(workers or os.cpu_count() or 1, len(faces))
+    facelets = bytes(facelets)
+    if workers <= 1:
+        return [evaluate_face(facelets, face) for face in faces]
+    with ProcessPoolExecutor(workers) as executor:
+        return list(executor.map(evaluate_face, [facelets] * len(faces), faces))
+
+
+def best_cross(facelets, faces=FACES, workers=None):
+    """ pick the face whose cross + estimated F2L is the cheapest, the first of faces on a tie
+
+    :return: CrossCandidate, see evaluate_faces for the parameters
+    """
+    return min(evaluate_faces(facelets, faces, workers), key=candidate_cost)
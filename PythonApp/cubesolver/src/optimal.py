@@ -0,0 +1,347 @@
+"""
+optimal.py
+Module for Korf's optimal solver: IDA* with corner and edge pattern databases
+
+Every solution returned has the fewest face turns possible (20 at most). The search runs
+on the cubie model (see cubie.py) with the maximum of three pattern databases as its
+admissible heuristic:
+
+- corners: the permutation and twist of the 8 corners, 8! * 3^7 = 88,179,840 entries
+- two edge groups of 7 edges (UR..DF and DF..BR), 12! / 5! * 2^7 = 510,935,040 entries each
+
+The databases are built by a breadth first search split over worker processes: each
+depth is scanned in chunks of a table kept in shared memory, the workers expand the
+states of the current depth and the parent process marks the new ones. They are saved
+nibble packed (about 44 MB and 2 * 255 MB) and memory-mapped when loaded (see tables.py).
+Building them takes hours in Python, the edge tables far longer than the corners, so
+do it once ahead of time: python3 -m src.optimal [workers] from the cubesolver directory.
+Deep positions can still take hours to solve, so the solver reports its progress.
+"""
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import as_completed
+from multiprocessing.shared_memory import SharedMemory
+import os
+import sys
+import time
+
+from .cross import edges_index
+from .cross import edges_unrank
+from .cubie import CubieCube
+from .cubie import EDGE_CODE_MOVES
+from .cubie import FACE_MOVES
+from .cubie import N_CORNERS_PERM
+from .cubie import N_MOVES
+from .cubie import N_TWIST
+from .cubie import edge_code
+from .cubie import move_table
+from .search import next_moves
+from .tables import UNKNOWN
+from .tables import NibbleTable
+from .tables import load_nibble_table
+from .tables import table_path
+
+N_CORNER_STATES = N_CORNERS_PERM * N_TWIST
+EDGE_GROUPS = ((0, 1, 2, 3, 4, 5, 6), (5, 6, 7, 8, 9, 10, 11))
+SOLVED_EDGES = tuple(piece * 2 for piece in range(12))
+# moves allowed after each move (the last entry is for the first move), see search.next_moves
+NEXT_MOVES = next_moves(FACE_MOVES)
+NO_MOVE = N_MOVES
+CHUNK_SIZE = 1 << 20  # table entries scanned by a worker at a time
+PROGRESS_NODES = 1 << 20  # nodes between two progress reports of a search
+DEADLINE_NODES = 1 << 12  # nodes between two deadline checks of a search
+CORNER_DATABASE = "korf_corners_v1.nib"
+BUILD_COMMAND = "python3 -m src.optimal [workers]"  # run from the cubesolver directory
+
+_worker = {}  # the table being built and its expand function, in a worker process
+
+
+def edge_group_size(group):
+    """ :return: number of entries of the pattern database of an edge group
+    """
+    size = 1 << len(group)
+    for available in range(12 - len(group) + 1, 13):
+        size *= available
+    return size
+
+
+def corner_children(index):
+    """ :return: list of the corner database indices one face turn away from index
+    """
+    corners_move = _worker["corners_move"]
+    twist_move = _worker["twist_move"]
+    corners, twist = divmod(index, N_TWIST)
+    corners_row = corners * N_MOVES
+    twist_row = twist * N_MOVES
+    return [corners_move[corners_row + m] * N_TWIST + twist_move[twist_row + m] for m in range(N_MOVES)]
+
+
+def edge_children(index):
+    """ :return: list of the edge group database indices one face turn away from index
+    """
+    codes = edges_unrank(index, _worker["group_size"])
+    return [edges_index(tuple([moves[c] for c in codes])) for moves in EDGE_CODE_MOVES]
+
+
+def _init_worker(memory_name, group):
+    _worker["memory"] = SharedMemory(name=memory_name)
+    if group is None:
+        _worker["corners_move"] = move_table("corners")
+        _worker["twist_move"] = move_table("twist")
+        _worker["expand"] = corner_children
+    else:
+        _worker["group_size"] = len(group)
+        _worker["expand"] = edge_children
+
+
+def _expand_chunk(start, end, depth):
+    """ expand the states at a depth in one chunk of the shared table
+
+    :return: bytes of an array('I') of the children not reached yet, without duplicates
+    """
+    table = _worker["memory"].buf
+    expand = _worker["expand"]
+    chunk = bytes(table[start:end])
+    marker = bytes([depth])
+    found = set()
+    i = chunk.find(marker)
+    while i != -1:
+        for child in expand(start + i):
+            if table[child] == UNKNOWN:
+                found.add(child)
+        i = chunk.find(marker, i + 1)
+    return array('I', found).tobytes()
+
+
+def build_pattern_database(group=None, workers=None, progress=None):
+    """ breadth first search over the corners, or over the edges of a group, on worker processes
+
+    :param group: tuple of edge pieces, None for the corner database
+    :param workers: number of processes, one per CPU if None
+    :param progress: optional function called with (depth, number of states at that depth)
+    :return: NibbleTable of the number of face turns needed to solve the pieces
+    """
+    size = N_CORNER_STATES if group is None else edge_group_size(group)
+    solved = 0 if group is None else edges_index(tuple(SOLVED_EDGES[piece] for piece in group))
+    memory = SharedMemory(create=True, size=size)
+    table = memory.buf
+    try:
+        for start in range(0, size, CHUNK_SIZE):
+            end = min(start + CHUNK_SIZE, size)
+            table[start:end] = bytes([UNKNOWN]) * (end - start)
+        table[solved] = 0
+        depth = 0
+        count = 1
+        if progress is not None:
+            progress(depth, count)
+        if group is None:
+            # build missing move tables once here, the workers then load them from disk
+            # (or inherit them) instead of all building and writing the same files
+            move_table("corners")
+            move_table("twist")
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(memory.name, group)) as executor:
+            while count:
+                futures = [executor.submit(_expand_chunk, start, min(start + CHUNK_SIZE, size), depth)
+                           for start in range(0, size, CHUNK_SIZE)]
+                count = 0
+                for future in as_completed(futures):
+                    children = array('I')
+                    children.frombytes(future.result())
+                    for child in children:
+                        if table[child] == UNKNOWN:
+                            table[child] = depth + 1
+                            count += 1
+                depth += 1
+                if progress is not None and count:
+                    progress(depth, count)
+        return NibbleTable.from_bytes(bytes(table))
+    finally:
+        table.release()
+        memory.close()
+        memory.unlink()
+
+
+def corner_database(workers=None, progress=None):
+    """ :return: the corner pattern database, loaded from disk or built on first use
+    """
+    return load_nibble_table(CORNER_DATABASE, N_CORNER_STATES,
+                             lambda: build_pattern_database(None, workers, progress))
+
+
+def edge_database_name(group):
+    return "korf_edges_%s_v1.nib" % "".join("%x" % piece for piece in group)
+
+
+def edge_database(group, workers=None, progress=None):
+    """ :return: the pattern database of an edge group, loaded from disk or built on first use
+    """
+    return load_nibble_table(edge_database_name(group), edge_group_size(group),
+                             lambda: build_pattern_database(group, workers, progress))
+
+
+def databases_ready(edge_groups=EDGE_GROUPS):
+    """ :return: True if every pattern database is on disk, so a solver can be created without building them
+    """
+    names = [CORNER_DATABASE] + [edge_database_name(group) for group in edge_groups]
+    return all(os.path.exists(table_path(name)) for name in names)
+
+
+class OptimalSolver:
+    """ Korf's IDA* with pattern databases, see the module docstring
+
+    the databases are loaded (or built) once when the solver is created, reuse it for many cubes
+    """
+
+    def __init__(self, edge_groups=EDGE_GROUPS, workers=None, progress=None):
+        """
+        :param edge_groups: tuples of edge pieces, one pattern database each. together they must
+            cover all 12 edges. smaller groups build faster but prune less
+        :param workers: number of processes used to build missing databases
+        :param progress: optional function called with (table name, depth, states) while building
+        :raises ValueError: if the groups do not cover every edge
+        """
+        if set(piece for group in edge_groups for piece in group) != set(range(12)):
+            raise ValueError("the edge groups must cover all 12 edges")
+
+        def reporter(name):
+            if progress is None:
+                return None
+            return lambda depth, count: progress(name, depth, count)
+
+        self.edge_groups = tuple(tuple(group) for group in edge_groups)
+        self.corners = corner_database(workers, reporter("corners")).data
+        self.edges = [edge_database(group, workers, reporter("edges %s" % (group,))).data
+                      for group in self.edge_groups]
+        self.corners_move = move_table("corners")
+        self.twist_move = move_table("twist")
+        self.nodes = 0
+        self.progress = None
+        self.deadline = None
+        self.timed_out = False
+
+    def heuristic(self, corners, twist, edges):
+        """ :return: the largest distance any pattern database gives for a state
+        """
+        i = corners * N_TWIST + twist
+        h = (self.corners[i >> 1] >> ((i & 1) << 2)) & 0xF
+        for group, table in zip(self.edge_groups, self.edges):
+            i = edges_index(tuple([edges[piece] for piece in group]))
+            d = (table[i >> 1] >> ((i & 1) << 2)) & 0xF
+            if d > h:
+                h = d
+        return h
+
+    def solve(self, facelets, max_length=20, progress=None, deadline=None):
+        """ find a shortest solution
+
+        :param facelets: flat facelet vector of the cube (see facelet.py)
+        :param max_length: give up after this many moves, 20 is always enough
+        :param progress: optional function called with (depth, nodes, seconds) when a depth
+            starts and every PROGRESS_NODES nodes
+        :param deadline: give up once time.perf_counter() passes this value, None for no limit.
+            self.timed_out tells a stop at the deadline from no solution within max_length
+        :return: list of face turns, None if there is no solution within max_length or in time
+        :raises ValueError: if the facelets do not describe a solvable cube
+        """
+        cube = CubieCube.from_facelets(facelets)
+        if not cube.is_solvable():
+            raise ValueError("the cube cannot be solved, it was not built with valid moves")
+        corners = cube.get_corners()
+        twist = cube.get_twist()
+        edges = tuple(edge_code(cube, piece) for piece in range(12))
+        self.nodes = 0
+        self.progress = progress
+        self.deadline = deadline
+        self.timed_out = False
+        self.start = time.perf_counter()
+        path = []
+        depth = self.heuristic(corners, twist, edges)
+        while depth <= max_length:
+            self.depth = depth
+            if progress is not None:
+                progress(depth, self.nodes, time.perf_counter() - self.start)
+            result = self.search(corners, twist, edges, depth, path, NO_MOVE)
+            if result == "STOP":
+                self.timed_out = True
+                return None
+            if result:
+                return [FACE_MOVES[m] for m in path]
+            depth += 1
+        return None
+
+    def search(self, corners, twist, edges, togo, path, last):
+        """ depth limited search for solutions of exactly len(path) + togo moves
+
+        children are only visited when every database allows them to be solved in time
+
+        :return: True if the cube is solved at the end of path, "STOP" at the deadline
+        """
+        self.nodes += 1
+        if togo == 0:
+            return corners == 0 and twist == 0 and edges == SOLVED_EDGES
+        if not self.nodes % DEADLINE_NODES:
+            if self.deadline is not None and time.perf_counter() > self.deadline:
+                return "STOP"
+            if not self.nodes % PROGRESS_NODES and self.progress is not None:
+                self.progress(self.depth, self.nodes, time.perf_counter() - self.start)
+        corner_table = self.corners
+        corners_row = corners * N_MOVES
+        twist_row = twist * N_MOVES
+        togo -= 1
+        for m in NEXT_MOVES[last]:
+            new_corners = self.corners_move[corners_row + m]
+            new_twist = self.twist_move[twist_row + m]
+            i = new_corners * N_TWIST + new_twist
+            if (corner_table[i >> 1] >> ((i & 1) << 2)) & 0xF > togo:
+                continue
+            moves = EDGE_CODE_MOVES[m]
+            new_edges = tuple([moves[e] for e in edges])
+            for group, table in zip(self.edge_groups, self.edges):
+                i = edges_index(tuple([new_edges[piece] for piece in group]))
+                if (table[i >> 1] >> ((i & 1) << 2)) & 0xF > togo:
+                    break
+            else:
+                path.append(m)
+                result = self.search(new_corners, new_twist, new_edges, togo, path, m)
+                if result:
+                    return result
+                path.pop()
+        return False
+
+
+_solver = []
+
+
+def optimal_solver():
+    """ get the OptimalSolver shared by this process, created on first use
+
+    the pattern databases are never built here, that takes hours and must be done ahead of time
+
+    :return: an OptimalSolver
+    :raises FileNotFoundError: if the pattern databases are not built yet, see BUILD_COMMAND
+    """
+    if not _solver:
+        if not databases_ready():
+            raise FileNotFoundError("the pattern databases of the optimal solver are not built, build them first with: "
+                                    "%s from the cubesolver directory" % BUILD_COMMAND)
+        _solver.append(OptimalSolver())
+    return _solver[0]
+
+
+def solve(facelets, progress=None):
+    """ solve a cube in the fewest face turns, see OptimalSolver.solve
+
+    :param facelets: flat facelet vector of the cube (see facelet.py)
+    :param progress: optional function called with (depth, nodes, seconds)
+    :return: list of face turns
+    :raises FileNotFoundError: if the pattern databases are not built yet
+    """
+    return optimal_solver().solve(facelets, progress=progress)
+
+
+def print_build_progress(name, depth, count):
+    print("%s: depth %d, %d states" % (name, depth, count), flush=True)
+
+
+if __name__ == "__main__":
+    OptimalSolver(workers=int(sys.argv[1]) if len(sys.argv) > 1 else None, progress=print_build_progress)
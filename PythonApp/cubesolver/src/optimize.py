@@ -0,0 +1,138 @@
+"""
+optimize.py
+Module for shortening move sequences without changing what they do
+
+simplify_sequence rewrites any ACTIONS_3x3 sequence as outer face turns:
+- slice and wide turns become face turns plus a whole cube rotation
+- rotations are pushed to the end of the sequence by relabelling the turns after them
+- turns of the same face are merged (U U -> U2, U U' -> nothing)
+- turns of opposite faces commute, so they are merged across each other (U D U -> U2 D)
+  and written in a fixed order (U before D, R before L, F before B)
+"""
+from functools import lru_cache
+
+from .actions import ACTIONS_3x3
+from .facelet import IDENTITY
+from .facelet import PERMUTATIONS
+from .facelet import compose_permutations
+from .facelet import invert_permutation
+
+FACES = "URFDLB"
+OPPOSITE = {"U": "D", "D": "U", "R": "L", "L": "R", "F": "B", "B": "F"}
+# the face written first when two opposite faces are next to each other
+FIRST_OF_AXIS = {"U", "R", "F"}
+SUFFIX = {1: "", 2: "2", 3: "'"}
+TURNS = {"": 1, "2": 2, "'": 3}
+ROTATION_GENERATORS = ("x", "x'", "x2", "y", "y'", "y2", "z", "z'", "z2")
+
+
+def face_move(face, turns):
+    """ :return: notation of turns quarter turns of face, None for 0 (mod 4)
+    """
+    turns %= 4
+    return face + SUFFIX[turns] if turns else None
+
+
+@lru_cache(maxsize=None)
+def rotation_tables():
+    """ build the 24 whole cube rotations, the relabelling of face turns by each rotation and
+    the decomposition of every action into face turns followed by a rotation
+
+    :return: (rotation names by permutation, conjugated face turns by rotation, decompositions)
+    """
+    # shortest name of every rotation, breadth first over the rotation actions
+    names = {IDENTITY: ""}
+    frontier = [IDENTITY]
+    while frontier:
+        next_frontier = []
+        for perm in frontier:
+            for rotation in ROTATION_GENERATORS:
+                moved = compose_permutations(perm, PERMUTATIONS[rotation])
+                if moved not in names:
+                    names[moved] = (names[perm] + " " + rotation).strip()
+                    next_frontier.append(moved)
+        frontier = next_frontier
+
+    # turn m performed after rotation r is the same as turn conjugated[r][m] performed before it
+    face_moves = [face + suffix for face in FACES for suffix in ("", "2", "'")]
+    by_perm = {PERMUTATIONS[move]: move for move in face_moves}
+    conjugated = {}
+    for rotation in names:
+        inverse = invert_permutation(rotation)
+        conjugated[rotation] = {
+            move: by_perm[compose_permutations(compose_permutations(rotation, PERMUTATIONS[move]), inverse)]
+            for move in face_moves}
+
+    # every action as at most two face turns followed by a rotation
+    face_sequences = {IDENTITY: ()}
+    for first in face_moves:
+        face_sequences.setdefault(PERMUTATIONS[first], (first,))
+    for first in face_moves:
+        for second in face_moves:
+            perm = compose_permutations(PERMUTATIONS[first], PERMUTATIONS[second])
+            face_sequences.setdefault(perm, (first, second))
+    decompositions = {}
+    for action in ACTIONS_3x3:
+        for rotation in names:
+            residual = compose_permutations(PERMUTATIONS[action], invert_permutation(rotation))
+            if residual in face_sequences:
+                decompositions[action] = (face_sequences[residual], rotation)
+                break
+    return names, conjugated, decompositions
+
+
+def simplify_sequence(actions, keep_rotation=True):
+    """ shorten a sequence of actions, see the module docstring
+
+    :param actions: a space separated string or a list of actions from ACTIONS_3x3
+    :param keep_rotation: if True the net whole cube rotation is appended so the result leaves
+        the cube in exactly the same state. if False it is dropped, the result then only matches
+        up to the orientation of the whole cube
+    :return: list of face turns (and rotations at the end)
+    """
+    if isinstance(actions, str):
+        actions = actions.split()
+    names, conjugated, decompositions = rotation_tables()
+
+    rotation = IDENTITY
+    stack = []  # [face, quarter turns]
+    for action in actions:
+        turns, action_rotation = decompositions[action]
+        for move in turns:
+            move = conjugated[rotation][move]
+            push_turn(stack, move[0], TURNS[move[1:]])
+        rotation = compose_permutations(rotation, action_rotation)
+
+    result = [face_move(face, turns) for face, turns in stack]
+    if keep_rotation and rotation != IDENTITY:
+        result.extend(names[rotation].split())
+    return result
+
+
+def push_turn(stack, face, turns):
+    """ append a face turn to a simplified sequence, merging it with the turns it commutes with
+
+    :param stack: list of [face, quarter turns] pairs, modified in place
+    :param face: face letter of the turn
+    :param turns: number of clockwise quarter turns
+    """
+    if stack and stack[-1][0] == face:
+        target = len(stack) - 1
+    elif len(stack) > 1 and stack[-1][0] == OPPOSITE[face] and stack[-2][0] == face:
+        target = len(stack) - 2
+    else:
+        stack.append([face, turns % 4])
+        order_axis(stack)
+        return
+
+    stack[target][1] = (stack[target][1] + turns) % 4
+    if stack[target][1] == 0:
+        del stack[target]
+    order_axis(stack)
+
+
+def order_axis(stack):
+    """ write the last two turns in the fixed order if they are on opposite faces
+    """
+    if len(stack) > 1 and stack[-1][0] == OPPOSITE[stack[-2][0]] and stack[-1][0] in FIRST_OF_AXIS:
+        stack[-1], stack[-2] = stack[-2], stack[-1]
@@ -0,0 +1,175 @@
+"""
+parallel.py
+Module for running IDA* on several processes
+
+Every bound iteration is split at a small depth (1-2) into subtrees, one per move
+sequence allowed by the same successor table get_children uses (see search.py).
+The subtrees are searched by a ProcessPoolExecutor with the bound of the current
+iteration, and the next bound is the smallest f any of them went over. The first
+worker to find the goal sets a shared event, which makes the others return early,
+and the subtrees that did not start yet are cancelled.
+
+Heuristics are sent to the workers by reference, so they have to be module level
+functions such as solver.h_cross_flat.
+"""
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+import multiprocessing
+import os
+
+from .search import DEFAULT_MOVES
+from .search import DONE
+from .search import FOUND
+from .search import NODE_LIMIT
+from .search import NOT_FOUND
+from .search import SearchResult
+from .search import TIMEOUT
+from .search import move_set
+from .search import search_bound
+
+_stop = None  # the event of the pool a worker belongs to
+
+
+def _init_worker(stop):
+    global _stop
+    _stop = stop
+
+
+def _search_subtree(root, prefix, bound, h_func, max_nodes, deadline, metric, canonical):
+    return search_bound(root, prefix, bound, h_func, max_nodes, deadline, _stop, move_set(metric, canonical))
+
+
+class ParallelSearch:
+    """ a pool of worker processes running IDA* subtrees, see the module docstring
+
+    use it as a context manager, or call shutdown() when done
+    """
+
+    def __init__(self, workers=None):
+        """
+        :param workers: number of processes, os.cpu_count() if None
+        """
+        self.workers = workers or os.cpu_count() or 1
+        self.stop = multiprocessing.Event()
+        self.executor = ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.stop,))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+    def ida_star(self, facelets, h_func, split_depth=2, max_nodes=None, deadline=None, metric="qtm",
+                 canonical=True):
+        """ perform an IDA* search on the worker processes
+
+        Args:
+            facelets (bytes): flat facelet vector of the start state
+            h_func (function): a module level heuristic taking a flat facelet vector
+            split_depth (int): depth of the subtree roots handed to the workers
+            max_nodes (int): stop after evaluating about this many nodes, None for no limit
+            deadline (float): stop once time.perf_counter() passes this value, None for no limit
+            metric (str): "qtm" or "htm", see search.ida_star
+            canonical (bool): order the turns of commuting opposite faces
+
+        Returns:
+            SearchResult: same as search.ida_star. the path has the optimal length, but when
+                several exist it is the one found first, not always the one ida_star returns
+        """
+        moves = move_set(metric, canonical)
+        root = bytes(facelets)
+        bound = h_func(root)
+        nodes = 1
+        if bound == 0:
+            return SearchResult(FOUND, [], nodes, bound)
+
+        while True:
+            self.stop.clear()
+            minimum = float('inf')
+            # the first levels are expanded here, they are few and cheap
+            frontier = [(root, ())]
+            for depth in range(1, split_depth + 1):
+                next_frontier = []
+                for key, prefix in frontier:
+                    for move, child in children(key, prefix, moves):
+                        h = h_func(child)
+                        nodes += 1
+                        if h == 0:  # if reached goal state
+                            return SearchResult(FOUND, [moves.actions[m] for m in prefix + (move,)], nodes, bound)
+                        if depth + h > bound:
+                            minimum = min(minimum, depth + h)
+                        else:
+                            next_frontier.append((child, prefix + (move,)))
+                frontier = next_frontier
+
+            budget = None if max_nodes is None else max(max_nodes - nodes, 1)
+            # submitted in the order the serial search would visit them
+            pending = set([self.executor.submit(_search_subtree, key, prefix, bound, h_func, budget, deadline,
+                                                metric, canonical)
+                           for key, prefix in frontier])
+            stopped = None
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.cancelled():
+                        continue
+                    status, path, expanded, subtree_minimum = future.result()
+                    nodes += expanded
+                    minimum = min(minimum, subtree_minimum)
+                    if status == FOUND:
+                        self.cancel(pending)
+                        return SearchResult(FOUND, path, nodes, bound)
+                    if status in (NODE_LIMIT, TIMEOUT) and stopped is None:
+                        stopped = status
+                        self.cancel(pending)
+                    if max_nodes is not None and nodes >= max_nodes and stopped is None:
+                        stopped = NODE_LIMIT
+                        self.cancel(pending)
+            if stopped is not None:
+                return SearchResult(stopped, None, nodes, bound)
+            if minimum == float('inf'):
+                return SearchResult(NOT_FOUND, None, nodes, bound)
+            bound = minimum  # increase bound to lowest neighbor's f
+
+    def cancel(self, futures):
+        """ cancel the subtrees that did not start and stop the running ones
+        """
+        self.stop.set()
+        for future in futures:
+            future.cancel()
+        wait(futures)
+
+
+def children(key, prefix, moves=DEFAULT_MOVES):
+    """ list the children of a state in the order the serial search visits them
+
+    :param key: flat facelet vector of the state
+    :param prefix: indices in moves.actions of the moves that led to it
+    :param moves: the search.MoveSet searched with
+    :return: list of (move index, child facelets)
+    """
+    if prefix:
+        last = prefix[-1]
+        context = 2 * last + (len(prefix) > 1 and prefix[-2] == last)
+    else:
+        context = moves.root
+    result = []
+    move = moves.next_move[context][moves.start]
+    while move != DONE:
+        result.append((move, bytes(moves.gathers[move](key))))
+        move = moves.next_move[context][move]
+    return result
+
+
+def parallel_ida_star(facelets, h_func, workers=None, split_depth=2, max_nodes=None, deadline=None, metric="qtm",
+                      canonical=True):
+    """ run ParallelSearch.ida_star on a pool created for this search only
+
+    :return: SearchResult
+    """
+    with ParallelSearch(workers) as pool:
+        return pool.ida_star(facelets, h_func, split_depth, max_nodes, deadline, metric, canonical)
@@ -0,0 +1,293 @@
+"""
+search.py
+Module for the iterative IDA* engine and the move pruning shared by the searches
+
+ida_star walks the search tree with an explicit stack instead of recursion, one
+bound iteration at a time (search_bound, which can also start below the root). A stack
+frame only holds the state key (the flat facelet vector, see facelet.py) and the
+index of the move being explored from it, frames are reused between iterations and
+the moves to try come from a successor table computed once. The search can be
+stopped after a number of nodes or at a deadline, and always reports what happened
+in a SearchResult.
+
+Successor tables exist for the quarter turn metric (12 moves) and the half turn
+metric (18 moves, X2 counts as one move). Besides never undoing the last turn, the
+canonical tables only allow commuting opposite faces in one order, which lowers the
+effective branching factor from about 10.5 to 9.4 (quarter turns) and from 15 to 13.3
+(half turns), see branching_factor.
+"""
+from collections import namedtuple
+import time
+
+from .facelet import GATHERS
+
+QUARTER_TURNS = ("R", "R'", "U", "U'", "F", "F'", "L", "L'", "D", "D'", "B", "B'")
+FACE_TURNS = ("R", "R'", "R2", "U", "U'", "U2", "F", "F'", "F2", "L", "L'", "L2", "D", "D'", "D2", "B", "B'", "B2")
+METRICS = {"qtm": QUARTER_TURNS, "htm": FACE_TURNS}
+# opposite faces commute, canonical sequences only turn them in this order (R before L, ...)
+SECOND_OF_AXIS = {"L": "R", "D": "U", "B": "F"}
+
+FOUND = "found"
+NOT_FOUND = "not found"  # the whole tree was searched
+NODE_LIMIT = "node limit"
+TIMEOUT = "timeout"
+CANCELLED = "cancelled"  # another worker found a solution first (see parallel.py)
+
+SearchResult = namedtuple("SearchResult", ("status", "path", "nodes", "bound"))
+SearchResult.__doc__ = """ outcome of ida_star
+
+status: FOUND, NOT_FOUND, NODE_LIMIT, TIMEOUT (or CANCELLED for one subtree of a parallel search)
+path: list of actions from the start to the goal, None unless status is FOUND
+nodes: number of nodes whose heuristic was evaluated
+bound: the f bound of the last iteration
+"""
+
+
+def _successors(action, parent_action, metric="qtm", canonical=True):
+    """ list the turns worth expanding after the last two actions of a path
+
+    in the quarter turn metric the inverse of the last action is pruned, as well as a third
+    identical turn in a row (an inverse turn can not follow its face either, the double is
+    reached as X X). in the half turn metric a face is never turned twice in a row.
+    canonical also prunes the second face of an axis followed by the first (L R is the same
+    as R L), so every sequence of commuting turns is only searched in one order
+    """
+    actions = list(METRICS[metric])
+    if action is None:
+        return tuple(actions)
+    face = action[0]
+    if metric == "htm":
+        actions = [a for a in actions if a[0] != face]
+    else:
+        if action == parent_action:
+            actions.remove(action)
+        if len(action) == 2:
+            actions.remove(action[0])
+            actions.remove(action)
+        else:
+            actions.remove(action[0] + "'")
+    if canonical and face in SECOND_OF_AXIS:
+        actions = [a for a in actions if a[0] != SECOND_OF_AXIS[face]]
+    return tuple(actions)
+
+
+def successor_table(metric="qtm", canonical=True):
+    """ precompute the successors of every pair of turns that can end a path
+
+    :param metric: "qtm" (quarter turns) or "htm" (quarter and half turns)
+    :param canonical: also order the turns of commuting opposite faces
+    :return: dict (action, parent_action) -> tuple of actions, None for a missing action
+    """
+    table = {}
+    for parent in METRICS[metric] + (None,):
+        for action in _successors(parent, None, metric, canonical) + (None,):
+            if action is not None or parent is None:
+                table[action, parent] = _successors(action, parent, metric, canonical)
+    return table
+
+
+# the same table on move indices for the engine: the context of a frame is
+# last move * 2 + (1 if the move before it was the same), root at the start.
+# next_move[context][move] is the move to try after move, start before the first and DONE at the end
+MoveSet = namedtuple("MoveSet", ("metric", "canonical", "actions", "successors", "next_move", "start", "root",
+                                 "gathers"))
+DONE = -1
+
+_move_sets = {}
+
+
+def _next_move_table(actions, successors):
+    n = len(actions)
+    table = []
+    for context in range(2 * n + 1):
+        if context == 2 * n:
+            allowed = successors[None, None]
+        else:
+            action = actions[context // 2]
+            # contexts that no path can reach (X' X', or X X in the half turn metric) have no successors
+            allowed = successors.get((action, action if context % 2 else None), ())
+        moves = [actions.index(a) for a in allowed]
+        row = [DONE] * (n + 1)
+        row[n] = moves[0] if moves else DONE
+        for move, following in zip(moves, moves[1:]):
+            row[move] = following
+        table.append(tuple(row))
+    return tuple(table)
+
+
+def move_set(metric="qtm", canonical=True):
+    """ the moves of a metric with their successor tables, built once per process
+
+    :param metric: "qtm" or "htm", see METRICS
+    :param canonical: order the turns of commuting opposite faces
+    :return: MoveSet
+    :raises ValueError: for an unknown metric
+    """
+    if metric not in METRICS:
+        raise ValueError("metric must be one of %s, not %r" % (", ".join(METRICS), metric))
+    if (metric, canonical) not in _move_sets:
+        actions = METRICS[metric]
+        successors = successor_table(metric, canonical)
+        _move_sets[metric, canonical] = MoveSet(metric, canonical, actions, successors,
+                                                _next_move_table(actions, successors), len(actions),
+                                                2 * len(actions), tuple(GATHERS[action] for action in actions))
+    return _move_sets[metric, canonical]
+
+
+def branching_factor(metric="qtm", canonical=True, depth=12):
+    """ effective branching factor of a move set: growth of the number of paths per depth
+
+    :return: number of paths of length depth / number of paths of length depth - 1
+    """
+    moves = move_set(metric, canonical)
+    counts = {moves.root: 1}
+    previous = 1
+    for _ in range(depth):
+        following = {}
+        for context, count in counts.items():
+            last = context // 2 if context != moves.root else DONE
+            move = moves.next_move[context][moves.start]
+            while move != DONE:
+                child = 2 * move + (move == last)
+                following[child] = following.get(child, 0) + count
+                move = moves.next_move[context][move]
+        previous = sum(counts.values())
+        counts = following
+    return sum(counts.values()) / previous
+
+
+def next_moves(actions, canonical=True):
+    """ the half turn metric successors on another numbering of the face turns, for the
+    coordinate searches (kociemba.py, f2l.py, optimal.py): never the same face twice in a row
+    and, if canonical, opposite faces only in one order
+
+    :param actions: the 18 face turns (FACE_TURNS) in the order of the caller's move indices
+    :param canonical: order the turns of commuting opposite faces
+    :return: tuple, entry m holds the indices of the moves allowed after move m in increasing
+        order, the last entry (index len(actions)) those allowed as the first move
+    """
+    successors = move_set("htm", canonical).successors
+    index = {action: m for m, action in enumerate(actions)}
+    return tuple(tuple(sorted(index[a] for a in successors[action, None])) for action in actions + (None,))
+
+
+DEFAULT_MOVES = move_set()
+SUCCESSORS = DEFAULT_MOVES.successors
+NEXT_MOVE = DEFAULT_MOVES.next_move
+START = DEFAULT_MOVES.start
+ROOT = DEFAULT_MOVES.root
+
+
+class Frame:
+    """ one level of the search stack: a state and the move being explored from it
+    """
+    __slots__ = ("key", "move")
+
+    def __init__(self):
+        self.key = None
+        self.move = START
+
+
+def ida_star(facelets, h_func, max_nodes=None, deadline=None, metric="qtm", canonical=True):
+    """ perform an IDA* search with an explicit stack
+
+    Args:
+        facelets (bytes): flat facelet vector of the start state
+        h_func (function): a heuristic taking a flat facelet vector, 0 exactly at the goal
+        max_nodes (int): stop after evaluating this many nodes, None for no limit
+        deadline (float): stop once time.perf_counter() passes this value, None for no limit
+        metric (str): "qtm" to search quarter turns, "htm" for quarter and half turns
+        canonical (bool): order the turns of commuting opposite faces, see move_set
+
+    Returns:
+        SearchResult: see SearchResult, the path is only set when the goal was found
+    """
+    moves = move_set(metric, canonical)
+    root = bytes(facelets)
+    bound = h_func(root)
+    nodes = 1
+    if bound == 0:
+        return SearchResult(FOUND, [], nodes, bound)
+
+    while True:
+        budget = None if max_nodes is None else max_nodes - nodes
+        status, path, expanded, minimum = search_bound(root, (), bound, h_func, budget, deadline, moves=moves)
+        nodes += expanded
+        if status != NOT_FOUND:
+            return SearchResult(status, path, nodes, bound)
+        if minimum == float('inf'):
+            return SearchResult(NOT_FOUND, None, nodes, bound)
+        bound = minimum  # increase bound to lowest neighbor's f
+
+
+def search_bound(root, prefix, bound, h_func, max_nodes=None, deadline=None, stop=None, moves=None):
+    """ one IDA* iteration: depth first search of every node with f <= bound below root
+
+    Args:
+        root (bytes): flat facelet vector to search from
+        prefix (tuple): indices in moves.actions of the moves that led to root, they set g
+            and the successors of root. () when root is the start of the search
+        bound (int): the fscore threshold for nodes we are expanding
+        h_func (function): a heuristic taking a flat facelet vector, 0 exactly at the goal
+        max_nodes (int): stop after evaluating this many nodes, None for no limit
+        deadline (float): stop once time.perf_counter() passes this value, None for no limit
+        stop (Event): optional, the search is CANCELLED once it is set
+        moves (MoveSet): the moves to search with, DEFAULT_MOVES (canonical quarter turns) if None
+
+    Returns:
+        tuple: (status, path including the prefix or None, nodes evaluated, smallest f over the bound)
+            status is FOUND, NOT_FOUND (nothing within the bound), NODE_LIMIT, TIMEOUT or CANCELLED
+    """
+    moves = moves or DEFAULT_MOVES
+    next_move = moves.next_move
+    gathers = moves.gathers
+    g = len(prefix)
+    before_root = prefix[-2] if g > 1 else DONE
+    root_context = 2 * prefix[-1] + (before_root == prefix[-1]) if prefix else moves.root
+    prefix_last = prefix[-1] if prefix else DONE
+    frames = [Frame()]
+    frames[0].key = root
+    frames[0].move = moves.start
+    minimum = float('inf')
+    nodes = 0
+    top = 0
+    while top >= 0:
+        frame = frames[top]
+        if top == 0:
+            context = root_context
+        else:
+            last = frames[top - 1].move
+            parent = frames[top - 2].move if top > 1 else prefix_last
+            context = 2 * last + (parent == last)
+        move = next_move[context][frame.move]
+        if move == DONE:  # every child searched, back to the parent
+            top -= 1
+            continue
+        frame.move = move
+
+        child = bytes(gathers[move](frame.key))
+        h = h_func(child)
+        nodes += 1
+        if h == 0:  # if reached goal state
+            actions = moves.actions
+            path = [actions[m] for m in prefix] + [actions[frames[depth].move] for depth in range(top + 1)]
+            return FOUND, path, nodes, bound
+        f = g + top + 1 + h
+        if f > bound:  # if we are over the ids bound
+            if f < minimum:
+                minimum = f
+        else:
+            top += 1
+            if top == len(frames):
+                frames.append(Frame())
+            frames[top].key = child
+            frames[top].move = moves.start
+
+        if max_nodes is not None and nodes >= max_nodes:
+            return NODE_LIMIT, None, nodes, minimum
+        if not nodes & 1023:
+            if deadline is not None and time.perf_counter() > deadline:
+                return TIMEOUT, None, nodes, minimum
+            if stop is not None and stop.is_set():
+                return CANCELLED, None, nodes, minimum
+    return NOT_FOUND, None, nodes, minimum
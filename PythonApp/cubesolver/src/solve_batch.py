@@ -0,0 +1,192 @@
+"""
+solve_batch.py
+Module for solving many cubes without the menu, streaming JSON lines
+
+Started with: python3 cubesolver solve-batch [input] [-o output] (see __main__.py)
+
+Every non blank input line that does not start with # is one cube, either
+- a scramble: space separated moves in 3x3 notation, applied to a solved cube
+- a state: 54 digits 0-5, the sticker colors in flat facelet order (see facelet.py)
+
+Each cube gets one JSON object on its own output line:
+{"line": 3, "input": "R U R' U'", "solution": "...", "length": 52, "seconds": 0.05, "nodes": 4210,
+ "phases": {"cross": {"length": 5, "seconds": 0.001, "nodes": 0}, "f2l": {...}, ...}}
+or {"line": 3, "input": "...", "error": "..."} if the line is not a valid cube or could not be solved.
+With a time limit every cube is solved anytime: its first solution is improved until the
+limit, and the "anytime" or "two-phase" phase tells its first length and if it improved.
+With the solve cache (solvecache.py) a cube symmetric to one solved before, in this run or
+an earlier one, is answered from the cache and its only phase is "cache".
+
+Lines are read lazily and at most `window` cubes are in flight, so memory does not
+grow with the input. Results are written in input order, or as soon as they are
+ready with unordered output.
+"""
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import wait
+import json
+import os
+import sys
+import time
+
+from .actions import ACTIONS_3x3
+from .cube import Cube
+from .cube import FlatCube
+from .cube import solved_state_ints
+from .cubie import CubieCube
+from .solver import Node
+from .solver import solve_cfop
+from .solver import solve_kociemba
+from .solvecache import solve_cache
+
+
+def read_cubes(lines):
+    """ pick the cube lines out of an input stream
+
+    :param lines: iterable of text lines, such as an open file
+    :return: generator of (line number, stripped text)
+    """
+    for number, line in enumerate(lines, 1):
+        text = line.strip()
+        if text and not text.startswith("#"):
+            yield number, text
+
+
+def parse_cube(text):
+    """ build the cube described by one input line
+
+    :param text: a scramble or 54 facelet digits, see the module docstring
+    :return: a Cube
+    :raises ValueError: if the text is neither
+    """
+    if len(text) == 54 and text.isdigit():
+        facelets = bytes(int(c) for c in text)
+        if max(facelets) > 5 or any(facelets.count(color) != 9 for color in range(6)):
+            raise ValueError("a state needs 9 stickers of each color 0-5")
+        if not CubieCube.from_facelets(facelets).is_solvable():
+            raise ValueError("the state can not be solved")
+        return FlatCube(facelets).to_cube()
+    moves = text.split()
+    unknown = [move for move in moves if move not in ACTIONS_3x3]
+    if unknown:
+        raise ValueError("unknown moves: %s" % " ".join(unknown))
+    return Cube(solved_state_ints).execute_action_sequence(moves)
+
+
+def solve_line(number, text, method="cfop", target_length=21, time_budget=1.0, color_neutral=False,
+               f2l_mode="cheapest", cache=False, time_limit=None):
+    """ solve the cube of one input line
+
+    :param number: line number, copied to the result
+    :param text: the line, see parse_cube
+    :param method: "cfop" or "kociemba"
+    :param target_length: target solution length for kociemba
+    :param time_budget: seconds kociemba may spend improving its solution
+    :param color_neutral: cfop builds the cross on the best face, see solve_cfop
+    :param f2l_mode: how cfop inserts the F2L pairs, see solve_cfop
+    :param cache: True to look the cube up in the solve cache of this process first
+    :param time_limit: seconds per cube, the best solution found by then is returned. replaces time_budget
+    :return: the result dict written as one JSON line
+    """
+    start = time.perf_counter()
+    deadline = None if time_limit is None else start + time_limit
+    try:
+        node = Node(parse_cube(text), None, None)
+        stats = {}
+        cache = solve_cache() if cache else None
+        if method == "kociemba":
+            solution, node = solve_kociemba(node, target_length, time_budget, stats, cache, deadline)
+        else:
+            # the batch already has a process per CPU, the cross faces are tried in this one
+            solution, node = solve_cfop(node, workers=1, stats=stats, color_neutral=color_neutral,
+                                        f2l_mode=f2l_mode, cache=cache, deadline=deadline)
+        return {"line": number, "input": text, "solution": " ".join(solution), "length": len(solution),
+                "seconds": round(time.perf_counter() - start, 6),
+                "nodes": sum(phase["nodes"] for phase in stats.values()),
+                "phases": {name: dict(phase, seconds=round(phase["seconds"], 6)) for name, phase in stats.items()}}
+    except ValueError as e:
+        return {"line": number, "input": text, "error": str(e)}
+    except Exception as e:
+        # any other failure (a locked solve cache, a case without algorithm...) only loses this cube
+        return {"line": number, "input": text, "error": "%s: %s" % (type(e).__name__, e)}
+
+
+def _init_worker(method):
+    """ load the tables of a method once per worker process, before the first cube
+    """
+    solve_line(0, "R", method)
+
+
+def solve_stream(cubes, method="cfop", workers=None, ordered=True, window=None, **options):
+    """ solve a stream of cubes on a pool of worker processes
+
+    :param cubes: iterable of (line number, text), see read_cubes
+    :param method: "cfop" or "kociemba"
+    :param workers: number of processes, one per CPU if None. 1 solves in this process
+    :param ordered: if True results come in input order, else as soon as they are ready
+    :param window: maximum number of cubes in flight, 4 per worker if None
+    :param options: target_length, time_budget, color_neutral, f2l_mode, cache and time_limit, passed to solve_line
+    :return: generator of result dicts
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for number, text in cubes:
+            yield solve_line(number, text, method, **options)
+        return
+
+    window = window or 4 * workers
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(method,)) as executor:
+        if ordered:
+            pending = deque()
+            for number, text in cubes:
+                pending.append(executor.submit(solve_line, number, text, method, **options))
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        else:
+            pending = set()
+            for number, text in cubes:
+                pending.add(executor.submit(solve_line, number, text, method, **options))
+                if len(pending) >= window:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            for future in wait(pending).done:
+                yield future.result()
+
+
+def run(input_path="-", output_path="-", method="cfop", workers=None, ordered=True, window=None,
+        target_length=21, time_budget=1.0, color_neutral=False, f2l_mode="cheapest", cache=False, time_limit=None):
+    """ solve every cube of an input file and write the JSON lines, see the module docstring
+
+    :param input_path: file to read, "-" for stdin
+    :param output_path: file to write, "-" for stdout
+    :param cache: True to use the solve cache, its hit rate is written to stderr at the end
+    :return: exit status, 1 if any line could not be solved
+    """
+    source = sys.stdin if input_path == "-" else open(input_path)
+    sink = sys.stdout if output_path == "-" else open(output_path, "w")
+    failed = False
+    solved = hits = 0
+    try:
+        for result in solve_stream(read_cubes(source), method, workers, ordered, window,
+                                   target_length=target_length, time_budget=time_budget,
+                                   color_neutral=color_neutral, f2l_mode=f2l_mode, cache=cache,
+                                   time_limit=time_limit):
+            failed = failed or "error" in result
+            if "error" not in result:
+                solved += 1
+                hits += "cache" in result["phases"]
+            sink.write(json.dumps(result) + "\n")
+            sink.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if sink is not sys.stdout:
+            sink.close()
+    if cache:
+        print("solve cache: %d hits out of %d cubes (%.1f%%)" %
+              (hits, solved, 100.0 * hits / solved if solved else 0.0), file=sys.stderr)
+    return 1 if failed else 0
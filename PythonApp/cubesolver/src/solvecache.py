@@ -0,0 +1,159 @@
+"""
+solvecache.py
+Module for the persistent cache of solutions, shared by symmetric cubes
+
+Solving the same cube twice, or a copy of it turned around, mirrored or painted with
+another color scheme, gives the same solution up to symmetry. The cache keeps one
+solution per class of cubes (see symmetry.canonical) in an SQLite database next to the
+precomputed tables (see tables.py):
+
+    solves(state, method, solution, used): state is the canonical representative, method
+    names the solver and its options, solution is stored in the representative's frame and
+    mapped to the caller's frame when it is read, used orders the entries for eviction
+
+The number of entries is capped, the least recently used ones are evicted first. SQLite
+locks the file, so worker processes (solve_batch.py) can share one cache.
+"""
+import sqlite3
+import time
+
+from .masks import is_solved
+from .symmetry import INVERSE_SYMMETRY
+from .symmetry import canonical
+from .symmetry import map_actions
+from .tables import table_path
+
+CACHE_FILE = "solves_v1.sqlite"
+
+_caches = {}
+
+
+class SolveCache:
+    """ solutions of cubes on disk, keyed by symmetry class and solving method
+    """
+
+    def __init__(self, path=None, max_entries=100000):
+        """
+        :param path: database file, CACHE_FILE in the table directory if None
+        :param max_entries: maximum number of solutions kept
+        :raises ValueError: for a non positive size
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.path = path or table_path(CACHE_FILE)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.connection = sqlite3.connect(self.path, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS solves (state BLOB, method TEXT, solution TEXT, "
+                                    "used REAL, PRIMARY KEY (state, method))")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS solves_used ON solves (used)")
+        self.size = len(self)
+
+    def __len__(self):
+        return self.connection.execute("SELECT COUNT(*) FROM solves").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+    def clear(self):
+        """ forget every solution, the counters are kept
+        """
+        with self.connection:
+            self.connection.execute("DELETE FROM solves")
+        self.size = 0
+
+    def _lookup(self, state, method):
+        row = self.connection.execute("SELECT solution FROM solves WHERE state = ? AND method = ?",
+                                      (state, method)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        with self.connection:
+            self.connection.execute("UPDATE solves SET used = ? WHERE state = ? AND method = ?",
+                                    (time.time(), state, method))
+        return row[0].split()
+
+    def _store(self, state, method, solution):
+        self.stores += 1
+        with self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO solves VALUES (?, ?, ?, ?)",
+                                    (state, method, " ".join(solution), time.time()))
+            self.size += 1
+            if self.size > self.max_entries:
+                # other processes may have added entries too
+                self.size = self.connection.execute("SELECT COUNT(*) FROM solves").fetchone()[0]
+                excess = self.size - self.max_entries
+                if excess > 0:
+                    self.connection.execute("DELETE FROM solves WHERE rowid IN "
+                                            "(SELECT rowid FROM solves ORDER BY used LIMIT ?)", (excess,))
+                    self.evictions += excess
+                    self.size -= excess
+
+    def lookup(self, facelets, method):
+        """ find the solution of a cube or of a symmetric copy
+
+        :param facelets: flat facelet vector of the cube
+        :param method: name of the solver and its options
+        :return: list of actions solving the cube, None if the class is not cached
+        """
+        state, s = canonical(facelets)
+        solution = self._lookup(state, method)
+        return None if solution is None else map_actions(solution, INVERSE_SYMMETRY[s])
+
+    def store(self, facelets, method, solution):
+        """ remember the solution of a cube for its whole class
+
+        :param facelets: flat facelet vector of the cube
+        :param method: name of the solver and its options
+        :param solution: list of actions solving the cube
+        """
+        state, s = canonical(facelets)
+        self._store(state, method, map_actions(solution, s))
+
+    def solve(self, node, method, solve, stats=None):
+        """ read the solution of a Node from the cache, or solve it and cache the result
+
+        :param node: a Node for the cube to solve
+        :param method: name of the solver and its options
+        :param solve: function of the node returning (solve_path, node), called on a miss. the
+            result is only stored if solve_path solves the cube
+        :param stats: optional dict, a hit fills {"cache": {"length", "seconds", "nodes"}}
+        :return: solve_path: the sequence that solves the cube
+        :return: node: a Node for the newly solved cube
+        """
+        start = time.perf_counter()
+        state, s = canonical(node.cube.key())
+        solution = self._lookup(state, method)
+        if solution is not None:
+            solve_path = map_actions(solution, INVERSE_SYMMETRY[s])
+            node.cube = node.cube.execute_action_sequence(solve_path)
+            if stats is not None:
+                stats["cache"] = {"length": len(solve_path), "seconds": time.perf_counter() - start, "nodes": 0}
+            return solve_path, node
+        cube = node.cube
+        solve_path, node = solve(node)
+        # a failed or interrupted solve is returned to the caller but not kept
+        if solve_path not in (None, False) and is_solved(cube.execute_action_sequence(solve_path).key()):
+            self._store(state, method, map_actions(solve_path, s))
+        return solve_path, node
+
+    def stats(self):
+        """ :return: dict of the counters of this process and the current size
+        """
+        lookups = self.hits + self.misses
+        return {"size": self.size, "hits": self.hits, "misses": self.misses, "stores": self.stores,
+                "evictions": self.evictions, "hit rate": self.hits / lookups if lookups else 0.0}
+
+
+def solve_cache(path=None):
+    """ :return: the SolveCache of a file shared by this process, opened on first use
+    """
+    if path not in _caches:
+        _caches[path] = SolveCache(path)
+    return _caches[path]
@@ -2,14 +2,37 @@
 solver.py
 Module related to solving algorithms and cube Node generation
 """
-import os.path
+from itertools import permutations
+import time
 
 from .cube import Cube
+from .cube import MutableCube
 from .cube import solved_state_ints
 from .cube import ACTIONS_3x3
-
-oll_file_path = os.path.join('PythonApp', 'resources', 'oll.txt')
-pll_file_path = os.path.join('PythonApp', 'resources', 'pll.txt')
+from .cross import solve_cross
+from .facelet import execute_action_sequence
+from .f2lcases import insert_pair
+from .lastlayer import OLL_PRE_AUFS
+from .lastlayer import oll_algorithm
+from .lastlayer import pll_algorithm
+from .neutral import CROSS_ROTATIONS
+from .neutral import FACES
+from .neutral import best_cross
+from . import kociemba
+from . import optimal
+from .masks import BOTTOM
+from .masks import CROSS_EDGES
+from .masks import F2L_SLOTS
+from .masks import OLL_MASK
+from .masks import SIDE_BOTTOM_CORNERS
+from .masks import TOP_CORNERS
+from .masks import TOP_EDGES
+from .masks import is_solved
+from .masks import matches
+from .optimize import simplify_sequence
+from .parallel import ParallelSearch
+from .search import SUCCESSORS
+from .search import move_set
 
 class Node:
     """ nodes holding a cube. used for expansion in search
@@ -24,38 +47,55 @@ class Node:
     def __repr__(self):
         return str(self.cube.state)
 
+    @property
+    def key(self):
+        """ compact key of the node's state (see Cube.key), for caches and transposition tables
+        """
+        return self.cube.key()
+
     # Comparing current node with other node. They are equal if states are equal
     def __eq__(self, other):
-        return self.cube.state == other.cube.state
+        return self.cube.key() == other.cube.key()
 
     def __ne__(self, other):
         return not self.__eq__(other)
 
     def __hash__(self):
-        return hash(str(self.cube.state))
+        return hash(self.cube.key())
+
+
+def prune_actions(action, parent_action, successors=SUCCESSORS):
+    """ list the turns worth expanding after the last two actions of a path
 
+    inverses of the last action are pruned, as well as a third identical turn in a row
+    (an inverse turn can not follow its face either, the double is reached as X X), and
+    the second face of an axis is never followed by the first since they commute.
+    read from the precomputed successor table in search.py
 
-def get_children(parent_node):
+    :param action: the last action of the path, None at the root
+    :param parent_action: the action before it, None if there is none
+    :param successors: a table from search.successor_table, canonical quarter turns by default
+    :return: list of actions to expand
+    """
+    return list(successors[action, parent_action])
+
+
+def get_children(parent_node, successors=SUCCESSORS):
     """expands a node by generating child nodes for all potential moves
 
     Args:
         parent_node (Node): node to expand from
+        successors (dict): a table from search.successor_table, canonical quarter turns by
+            default. the half turn metric tables add X2 moves
 
     Returns:
         Node list: list of expanded nodes
     """
     children = []
-    actions = ["R", "R'", "U", "U'", "F", "F'", "L", "L'", "D", "D'", "B", "B'"]
-
-    # this entire if block is pruning moves
     if parent_node.parent is not None:
-        if parent_node.action == parent_node.parent.action:
-            actions.remove(parent_node.action)
-        if len(parent_node.action) == 2:
-            actions.remove(parent_node.action[0])
-            actions.remove(parent_node.action)
-        else:
-            actions.remove(parent_node.action[0] + "'")
+        actions = successors[parent_node.action, parent_node.parent.action]
+    else:
+        actions = successors[parent_node.action, None]
 
     for action in actions:
         child_state = parent_node.cube.execute_action(action)
@@ -81,21 +121,26 @@ def find_path(node):
     return path
 
 
-def idas(root_node, h_func):
+def idas(root_node, h_func, table=None, metric="qtm", canonical=True):
     """ perform an IDA* search to find a path to a goal state
 
     Args:
         root_node (Node): the Node to start the search from
         h_func (function): a heuristic function
+        table (TranspositionTable): optional, remembers states across paths and iterations
+            so they are not expanded again (see transposition.py)
+        metric (str): "qtm" to search quarter turns, "htm" for quarter and half turns
+        canonical (bool): order the turns of commuting opposite faces (see search.py)
 
     Returns:
         string list: the path taken from root to solution as actions
         false: if no path found after expanding all possible nodes
     """
+    successors = move_set(metric, canonical).successors
     bound = h_func(root_node)
     path = [root_node]
     while True:
-        t = idas_search(path, 0, bound, h_func)
+        t = idas_search(path, 0, bound, h_func, table, successors)
         if t == "FOUND":
             path_taken = find_path(path[-1])
             return path_taken
@@ -105,7 +150,7 @@ def idas(root_node, h_func):
             bound = t  # increase bound to lowest neighbor's f
 
 
-def idas_search(path, g, bound, h_func):
+def idas_search(path, g, bound, h_func, table=None, successors=SUCCESSORS):
     """recursive function to perform the search in IDA*
 
     Args:
@@ -113,6 +158,8 @@ def idas_search(path, g, bound, h_func):
         g (int): the cost it took to move from the root node to here
         bound (int): the fscore threshold for nodes we are expanding
         h_func (function): a heuristic function
+        table (TranspositionTable): optional transposition table
+        successors (dict): the successor table to expand with, see get_children
 
     Returns:
         int/float or string: "FOUND" returned if we reached solution
@@ -121,323 +168,251 @@ def idas_search(path, g, bound, h_func):
     """
     node = path[-1]
     h = h_func(node)
-    f = h + g
 
     if h == 0:  # if reached goal state
         return "FOUND"
+    if table is not None:
+        key = node.key
+        h, seen = table_probe(table, key, g, h, bound)
+        if seen:  # already searched from here with a lower or equal g in this iteration
+            return g + h
+    f = h + g
     if f > bound:  # if we are over the ids bound
         return f
     minimum = float('inf')
-    for child in get_children(node):  # for each child of this node
+    on_path = False
+    for child in get_children(node, successors):  # for each child of this node
         if child not in path:
             path.append(child)
-            t = idas_search(path, g + 1, bound, h_func)
+            t = idas_search(path, g + 1, bound, h_func, table, successors)
             if t == "FOUND":  # if reached goal state
                 return "FOUND"
             if t < minimum:  # if we have a new bound < inf
                 minimum = t
             path.pop()
+        else:
+            on_path = True
+    # a child skipped for being on the path says nothing about other paths to this state
+    if table is not None and not on_path:
+        table.store(key, g, minimum - g, bound)
     return minimum
 
 
-def h_cross(node):
-    """ Determine a heuristic for the bottom cross
+def table_probe(table, key, g, h, bound):
+    """ look a state up in a transposition table during an IDA* iteration
 
-    :param node: the Node to solve the cross for
-    :return: a heuristic
+    :param table: a TranspositionTable
+    :param key: the state key
+    :param g: cost from the root to the state on the current path
+    :param h: heuristic value of the state
+    :param bound: the current IDA* bound
+    :return: (the best known lower bound of the state, True if the state was already searched
+        in this iteration with a lower or equal g so its subtree can be skipped)
     """
-    h = 0
-    state = node.cube.state
-    bottom = state[0][1][1]
+    entry = table.lookup(key)
+    if entry is None:
+        return h, False
+    seen_g, seen_h, seen_bound = entry
+    if seen_h > h:
+        h = seen_h
+    return h, seen_bound == bound and seen_g <= g
 
-    # white cross perfect
-    if state[1][2][1] != state[1][1][1] or state[0][0][1] != bottom:
-        h += 1
-    if state[2][2][1] != state[2][1][1] or state[0][1][2] != bottom:
-        h += 1
-    if state[3][2][1] != state[3][1][1] or state[0][2][1] != bottom:
-        h += 1
-    if state[4][2][1] != state[4][1][1] or state[0][1][0] != bottom:
-        h += 1
 
-    # top has white edges?
-    if state[5][0][1] == bottom:
-        h += 1
-    if state[5][2][1] == bottom:
-        h += 1
-    if state[5][1][0] == bottom:
-        h += 1
-    if state[5][1][2] == bottom:
-        h += 1
+def idas_inplace(root_node, h_func, table=None, metric="qtm", canonical=True):
+    """ perform an IDA* search on a single cube that is modified in place
 
-    return h
+    unlike idas no Node or Cube is created per expansion. one MutableCube is walked
+    through the tree with apply/undo, so memory only grows with the search depth
 
+    Args:
+        root_node (Node): the Node to start the search from (left untouched)
+        h_func (function): a heuristic taking a flat facelet vector, such as h_cross_flat
+        table (TranspositionTable): optional transposition table (see idas)
+        metric (str): "qtm" or "htm", see idas
+        canonical (bool): order the turns of commuting opposite faces
 
-def h_layer1_1(node):
-    """ Determine a heuristic fo1st F2L pair
+    Returns:
+        string list: the path taken from root to solution as actions
+        false: if no path found after expanding all possible nodes
+    """
+    successors = move_set(metric, canonical).successors
+    cube = MutableCube(root_node.cube.to_facelets())
+    path = []
+    bound = h_func(cube.facelets)
+    while True:
+        t = idas_inplace_search(cube, path, 0, bound, h_func, table, successors)
+        if t == "FOUND":
+            return path
+        elif t == float('inf'):
+            return False  # not found
+        else:
+            bound = t  # increase bound to lowest neighbor's f
 
-    :param node: the Node to solve F2L on
-    :return: a heuristic
+
+def idas_inplace_search(cube, path, g, bound, h_func, table=None, successors=SUCCESSORS):
+    """recursive function to perform the search in idas_inplace
+
+    Args:
+        cube (MutableCube): the live cube, holding the state at the end of path
+        path (list): stack of the actions taken from the root to here
+        g (int): the cost it took to move from the root node to here
+        bound (int): the fscore threshold for nodes we are expanding
+        h_func (function): a heuristic taking a flat facelet vector
+        table (TranspositionTable): optional transposition table
+        successors (dict): the successor table to expand with, see get_children
+
+    Returns:
+        int/float or string: same as idas_search. on "FOUND" the cube is left in the goal state
     """
-    h = 0
-    state = node.cube.state
-    bottom = state[0][1][1]
+    h = h_func(cube.facelets)
 
-    # white cross perfect
-    if state[1][2][1] != state[1][1][1] or state[0][0][1] != bottom:
-        h += 1
-    if state[2][2][1] != state[2][1][1] or state[0][1][2] != bottom:
-        h += 1
-    if state[3][2][1] != state[3][1][1] or state[0][2][1] != bottom:
-        h += 1
-    if state[4][2][1] != state[4][1][1] or state[0][1][0] != bottom:
-        h += 1
+    if h == 0:  # if reached goal state
+        return "FOUND"
+    if table is not None:
+        key = cube.key()
+        h, seen = table_probe(table, key, g, h, bound)
+        if seen:  # already searched from here with a lower or equal g in this iteration
+            return g + h
+    f = h + g
+    if f > bound:  # if we are over the ids bound
+        return f
+    minimum = float('inf')
+    if path:
+        actions = successors[path[-1], path[-2] if len(path) > 1 else None]
+    else:
+        actions = successors[None, None]
+    for action in actions:
+        cube.apply(action)
+        path.append(action)
+        t = idas_inplace_search(cube, path, g + 1, bound, h_func, table, successors)
+        if t == "FOUND":  # if reached goal state
+            return "FOUND"
+        if t < minimum:  # if we have a new bound < inf
+            minimum = t
+        path.pop()
+        cube.undo(action)
+    if table is not None:
+        table.store(key, g, minimum - g, bound)
+    return minimum
 
-    # top has white edges?
-    if state[5][0][1] == bottom:
-        h += 1
-    if state[5][2][1] == bottom:
-        h += 1
-    if state[5][1][0] == bottom:
-        h += 1
-    if state[5][1][2] == bottom:
-        h += 1
 
-    # 1 corner
-    bad_corners = 0
-    if (state[0][0][0] != bottom or state[4][2][2] != state[4][1][1]
-            or state[1][2][0] != state[1][1][1]
-            or state[4][1][2] != state[4][1][1] or state[1][1][0] != state[1][1][1]):
-        bad_corners = bad_corners + 1
-    if (state[0][0][2] != bottom or state[1][2][2] != state[1][1][1]
-            or state[2][2][0] != state[2][1][1]
-            or state[1][1][2] != state[1][1][1] or state[2][1][0] != state[2][1][1]):
-        bad_corners = bad_corners + 1
-    if (state[0][2][2] != bottom or state[2][2][2] != state[2][1][1]
-            or state[3][2][0] != state[3][1][1]
-            or state[2][1][2] != state[2][1][1] or state[3][1][0] != state[3][1][1]):
-        bad_corners = bad_corners + 1
-    if (state[0][2][0] != bottom or state[3][2][2] != state[3][1][1]
-            or state[4][2][0] != state[4][1][1]
-            or state[3][1][2] != state[3][1][1] or state[4][1][0] != state[4][1][1]):
-        bad_corners = bad_corners + 1
-    if bad_corners == 4:
-        h += 1
+def cross_cost(facelets):
+    """ count the unsolved cross edges plus the bottom colored edges on top
+
+    :param facelets: flat facelet vector of the cube
+    :return: the cross part shared by the CFOP heuristics
+    """
+    bottom = facelets[BOTTOM]
+    h = 0
+    for edge, center, down in CROSS_EDGES:
+        if facelets[edge] != facelets[center] or facelets[down] != bottom:
+            h += 1
+    for edge in TOP_EDGES:
+        if facelets[edge] == bottom:
+            h += 1
     return h
 
 
-def h_layer1_2(node):
-    """ Determine a heuristic fo2nd F2L pair
+def count_bad_slots(facelets):
+    """ count the F2L slots whose corner and edge are not both solved
 
-    :param node: the Node to solve F2L on
-    :return: a heuristic
+    :param facelets: flat facelet vector of the cube
+    :return: number of unsolved slots (0-4)
     """
-    h = 0
-    state = node.cube.state
-    bottom = state[0][1][1]
+    bottom = facelets[BOTTOM]
+    bad = 0
+    for corner, stickers in F2L_SLOTS:
+        if facelets[corner] != bottom:
+            bad += 1
+            continue
+        for sticker, center in stickers:
+            if facelets[sticker] != facelets[center]:
+                bad += 1
+                break
+    return bad
+
+
+def h_cross_flat(facelets):
+    """ h_cross on a flat facelet vector
+    """
+    return cross_cost(facelets)
 
-    # white cross perfect
-    if state[1][2][1] != state[1][1][1] or state[0][0][1] != bottom:
-        h += 1
-    if state[2][2][1] != state[2][1][1] or state[0][1][2] != bottom:
-        h += 1
-    if state[3][2][1] != state[3][1][1] or state[0][2][1] != bottom:
-        h += 1
-    if state[4][2][1] != state[4][1][1] or state[0][1][0] != bottom:
-        h += 1
 
-    # top has white edges?
-    if state[5][0][1] == bottom:
-        h += 1
-    if state[5][2][1] == bottom:
-        h += 1
-    if state[5][1][0] == bottom:
-        h += 1
-    if state[5][1][2] == bottom:
-        h += 1
+def h_layer1_1_flat(facelets):
+    """ h_layer1_1 on a flat facelet vector
+    """
+    return cross_cost(facelets) + (count_bad_slots(facelets) == 4)
 
-    # 1 corner
-    bad_corners = 0
-    if (state[0][0][0] != bottom or state[4][2][2] != state[4][1][1]
-            or state[1][2][0] != state[1][1][1]
-            or state[4][1][2] != state[4][1][1] or state[1][1][0] != state[1][1][1]
-    ):
-        bad_corners = bad_corners + 1
-    if (state[0][0][2] != bottom or state[1][2][2] != state[1][1][1]
-            or state[2][2][0] != state[2][1][1]
-            or state[1][1][2] != state[1][1][1] or state[2][1][0] != state[2][1][1]
-    ):
-        bad_corners = bad_corners + 1
-    if (state[0][2][2] != bottom or state[2][2][2] != state[2][1][1]
-            or state[3][2][0] != state[3][1][1]
-            or state[2][1][2] != state[2][1][1] or state[3][1][0] != state[3][1][1]
-    ):
-        bad_corners = bad_corners + 1
-    if (state[0][2][0] != bottom or state[3][2][2] != state[3][1][1]
-            or state[4][2][0] != state[4][1][1]
-            or state[3][1][2] != state[3][1][1] or state[4][1][0] != state[4][1][1]
-    ):
-        bad_corners = bad_corners + 1
-    if bad_corners == 4:
-        h += 2
-    elif bad_corners == 3:
-        h += 1
 
-    return h
+def h_layer1_2_flat(facelets):
+    """ h_layer1_2 on a flat facelet vector
+    """
+    return cross_cost(facelets) + max(count_bad_slots(facelets) - 2, 0)
 
 
-def h_layer1_3(node):
-    """ Determine a heuristic fo3rd F2L pair
+def h_layer1_3_flat(facelets):
+    """ h_layer1_3 on a flat facelet vector
+    """
+    return (cross_cost(facelets) + max(count_bad_slots(facelets) - 1, 0)) * 2
 
-    :param node: the Node to solve F2L on
+
+def h_layer1_4_flat(facelets):
+    """ h_layer1_4 on a flat facelet vector
+    """
+    bottom = facelets[BOTTOM]
+    h = cross_cost(facelets) + count_bad_slots(facelets)
+    for corner in TOP_CORNERS:
+        if facelets[corner] == bottom:
+            h += 2
+    for corner in SIDE_BOTTOM_CORNERS:
+        if facelets[corner] == bottom:
+            h += 1
+    return h * 2
+
+
+def h_cross(node):
+    """ Determine a heuristic for the bottom cross
+
+    :param node: the Node to solve the cross for
     :return: a heuristic
     """
-    h = 0
-    state = node.cube.state
-    bottom = state[0][1][1]
+    return h_cross_flat(node.cube.to_facelets())
 
-    # white cross perfect
-    if state[1][2][1] != state[1][1][1] or state[0][0][1] != bottom:
-        h += 1
-    if state[2][2][1] != state[2][1][1] or state[0][1][2] != bottom:
-        h += 1
-    if state[3][2][1] != state[3][1][1] or state[0][2][1] != bottom:
-        h += 1
-    if state[4][2][1] != state[4][1][1] or state[0][1][0] != bottom:
-        h += 1
 
-    # top has white edges?
-    if state[5][0][1] == bottom:
-        h += 1
-    if state[5][2][1] == bottom:
-        h += 1
-    if state[5][1][0] == bottom:
-        h += 1
-    if state[5][1][2] == bottom:
-        h += 1
+def h_layer1_1(node):
+    """ Determine a heuristic fo1st F2L pair
 
-    # 1 corner
-    bad_corners = 0
-    if (state[0][0][0] != bottom or state[4][2][2] != state[4][1][1]
-            or state[1][2][0] != state[1][1][1]
-            or state[4][1][2] != state[4][1][1] or state[1][1][0] != state[1][1][1]
-    ):
-        bad_corners = bad_corners + 1
-    if (state[0][0][2] != bottom or state[1][2][2] != state[1][1][1]
-            or state[2][2][0] != state[2][1][1]
-            or state[1][1][2] != state[1][1][1] or state[2][1][0] != state[2][1][1]
-    ):
-        bad_corners = bad_corners + 1
-    if (state[0][2][2] != bottom or state[2][2][2] != state[2][1][1]
-            or state[3][2][0] != state[3][1][1]
-            or state[2][1][2] != state[2][1][1] or state[3][1][0] != state[3][1][1]
-    ):
-        bad_corners = bad_corners + 1
-    if (state[0][2][0] != bottom or state[3][2][2] != state[3][1][1]
-            or state[4][2][0] != state[4][1][1]
-            or state[3][1][2] != state[3][1][1] or state[4][1][0] != state[4][1][1]
-    ):
-        bad_corners = bad_corners + 1
-    if bad_corners == 4:
-        h += 3
-    elif bad_corners == 3:
-        h += 2
-    elif bad_corners == 2:
-        h += 1
-    return h * 2
+    :param node: the Node to solve F2L on
+    :return: a heuristic
+    """
+    return h_layer1_1_flat(node.cube.to_facelets())
 
 
-def h_layer1_4(node):
-    """ Determine a heuristic fo4th (final) F2L pair
+def h_layer1_2(node):
+    """ Determine a heuristic fo2nd F2L pair
 
     :param node: the Node to solve F2L on
     :return: a heuristic
     """
-    h = 0
-    state = node.cube.state
-    bottom = state[0][1][1]
-    right = state[2][1][1]
-    left = state[4][1][1]
-    front = state[1][1][1]
-    back = state[3][1][1]
+    return h_layer1_2_flat(node.cube.to_facelets())
 
-    # white cross perfect
-    if state[1][2][1] != state[1][1][1] or state[0][0][1] != bottom:
-        h += 1
-    if state[2][2][1] != state[2][1][1] or state[0][1][2] != bottom:
-        h += 1
-    if state[3][2][1] != state[3][1][1] or state[0][2][1] != bottom:
-        h += 1
-    if state[4][2][1] != state[4][1][1] or state[0][1][0] != bottom:
-        h += 1
 
-    # top has white edges?
-    if state[5][0][1] == bottom:
-        h += 1
-    if state[5][2][1] == bottom:
-        h += 1
-    if state[5][1][0] == bottom:
-        h += 1
-    if state[5][1][2] == bottom:
-        h += 1
+def h_layer1_3(node):
+    """ Determine a heuristic fo3rd F2L pair
 
-    # 1 corner
-    bad_corners = 0
-    if (state[0][0][0] != bottom or state[4][2][2] != left
-            or state[1][2][0] != front
-            or state[4][1][2] != left or state[1][1][0] != front):
-        h += 1
-    if (state[0][0][2] != bottom or state[1][2][2] != front
-            or state[2][2][0] != right
-            or state[1][1][2] != front or state[2][1][0] != right):
-        h += 1
-    if (state[0][2][2] != bottom or state[2][2][2] != right
-            or state[3][2][0] != back
-            or state[2][1][2] != right or state[3][1][0] != back):
-        h += 1
-    if (state[0][2][0] != bottom or state[3][2][2] != back
-            or state[4][2][0] != left
-            or state[3][1][2] != back or state[4][1][0] != left):
-        h += 1
+    :param node: the Node to solve F2L on
+    :return: a heuristic
+    """
+    return h_layer1_3_flat(node.cube.to_facelets())
 
-    # top has bottom corners?
-    if state[5][0][2] == bottom:
-        h += 2
-    if state[5][2][0] == bottom:
-        h += 2
-    if state[5][0][0] == bottom:
-        h += 2
-    if state[5][2][2] == bottom:
-        h += 2
-
-    # misoriented bottom corners
-    if state[1][2][0] == bottom:
-        h += 1
-    if state[1][2][2] == bottom:
-        h += 1
-    if state[2][2][0] == bottom:
-        h += 1
-    if state[2][2][2] == bottom:
-        h += 1
-    if state[3][2][0] == bottom:
-        h += 1
-    if state[3][2][2] == bottom:
-        h += 1
-    if state[4][2][0] == bottom:
-        h += 1
-    if state[4][2][2] == bottom:
-        h += 1
 
-    # if state[1][1][0] == left and state[4][1][2] == bottom:
-    #     h += 3
-    # if state[1][1][2] == right and state[2][1][0] == bottom:
-    #     h += 3
-    # if state[2][1][2] == back and state[3][1][0] == right:
-    #     h += 3
-    # if state[3][1][2] == left and state[4][1][0] == back:
-    #     h += 3
+def h_layer1_4(node):
+    """ Determine a heuristic fo4th (final) F2L pair
 
-    return h * 2
+    :param node: the Node to solve F2L on
+    :return: a heuristic
+    """
+    return h_layer1_4_flat(node.cube.to_facelets())
 
 
 def goal_test_oll(node):
@@ -446,34 +421,8 @@ def goal_test_oll(node):
     :param node: the Node to test
     :return: True if solved, False if unsolved
     """
-    state = node.cube.state
-
-    bottom = state[0][1][1]
-    top = state[5][1][1]
-    right = state[2][1][1]
-    left = state[4][1][1]
-    front = state[1][1][1]
-    back = state[3][1][1]
-
     # checks that everything is solved besides last layer permutation
-    return state[1][2][1] == front and state[0][0][1] == bottom and \
-           state[2][2][1] == right and state[0][1][2] == bottom and \
-           state[3][2][1] == back and state[0][2][1] == bottom and \
-           state[4][2][1] == left and state[0][1][0] == bottom and \
-           state[0][0][0] == bottom and state[4][2][2] == left and \
-           state[1][2][0] == front and state[0][0][2] == bottom and \
-           state[1][2][2] == front and state[2][2][0] == right and \
-           state[0][2][2] == bottom and state[2][2][2] == right and \
-           state[3][2][0] == back and state[0][2][0] == bottom and \
-           state[3][2][2] == back and state[4][2][0] == left and \
-           state[4][1][2] == left and state[1][1][0] == front and \
-           state[1][1][2] == front and state[2][1][0] == right and \
-           state[2][1][2] == right and state[3][1][0] == back and \
-           state[3][1][2] == back and state[4][1][0] == left and \
-           state[5][0][1] == top and state[5][1][2] == top and \
-           state[5][2][1] == top and state[5][1][0] == top and \
-           state[5][0][0] == top and state[5][0][2] == top and \
-           state[5][2][2] == top and state[5][2][0] == top
+    return matches(node.cube.key(), OLL_MASK)
 
 
 def goal_test_solved(node):
@@ -482,40 +431,7 @@ def goal_test_solved(node):
     :param node: the Node to test
     :return: True if solved, False if unsolved
     """
-    state = node.cube.state
-
-    bottom = state[0][1][1]
-    top = state[5][1][1]
-    right = state[2][1][1]
-    left = state[4][1][1]
-    front = state[1][1][1]
-    back = state[3][1][1]
-
-    # checks that everythin is solved besides last layer permutation
-    return state[1][2][1] == front and state[0][0][1] == bottom and \
-           state[2][2][1] == right and state[0][1][2] == bottom and \
-           state[3][2][1] == back and state[0][2][1] == bottom and \
-           state[4][2][1] == left and state[0][1][0] == bottom and \
-           state[0][0][0] == bottom and state[4][2][2] == left and \
-           state[1][2][0] == front and state[0][0][2] == bottom and \
-           state[1][2][2] == front and state[2][2][0] == right and \
-           state[0][2][2] == bottom and state[2][2][2] == right and \
-           state[3][2][0] == back and state[0][2][0] == bottom and \
-           state[3][2][2] == back and state[4][2][0] == left and \
-           state[4][1][2] == left and state[1][1][0] == front and \
-           state[1][1][2] == front and state[2][1][0] == right and \
-           state[2][1][2] == right and state[3][1][0] == back and \
-           state[3][1][2] == back and state[4][1][0] == left and \
-           state[5][0][1] == top and state[5][1][2] == top and \
-           state[5][2][1] == top and state[5][1][0] == top and \
-           state[5][0][0] == top and state[5][0][2] == top and \
-           state[5][2][2] == top and state[5][2][0] == top and \
-           state[1][0][1] == front and state[2][0][1] == right and \
-           state[3][0][1] == back and state[4][0][1] == left and \
-           state[3][0][2] == back and state[4][0][0] == left and \
-           state[3][0][0] == back and state[2][0][2] == right and \
-           state[1][0][2] == front and state[2][0][0] == right and \
-           state[4][0][2] == left and state[1][0][0] == front
+    return is_solved(node.cube.key())
 
 
 def test_actions():
@@ -532,162 +448,262 @@ def test_actions():
         root.cube.execute_action(action).display_colors()
 
 
-def test_alg_oll(node, alg):
-    """ Determine if the given algorithm can solve OLL for the node.
-
-    :param node: a Node containing the Cube before OLL
-    :param alg: a list containing the base algorithm to test cases for
-    :return: If the algorithm succeeds, the succeeding algorithm variant.
-        Otherwise, False
-    """
-    test_node = Node(node.cube.execute_action_sequence(alg), None, None)
-    if goal_test_oll(test_node):
-        return alg
-    alg.insert(0, "U")
-    test_node = Node(node.cube.execute_action_sequence(alg), None, None)
-    if goal_test_oll(test_node):
-        return alg
-    alg[0] = "U'"
-    test_node = Node(node.cube.execute_action_sequence(alg), None, None)
-    if goal_test_oll(test_node):
-        return alg
-    alg[0] = "U2"
-    test_node = Node(node.cube.execute_action_sequence(alg), None, None)
-    if goal_test_oll(test_node):
-        return alg
-
-    return False
-
-
 def solve_oll(node):
     """ Find an OLL sequence for the cube
 
+    the case is looked up in the OLL index (lastlayer.py) instead of trying every algorithm
+
     :param node: a Node for the cube state before OLL. should have F2L finished.
-    :return: the algorithm that solves OLL
+    :return: the algorithm that solves OLL, False if no algorithm solves the case
     """
     if goal_test_oll(node):
         return []
     try:
-        with open(oll_file_path, 'r') as f:
-            lines = f.read().splitlines()
-            for l in lines:
-                result = test_alg_oll(node, l.split())
-                if result != False:
-                    f.close()
-                    return result
-            return False
+        alg = oll_algorithm(node.cube.key())
     except IOError:
         print("There was an error reading oll.txt.")
         exit()
-
-
-def test_alg_pll(node, alg):
-    """ Determine if the given algorithm can solve PLL for the node.
-
-    :param node: a Node containing the Cube before PLL
-    :param alg: a list containing the base algorithm to test cases for
-    :return: if the algorithm succeeds, the succeeding algorithm variant.
-        otherwise, False
-    """
-    test_node = Node(node.cube.execute_action_sequence(alg), None, None)
-    if goal_test_solved(test_node):
-        return alg
-    elif goal_test_solved(Node(test_node.cube.execute_action("U"), None, None)):
-        return alg + ["U"]
-    elif goal_test_solved(Node(test_node.cube.execute_action("U'"), None, None)):
-        return alg + ["U'"]
-    elif goal_test_solved(Node(test_node.cube.execute_action("U2"), None, None)):
-        return alg + ["U2"]
-
-    alg.insert(0, "U")
-    test_node = Node(node.cube.execute_action_sequence(alg), None, None)
-    if goal_test_solved(test_node):
-        return alg
-    elif goal_test_solved(Node(test_node.cube.execute_action("U"), None, None)):
-        return alg + ["U"]
-    elif goal_test_solved(Node(test_node.cube.execute_action("U'"), None, None)):
-        return alg + ["U'"]
-    elif goal_test_solved(Node(test_node.cube.execute_action("U2"), None, None)):
-        return alg + ["U2"]
-
-    alg[0] = "U2"
-    test_node = Node(node.cube.execute_action_sequence(alg), None, None)
-    if goal_test_solved(test_node):
-        return alg
-    elif goal_test_solved(Node(test_node.cube.execute_action("U"), None, None)):
-        return alg + ["U"]
-    elif goal_test_solved(Node(test_node.cube.execute_action("U'"), None, None)):
-        return alg + ["U'"]
-    elif goal_test_solved(Node(test_node.cube.execute_action("U2"), None, None)):
-        return alg + ["U2"]
-
-    alg[0] = "U'"
-    test_node = Node(node.cube.execute_action_sequence(alg), None, None)
-    if goal_test_solved(test_node):
-        return alg
-    elif goal_test_solved(Node(test_node.cube.execute_action("U"), None, None)):
-        return alg + ["U"]
-    elif goal_test_solved(Node(test_node.cube.execute_action("U'"), None, None)):
-        return alg + ["U'"]
-    elif goal_test_solved(Node(test_node.cube.execute_action("U2"), None, None)):
-        return alg + ["U2"]
-
-    return False
+    return alg if alg is not None else False
 
 
 def solve_pll(node):
     """ Find a PLL sequence for the cube
 
+    the case is looked up in the PLL index (lastlayer.py) instead of trying every algorithm
+
     :param node: a Node for the cube state before PLL. should have OLL finished.
-    :return: the algorithm that solves PLL
+    :return: the algorithm that solves PLL, False if no algorithm solves the case
     """
     if goal_test_solved(node):
         return []
     try:
-        with open(pll_file_path, 'r') as f:
-            lines = f.read().splitlines()
-            # lines = [l.split(',') for l in lines]
-            for line in lines:
-                result = test_alg_pll(node, line.split())
-                if result:
-                    f.close()
-                    return result
-            return False
+        alg = pll_algorithm(node.cube.key())
     except IOError:
-        print("There was an error reading oll.txt.")
+        print("There was an error reading pll.txt.")
         exit()
+    return alg if alg is not None else False
 
 
-def solve_cfop(node):
+def solve_cfop(node, parallel=(), workers=None, stats=None, color_neutral=False, f2l_mode="cheapest", cache=None,
+               deadline=None):
     """ Find a solution sequence to the cube using CFOP method
 
+    the cross is read from the cross pattern database (cross.py) and is always optimal.
+    with color_neutral it is built on the face whose cross plus estimated F2L is the cheapest
+    (neutral.py), the cube is rotated to put that face at the bottom before solving.
+    the F2L pairs are inserted one at a time, by looking up the algorithm of their case
+    (f2lcases.py) or with the fewest moves that keep the cross and the previous pairs solved
+    (f2l.py), see f2l_mode.
+    the phases are joined with simplify_sequence, which cancels and merges the turns around
+    phase boundaries and removes the whole cube rotations used by the OLL/PLL algorithms
+
     :param node: a Node for the initial cube state to solve
+    :param parallel: phases ("cross", "f2l") to solve with the heuristic IDA* searches (h_cross_flat,
+        h_layer1_*_flat) split over worker processes (parallel.py) instead of the pattern databases
+    :param workers: number of worker processes for the parallel phases, one per CPU if None
+    :param stats: optional dict, filled with {phase: {"length", "seconds", "nodes"}} for the
+        cross, f2l, oll and pll phases. nodes counts search nodes, 0 for table lookups.
+        the cross entry also has the "face" the cross was built on (D unless color neutral)
+    :param color_neutral: True to try the cross on every face, or a subset of neutral.FACES.
+        the candidates are evaluated on `workers` processes. the cross then always comes from
+        the pattern database, even if "cross" is in parallel
+    :param f2l_mode: how the F2L pairs are inserted, one of f2lcases.F2L_MODES: "search" for the
+        shortest insertions, "table" or "cheapest" for case lookups that only search for pairs
+        outside the standard cases. "cheapest" picks the pair with the shortest algorithm next
+    :param cache: optional SolveCache (solvecache.py), a cube whose class was solved with the same
+        options is answered from it, with only a "cache" entry in stats
+    :param deadline: time.perf_counter() value, keep looking for shorter solutions until then,
+        see solve_cfop_anytime
     :return: solve_path: the sequence that solves the cube
     :return: node: a Node for the newly solved cube
     """
-    cross_path = idas(node, h_cross)
-    node.cube = node.cube.execute_action_sequence(cross_path)
-
-    f2l_path1 = idas(node, h_layer1_1)
-    node.cube = node.cube.execute_action_sequence(f2l_path1)
-    f2l_path2 = idas(node, h_layer1_2)
-    node.cube = node.cube.execute_action_sequence(f2l_path2)
-    f2l_path3 = idas(node, h_layer1_3)
-    node.cube = node.cube.execute_action_sequence(f2l_path3)
-    f2l_path4 = idas(node, h_layer1_4)
-    node.cube = node.cube.execute_action_sequence(f2l_path4)
-
+    if cache is not None:
+        neutral = "".join(color_neutral) if isinstance(color_neutral, (tuple, list)) else str(bool(color_neutral))
+        method = "cfop %s %s %s%s" % (f2l_mode, neutral, ",".join(sorted(parallel)), budget_key(deadline))
+        return cache.solve(node, method, lambda n: solve_cfop(n, parallel, workers, stats, color_neutral, f2l_mode,
+                                                              deadline=deadline), stats)
+    if deadline is not None:
+        return solve_cfop_anytime(node, deadline, parallel, workers, stats, color_neutral, f2l_mode)
+    if stats is None:
+        stats = {}
+    start_cube = node.cube
+    pool = ParallelSearch(workers) if parallel else None
+    try:
+        start = time.perf_counter()
+        nodes = 0
+        face = "D"
+        if color_neutral:
+            candidate = best_cross(node.cube.key(), FACES if color_neutral is True else color_neutral, workers)
+            face = candidate.face
+            # the rotation is part of the path until simplify_sequence drops it below
+            cross_path = list(candidate.rotation) + candidate.cross
+        elif "cross" in parallel:
+            result = pool.ida_star(node.cube.key(), h_cross_flat)
+            cross_path = result.path
+            nodes = result.nodes
+        else:
+            cross_path = solve_cross(node.cube.key())
+        node.cube = node.cube.execute_action_sequence(cross_path)
+        stats["cross"] = phase_stats(cross_path[len(CROSS_ROTATIONS[face]):], start, nodes)
+        stats["cross"]["face"] = face
+
+        start = time.perf_counter()
+        f2l_path = []
+        nodes = 0
+        if "f2l" in parallel:
+            for h_func in (h_layer1_1_flat, h_layer1_2_flat, h_layer1_3_flat, h_layer1_4_flat):
+                result = pool.ida_star(node.cube.key(), h_func)
+                node.cube = node.cube.execute_action_sequence(result.path)
+                f2l_path += result.path
+                nodes += result.nodes
+        else:
+            done = []
+            while len(done) < 4:
+                pair_path, slot, expanded = insert_pair(node.cube.key(), done, f2l_mode)
+                node.cube = node.cube.execute_action_sequence(pair_path)
+                f2l_path += pair_path
+                nodes += expanded
+                done.append(slot)
+        stats["f2l"] = phase_stats(f2l_path, start, nodes)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    start = time.perf_counter()
     oll_path = solve_oll(node)
     node.cube = node.cube.execute_action_sequence(oll_path)
+    stats["oll"] = phase_stats(oll_path, start)
+    start = time.perf_counter()
     pll_path = solve_pll(node)
     node.cube = node.cube.execute_action_sequence(pll_path)
+    stats["pll"] = phase_stats(pll_path, start)
 
-    solve_path = cross_path + f2l_path1 + f2l_path2 + f2l_path3 \
-                 + f2l_path4 + oll_path + pll_path
+    solve_path = cross_path + f2l_path + oll_path + pll_path
+    solve_path = simplify_sequence(solve_path, keep_rotation=False)
+    node.cube = start_cube.execute_action_sequence(solve_path)
 
     return solve_path, node
 
 
+def cfop_variant(facelets, face="D", f2l_mode="cheapest", order=None, oll_auf=(), deadline=None):
+    """ solve a cube with one set of CFOP choices, for solve_cfop_anytime
+
+    :param facelets: flat facelet vector of the cube
+    :param face: face to build the cross on, one of neutral.FACES
+    :param f2l_mode: how the F2L pairs are inserted, see solve_cfop
+    :param order: the 4 F2L slots in insertion order, None to let f2l_mode pick them
+    :param oll_auf: U turns applied before looking up the OLL case, one of lastlayer.OLL_PRE_AUFS
+    :param deadline: time.perf_counter() value the F2L searches give up at, None for no limit
+    :return: the simplified solve path, None if a last layer case has no algorithm or the deadline passed
+    """
+    path = list(CROSS_ROTATIONS[face])
+    facelets = execute_action_sequence(facelets, path)
+    cross = solve_cross(facelets)
+    facelets = execute_action_sequence(facelets, cross)
+    path += cross
+    done = []
+    while len(done) < 4:
+        pair_path, slot, _ = insert_pair(facelets, done, f2l_mode, None if order is None else order[len(done)],
+                                         deadline)
+        if pair_path is None:
+            return None
+        facelets = execute_action_sequence(facelets, pair_path)
+        path += pair_path
+        done.append(slot)
+    facelets = execute_action_sequence(facelets, oll_auf)
+    path += oll_auf
+    for solved, algorithm in ((lambda f: matches(f, OLL_MASK), oll_algorithm), (is_solved, pll_algorithm)):
+        if not solved(facelets):
+            alg = algorithm(facelets)
+            if alg is None:
+                return None
+            facelets = execute_action_sequence(facelets, alg)
+            path += alg
+    return simplify_sequence(path, keep_rotation=False)
+
+
+def cfop_variants(faces=FACES):
+    """ the CFOP choices solve_cfop_anytime tries, the ones that cost least to evaluate first
+
+    :param faces: the cross faces to try
+    :return: generator of keyword argument dicts for cfop_variant
+    """
+    for face in faces:
+        for auf in OLL_PRE_AUFS:
+            yield {"face": face, "oll_auf": auf}
+    # searched pairs cost more but usually save the most moves
+    for face in faces:
+        yield {"face": face, "f2l_mode": "search"}
+    for order in permutations(range(4)):
+        for face in faces:
+            yield {"face": face, "f2l_mode": "table", "order": order}
+
+
+def solve_cfop_anytime(node, deadline, parallel=(), workers=None, stats=None, color_neutral=False,
+                       f2l_mode="cheapest"):
+    """ solve_cfop with a deadline: a first solution right away, then shorter ones while time is left
+
+    the first solution is the one solve_cfop finds with the same options. the choices of
+    cfop_variants are then tried one at a time: the cross on every face, a U turn before OLL
+    (another OLL and PLL recognition angle), searched F2L pairs and other F2L slot orders.
+    a choice is skipped when the slowest one of its F2L mode so far took longer than the time
+    left, and the F2L searches of a choice stop at the deadline, so only the first solution can
+    take longer
+
+    :param node: a Node for the initial cube state to solve
+    :param deadline: time.perf_counter() value to stop improving at
+    :param stats: optional dict, filled like solve_cfop's for the first solution, plus an "anytime"
+        entry {"length", "seconds", "nodes", "first", "improved", "variants", "variant"}: the length
+        of the first solution, True if a shorter one was found, how many choices were tried and
+        the cfop_variant arguments of the returned solution (None for the first one)
+    :return: solve_path: the shortest sequence found that solves the cube
+    :return: node: a Node for the newly solved cube
+    """
+    if stats is None:
+        stats = {}
+    start = time.perf_counter()
+    start_cube = node.cube
+    best, node = solve_cfop(node, parallel, workers, stats, color_neutral, f2l_mode)
+    first = len(best)
+    facelets = start_cube.key()
+    variant = None
+    tried = 0
+    slowest = {}  # f2l mode -> seconds of its slowest variant so far
+    for options in cfop_variants():
+        mode = options.get("f2l_mode", "cheapest")
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+        if now + slowest.get(mode, 0.0) > deadline:
+            continue
+        path = cfop_variant(facelets, deadline=deadline, **options)
+        slowest[mode] = max(slowest.get(mode, 0.0), time.perf_counter() - now)
+        tried += 1
+        if path is not None and len(path) < len(best):
+            best = path
+            variant = options
+    node.cube = start_cube.execute_action_sequence(best)
+    stats["anytime"] = phase_stats(best, start)
+    stats["anytime"].update(first=first, improved=len(best) < first, variants=tried, variant=variant)
+    return best, node
+
+
+def budget_key(deadline):
+    """ the time limit part of a solve cache method key, so anytime results are only reused for
+    the same time limit
+
+    :param deadline: time.perf_counter() value, or None
+    :return: the time left rounded to 0.1 s, "" without a deadline
+    """
+    return "" if deadline is None else " %.1fs" % max(deadline - time.perf_counter(), 0.0)
+
+
+def phase_stats(path, start, nodes=0):
+    """ :return: the stats entry of a solving phase that started at time.perf_counter() == start
+    """
+    return {"length": len(path), "seconds": time.perf_counter() - start, "nodes": nodes}
+
+
 def h_g1(node):
     h = 0
 
@@ -754,10 +770,114 @@ def h_g1(node):
     return h * 2
 
 
-def solve_kociemba(node):
-    g1_path = idas(node, h_g1)
-    node.cube = node.cube.execute_action_sequence(g1_path)
+def solve_kociemba(node, target_length=21, time_budget=1.0, stats=None, cache=None, deadline=None):
+    """ Find a short solution sequence with Kociemba's two-phase algorithm (kociemba.py)
+
+    the search is anytime: its first solution comes quickly and is improved until the target
+    length is reached or the time is up
+
+    :param node: a Node for the initial cube state to solve
+    :param target_length: stop searching once a solution this short is found
+    :param time_budget: seconds to spend looking for shorter solutions
+    :param stats: optional dict, filled with {"two-phase": {"length", "seconds", "nodes", "first", "improved"}},
+        first is the length of the first solution found and improved is True if a shorter one was
+    :param cache: optional SolveCache (solvecache.py), see solve_cfop
+    :param deadline: time.perf_counter() value to stop improving at, replaces time_budget
+    :return: solve_path: the sequence that solves the cube, of face turns only
+    :return: node: a Node for the newly solved cube
+    """
+    if deadline is not None:
+        time_budget = max(deadline - time.perf_counter(), 0.0)
+    if cache is not None:
+        method = "kociemba %d %.1fs" % (target_length, time_budget)
+        return cache.solve(node, method, lambda n: solve_kociemba(n, target_length, time_budget, stats), stats)
+    start = time.perf_counter()
+    two_phase = kociemba.two_phase_solver()
+    solve_path = two_phase.solve(node.cube.key(), target_length, time_budget)
+    node.cube = node.cube.execute_action_sequence(solve_path)
+    if stats is not None:
+        stats["two-phase"] = phase_stats(solve_path, start, two_phase.nodes)
+        stats["two-phase"].update(first=two_phase.first_length, improved=len(solve_path) < two_phase.first_length)
+
+    return solve_path, node
+
+
+def solve_optimal(node, progress=None, stats=None, cache=None, deadline=None):
+    """ Find a shortest solution sequence with Korf's IDA* and pattern databases (optimal.py)
+
+    the pattern databases must be built ahead of time (optimal.BUILD_COMMAND), which takes
+    hours, and a deep scramble can take hours more to solve
+
+    :param node: a Node for the initial cube state to solve
+    :param progress: optional function called with (depth, nodes, seconds) during the search
+    :param stats: optional dict, filled with {"optimal": {"length", "seconds", "nodes"}}
+    :param cache: optional SolveCache (solvecache.py), see solve_cfop. a symmetric copy of an
+        optimal solution is optimal too
+    :param deadline: time.perf_counter() value to return by, with the shortest solution found so
+        far if it is not proven optimal, see solve_optimal_anytime
+    :return: solve_path: the sequence that solves the cube, of face turns only
+    :return: node: a Node for the newly solved cube
+    :raises FileNotFoundError: without a deadline, if the pattern databases are not built yet
+    """
+    if cache is not None:
+        return cache.solve(node, "optimal" + budget_key(deadline),
+                           lambda n: solve_optimal(n, progress, stats, deadline=deadline), stats)
+    if deadline is not None:
+        return solve_optimal_anytime(node, deadline, progress, stats)
+    start = time.perf_counter()
+    korf = optimal.optimal_solver()
+    solve_path = korf.solve(node.cube.key(), progress=progress)
+    node.cube = node.cube.execute_action_sequence(solve_path)
+    if stats is not None:
+        stats["optimal"] = phase_stats(solve_path, start, korf.nodes)
 
-    solve_path = g1_path
     return solve_path, node
 
+
+def solve_optimal_anytime(node, deadline, progress=None, stats=None):
+    """ solve_optimal with a deadline, improving a quick solution until it is proven optimal or time is up
+
+    the first solution comes from solve_cfop, a quarter of the time left then goes to the
+    two-phase search and the rest to the optimal search for anything shorter. the optimal
+    search only runs if its pattern databases are already on disk, building them takes hours,
+    else the two-phase search gets all the time
+
+    :param node: a Node for the initial cube state to solve
+    :param deadline: time.perf_counter() value to return by
+    :param progress: optional function called with (depth, nodes, seconds) during the optimal search
+    :param stats: optional dict, filled with {"anytime": {"length", "seconds", "nodes", "first",
+        "improved", "method", "optimal"}}: the length of the first solution, True if a shorter one
+        was found, the solver of the returned solution and True if it is proven optimal
+    :return: solve_path: the shortest sequence found that solves the cube, of face turns only
+    :return: node: a Node for the newly solved cube
+    """
+    start = time.perf_counter()
+    start_cube = node.cube
+    facelets = start_cube.key()
+    best, node = solve_cfop(node)
+    first = len(best)
+    method = "cfop"
+    proven = False
+    nodes = 0
+    remaining = deadline - time.perf_counter()
+    ready = optimal.databases_ready()
+    if remaining > 0:
+        two_phase = kociemba.two_phase_solver()
+        path = two_phase.solve(facelets, 0, remaining / 4 if ready else remaining)
+        nodes += two_phase.nodes
+        if len(path) < len(best):
+            best = path
+            method = "two-phase"
+    if time.perf_counter() < deadline and ready:
+        korf = optimal.optimal_solver()
+        path = korf.solve(facelets, len(best) - 1, progress, deadline)
+        nodes += korf.nodes
+        if path is not None:
+            best = path
+            method = "optimal"
+        proven = not korf.timed_out
+    node.cube = start_cube.execute_action_sequence(best)
+    if stats is not None:
+        stats["anytime"] = phase_stats(best, start, nodes)
+        stats["anytime"].update(first=first, improved=len(best) < first, method=method, optimal=proven)
+    return best, node
@@ -0,0 +1,311 @@
+"""
+symmetry.py
+Module for the 48 symmetries of the cube and canonical states
+
+A symmetry is a rotation or reflection of the whole cube: the 48 signed permutation
+matrices of 3d space, the 24 rotations first (symmetry 0 is the identity) and then the
+24 reflections. Each one moves the stickers, so it is a permutation of the flat facelet
+vector (see facelet.py), computed from the position of every sticker in space.
+
+A symmetric copy of a cube is solved by the symmetric copy of its solution: every action
+maps to the conjugated action (R to L' for the left-right mirror...), so a solution found
+for one state solves all 48 copies, under any color scheme. canonical picks one state per
+class: the smallest facelet vector over all symmetries, with the colors relabeled through
+the centers to the solved scheme.
+
+At the cubie level (cubie.py) a symmetry moves every piece to another position and
+piece, with a new orientation, so conjugate_cubie only needs a small table per piece.
+Coordinates are conjugated with tables like the move tables (conjugate_table): the
+corner permutation under all 48 symmetries, and the twist, flip and UD-slice under the
+symmetries that keep the axes their orientations are measured against.
+"""
+from array import array
+from itertools import permutations
+from itertools import product
+from operator import itemgetter
+
+from .actions import ACTIONS_3x3
+from .cube import solved_state_ints
+from .cubie import CORNER_FACELETS
+from .cubie import EDGE_FACELETS
+from .cubie import FACE_MOVES
+from .cubie import N_CORNERS
+from .cubie import N_CORNERS_PERM
+from .cubie import N_EDGES
+from .cubie import N_FLIP
+from .cubie import N_SLICE
+from .cubie import N_TWIST
+from .cubie import CubieCube
+from .facelet import N_FACELETS
+from .facelet import PERMUTATIONS
+from .facelet import facelet_index
+from .facelet import invert_permutation
+from .facelet import state_to_facelets
+from .tables import load_array
+
+CENTERS = tuple(facelet_index(face, 1, 1) for face in range(6))
+SOLVED_CENTERS = bytes(state_to_facelets(solved_state_ints)[i] for i in CENTERS)
+
+# (normal, right, down) of each face seen from outside: x to the right, y up, z to the front
+FACE_FRAMES = (((0, -1, 0), (1, 0, 0), (0, 0, -1)),  # D
+               ((0, 0, 1), (1, 0, 0), (0, -1, 0)),  # F
+               ((1, 0, 0), (0, 0, -1), (0, -1, 0)),  # R
+               ((0, 0, -1), (-1, 0, 0), (0, -1, 0)),  # B
+               ((-1, 0, 0), (0, 0, 1), (0, -1, 0)),  # L
+               ((0, 1, 0), (1, 0, 0), (0, 0, 1)))  # U
+
+
+def sticker_position(i):
+    """ :return: integer 3d coordinates of the center of sticker i, the cube center at the origin
+    """
+    face, rest = divmod(i, 9)
+    row, col = divmod(rest, 3)
+    normal, right, down = FACE_FRAMES[face]
+    return tuple(3 * n + 2 * (col - 1) * r + 2 * (row - 1) * d for n, r, d in zip(normal, right, down))
+
+
+def _matrices():
+    """ :return: the 48 signed permutation matrices as (axes, signs), rotations first
+    """
+    rotations = []
+    reflections = []
+    for axes in permutations(range(3)):
+        parity = sum(1 for a in range(3) for b in range(a + 1, 3) if axes[a] > axes[b]) % 2
+        for signs in product((1, -1), repeat=3):
+            determinant = (-1) ** parity * signs[0] * signs[1] * signs[2]
+            (rotations if determinant == 1 else reflections).append((axes, signs))
+    return tuple(rotations + reflections)
+
+
+MATRICES = _matrices()
+N_SYMMETRIES = len(MATRICES)
+N_ROTATIONS = N_SYMMETRIES // 2
+
+
+def transform(matrix, point):
+    axes, signs = matrix
+    return tuple(sign * point[axis] for axis, sign in zip(axes, signs))
+
+
+def symmetry_permutation(matrix):
+    """ :return: permutation of the flat facelets moving every sticker by matrix, new[j] == old[perm[j]]
+    """
+    index = {sticker_position(i): i for i in range(N_FACELETS)}
+    perm = [0] * N_FACELETS
+    for i in range(N_FACELETS):
+        perm[index[transform(matrix, sticker_position(i))]] = i
+    return tuple(perm)
+
+
+SYMMETRY_PERMUTATIONS = tuple(symmetry_permutation(matrix) for matrix in MATRICES)
+SYMMETRY_GATHERS = tuple(itemgetter(*perm) for perm in SYMMETRY_PERMUTATIONS)
+INVERSE_SYMMETRY = tuple(SYMMETRY_PERMUTATIONS.index(invert_permutation(perm)) for perm in SYMMETRY_PERMUTATIONS)
+# symmetries keeping the U-D axis (twist and UD-slice are measured against it), and also the F-B axis (flip)
+UD_SYMMETRIES = tuple(s for s, (axes, signs) in enumerate(MATRICES) if axes[1] == 1)
+UD_FB_SYMMETRIES = tuple(s for s, (axes, signs) in enumerate(MATRICES) if axes == (0, 1, 2))
+# RECOLOR[s] renames the colors of a relabeled cube's symmetric copy back to the solved scheme
+RECOLOR = tuple(bytes.maketrans(bytes(SOLVED_CENTERS[CENTERS.index(perm[c])] for c in CENTERS), SOLVED_CENTERS)
+                for perm in SYMMETRY_PERMUTATIONS)
+PREFIX = 12  # canonical compares this many stickers of every copy before building the whole copies
+_SYMMETRIES = tuple(zip(range(N_SYMMETRIES), (itemgetter(*perm[:PREFIX]) for perm in SYMMETRY_PERMUTATIONS),
+                        SYMMETRY_GATHERS, RECOLOR))
+
+
+def _action_maps():
+    """ conjugate every action by every symmetry
+
+    :return: tuple of dicts, ACTION_MAPS[s][action] is the action doing to the symmetric copy
+        what action does to the cube
+    :raises ValueError: if an action has no conjugate in ACTIONS_3x3
+    """
+    by_perm = {}
+    for action in ACTIONS_3x3:
+        by_perm.setdefault(PERMUTATIONS[action], action)
+    maps = []
+    for perm in SYMMETRY_PERMUTATIONS:
+        inverse = invert_permutation(perm)
+        mapping = {}
+        for action in ACTIONS_3x3:
+            moves = PERMUTATIONS[action]
+            conjugate = tuple(inverse[moves[perm[j]]] for j in range(N_FACELETS))
+            if conjugate not in by_perm:
+                raise ValueError("no action is conjugate to %s" % action)
+            mapping[action] = by_perm[conjugate]
+        maps.append(mapping)
+    return tuple(maps)
+
+
+ACTION_MAPS = _action_maps()
+# MOVE_MAPS[s][m] is the index in cubie.FACE_MOVES of the conjugate of FACE_MOVES[m], for coordinate searches
+MOVE_MAPS = tuple(tuple(FACE_MOVES.index(mapping[move]) for move in FACE_MOVES) for mapping in ACTION_MAPS)
+
+
+def apply_symmetry(facelets, s):
+    """ :return: the facelets of the symmetric copy s of a cube, colors unchanged
+    """
+    return bytes(SYMMETRY_GATHERS[s](facelets))
+
+
+def relabel(facelets):
+    """ :return: the facelets with each color renamed after the center showing it, in the solved scheme
+    """
+    table = bytearray(range(256))
+    for center, color in zip(CENTERS, SOLVED_CENTERS):
+        table[facelets[center]] = color
+    return facelets.translate(table)
+
+
+def map_actions(actions, s):
+    """ :return: list of the actions doing to symmetric copy s what actions do to the cube
+    """
+    mapping = ACTION_MAPS[s]
+    return [mapping[action] for action in actions]
+
+
+def canonical(facelets):
+    """ pick the representative of a cube's class under the 48 symmetries and color relabeling
+
+    the cube is relabeled once, each copy is then recolored with RECOLOR[s]. only the copies
+    whose first PREFIX stickers are the smallest are built in full, usually just one
+
+    :param facelets: flat facelet vector of the cube
+    :return: (representative facelets, symmetry s), representative == relabel(apply_symmetry(facelets, s)).
+        a solution of the representative solves the cube once mapped with map_actions(solution, INVERSE_SYMMETRY[s])
+        if several symmetries give the representative, s is the smallest of them
+    """
+    facelets = relabel(bytes(facelets))
+    best = None
+    candidates = []
+    for s, prefix, gather, recolor in _SYMMETRIES:
+        start = bytes(prefix(facelets)).translate(recolor)
+        if best is None or start < best:
+            best = start
+            candidates = [(s, gather, recolor)]
+        elif start == best:
+            candidates.append((s, gather, recolor))
+    return min((bytes(gather(facelets)).translate(recolor), s) for s, gather, recolor in candidates)
+
+
+def _piece_tables(stickers, n_pieces, n_orientations):
+    """ follow every piece at every position and orientation through every symmetry
+
+    :param stickers: CORNER_FACELETS or EDGE_FACELETS
+    :param n_pieces: N_CORNERS or N_EDGES
+    :param n_orientations: 3 for corners, 2 for edges
+    :return: tuple of one tuple per symmetry, table[(position * n_pieces + piece) * n_orientations + ori]
+        is (position, piece, ori) in the symmetric copy
+    """
+    sticker_position = {i: position for position, group in enumerate(stickers) for i in group}
+    cube = CubieCube()
+    pieces, orientations = ("cp", "co") if n_orientations == 3 else ("ep", "eo")
+    tables = []
+    for perm in SYMMETRY_PERMUTATIONS:
+        inverse = invert_permutation(perm)
+        table = []
+        for position in range(n_pieces):
+            moved = sticker_position[inverse[stickers[position][0]]]
+            for piece in range(n_pieces):
+                for ori in range(n_orientations):
+                    # the other positions only need to be valid pieces, they are not read
+                    placed = list(range(n_pieces))
+                    placed[position], placed[piece] = piece, position
+                    setattr(cube, pieces, placed)
+                    setattr(cube, orientations, [ori] * n_pieces)
+                    copy = CubieCube.from_facelets(relabel(bytes(itemgetter(*perm)(cube.to_facelets()))))
+                    table.append((moved, getattr(copy, pieces)[moved], getattr(copy, orientations)[moved]))
+        tables.append(tuple(table))
+    return tuple(tables)
+
+
+_piece_symmetries = []
+
+
+def piece_symmetries():
+    """ :return: (corner tables, edge tables) of _piece_tables, built on first use
+    """
+    if not _piece_symmetries:
+        _piece_symmetries.append(_piece_tables(CORNER_FACELETS, N_CORNERS, 3))
+        _piece_symmetries.append(_piece_tables(EDGE_FACELETS, N_EDGES, 2))
+    return _piece_symmetries
+
+
+def conjugate_corners(cube, s):
+    """ :return: (cp, co) of the symmetric copy s of a CubieCube
+    """
+    table = piece_symmetries()[0][s]
+    cp = [0] * N_CORNERS
+    co = [0] * N_CORNERS
+    for position, (piece, ori) in enumerate(zip(cube.cp, cube.co)):
+        moved, cp_moved, co_moved = table[(position * N_CORNERS + piece) * 3 + ori]
+        cp[moved] = cp_moved
+        co[moved] = co_moved
+    return cp, co
+
+
+def conjugate_edges(cube, s):
+    """ :return: (ep, eo) of the symmetric copy s of a CubieCube
+    """
+    table = piece_symmetries()[1][s]
+    ep = [0] * N_EDGES
+    eo = [0] * N_EDGES
+    for position, (piece, ori) in enumerate(zip(cube.ep, cube.eo)):
+        moved, ep_moved, eo_moved = table[(position * N_EDGES + piece) * 2 + ori]
+        ep[moved] = ep_moved
+        eo[moved] = eo_moved
+    return ep, eo
+
+
+def conjugate_cubie(cube, s):
+    """ the cubie level apply_symmetry, with the colors relabeled
+
+    :return: CubieCube of the symmetric copy s, equal to
+        CubieCube.from_facelets(relabel(apply_symmetry(cube.to_facelets(), s)))
+    """
+    return CubieCube(*conjugate_corners(cube, s), *conjugate_edges(cube, s))
+
+
+def _build_conjugate_table(n, getter, setter, conjugate, symmetries):
+    table = array('H', [0]) * (n * len(symmetries))
+    cube = CubieCube()
+    copy = CubieCube()
+    fields = ("cp", "co") if conjugate is conjugate_corners else ("ep", "eo")
+    for i in range(n):
+        setter(cube, i)
+        for k, s in enumerate(symmetries):
+            for field, value in zip(fields, conjugate(cube, s)):
+                setattr(copy, field, value)
+            table[k * n + i] = getter(copy)
+    return table
+
+
+_CONJUGATE_TABLE_SPECS = {
+    "twist": (N_TWIST, CubieCube.get_twist, CubieCube.set_twist, conjugate_corners, UD_SYMMETRIES),
+    "flip": (N_FLIP, CubieCube.get_flip, CubieCube.set_flip, conjugate_edges, UD_FB_SYMMETRIES),
+    "slice": (N_SLICE, CubieCube.get_slice, CubieCube.set_slice, conjugate_edges, UD_SYMMETRIES),
+    "corners": (N_CORNERS_PERM, CubieCube.get_corners, CubieCube.set_corners, conjugate_corners,
+                tuple(range(N_SYMMETRIES))),
+}
+_conjugate_tables = {}
+
+
+def conjugate_symmetries(name):
+    """ :return: the symmetries a coordinate's conjugate table covers, in table order
+    """
+    return _CONJUGATE_TABLE_SPECS[name][4]
+
+
+def conjugate_table(name):
+    """ get the conjugation table of a coordinate, loaded from disk or built on first use
+
+    table[k * n + coord] is the coordinate of the symmetric copy conjugate_symmetries(name)[k]
+    of any cube with that coordinate, n the number of coordinate values. moving the cube by
+    FACE_MOVES[m] moves its copy s by FACE_MOVES[MOVE_MAPS[s][m]]
+
+    :param name: one of twist, flip, slice (UD-slice edge positions), corners
+    :return: array of unsigned shorts
+    """
+    if name not in _conjugate_tables:
+        spec = _CONJUGATE_TABLE_SPECS[name]
+        _conjugate_tables[name] = load_array("sym_%s_v1.arr" % name, 'H', spec[0] * len(spec[4]),
+                                             lambda: _build_conjugate_table(*spec))
+    return _conjugate_tables[name]
@@ -0,0 +1,154 @@
+"""
+tables.py
+Module for precomputed tables that are built once and cached on disk
+
+Tables live in the directory named by the CUBESOLVER_TABLES environment variable,
+or ~/.cache/cubesolver by default. Distance tables are stored nibble packed (two
+4 bit entries per byte) and memory-mapped when loaded, so opening them is cheap
+and the pages are shared between processes.
+"""
+from array import array
+import mmap
+import os
+
+UNKNOWN = 0xF  # nibble value of an entry that has not been reached yet
+
+
+def table_dir():
+    """ :return: the directory holding cached tables, created if needed
+    """
+    path = os.environ.get("CUBESOLVER_TABLES") or os.path.join(os.path.expanduser("~"), ".cache", "cubesolver")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def table_path(name):
+    """ :return: the path of a cached table file
+    """
+    return os.path.join(table_dir(), name)
+
+
+def write_atomic(path, data):
+    """ write a file so that readers never see a partially written table
+    """
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class NibbleTable:
+    """ table of 4 bit values (0-15), two entries per byte
+
+    entry i is the low nibble of byte i // 2 when i is even and the high nibble when odd
+    """
+
+    def __init__(self, size, data=None):
+        self.size = size
+        if data is None:
+            data = bytearray([UNKNOWN * 0x11]) * ((size + 1) // 2)
+        self.data = data
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, i):
+        return (self.data[i >> 1] >> ((i & 1) << 2)) & 0xF
+
+    def __setitem__(self, i, value):
+        shift = (i & 1) << 2
+        byte = i >> 1
+        self.data[byte] = (self.data[byte] & (0xF0 >> shift)) | (value << shift)
+
+    @classmethod
+    def from_bytes(cls, values):
+        """ pack a sequence of one value per byte into a NibbleTable
+
+        :param values: bytes or bytearray of values 0-15
+        :return: a NibbleTable holding the same values
+        """
+        size = len(values)
+        if size % 2:
+            values = bytes(values) + bytes([UNKNOWN])
+        low = bytes(values[0::2])
+        high = bytes(values[1::2]).translate(bytes((v << 4) & 0xFF for v in range(256)))
+        # or the two halves together as big integers, which runs in C
+        packed = int.from_bytes(low, 'little') | int.from_bytes(high, 'little')
+        return cls(size, bytearray(packed.to_bytes(len(low), 'little')))
+
+    def unpack(self):
+        """ expand the table to one value per byte, which is faster to index in hot loops
+
+        :return: bytearray of len(self) values
+        """
+        data = bytes(self.data)
+        values = bytearray(len(data) * 2)
+        values[0::2] = data.translate(bytes(v & 0xF for v in range(256)))
+        values[1::2] = data.translate(bytes(v >> 4 for v in range(256)))
+        return values[:self.size]
+
+    def save(self, path):
+        write_atomic(path, bytes(self.data))
+
+    @classmethod
+    def load(cls, path, size):
+        """ memory-map a saved table read only
+
+        :param path: file written by save
+        :param size: number of entries, used to validate the file
+        :return: a NibbleTable backed by the mapped file
+        :raises ValueError: if the file does not have the expected size
+        """
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size != (size + 1) // 2:
+                raise ValueError("%s does not hold a table of %d entries" % (path, size))
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(size, data)
+
+
+def load_nibble_table(name, size, build):
+    """ load a cached nibble table, building and saving it first if needed
+
+    :param name: file name of the table in table_dir()
+    :param size: number of entries
+    :param build: function returning a NibbleTable, called when there is no valid cached file
+    :return: a NibbleTable
+    """
+    path = table_path(name)
+    try:
+        return NibbleTable.load(path, size)
+    except (OSError, ValueError):
+        pass
+    table = build()
+    try:
+        table.save(path)
+    except OSError:  # read only cache directory, keep the table in memory
+        return table
+    return NibbleTable.load(path, size)
+
+
+def load_array(name, typecode, size, build):
+    """ load a cached array, building and saving it first if needed
+
+    :param name: file name of the table in table_dir()
+    :param typecode: array typecode, such as 'H'
+    :param size: number of items, used to validate the file
+    :param build: function returning the array, called when there is no valid cached file
+    :return: an array
+    """
+    path = table_path(name)
+    table = array(typecode)
+    try:
+        with open(path, 'rb') as f:
+            table.fromfile(f, size)
+            if f.read(1):
+                raise ValueError("%s is larger than expected" % path)
+        return table
+    except (OSError, EOFError, ValueError):
+        pass
+    table = build()
+    try:
+        write_atomic(path, table.tobytes())
+    except OSError:
+        pass
+    return table
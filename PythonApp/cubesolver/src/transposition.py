@@ -0,0 +1,115 @@
+"""
+transposition.py
+Module for the transposition table used by the IDA* searches
+
+IDA* only remembers the current path, so a state reached through different move
+orders is expanded again and again, and again on every bound iteration. The table
+remembers, per state key (see Cube.key), the smallest g it was reached with during
+the current iteration and the best lower bound on its distance to the goal learned
+so far. The searches use it to skip repeated states and to prune with the learned
+bound instead of the plain heuristic. The learned bounds only hold for one goal, so
+use a new table (or clear it) for every search.
+
+The number of entries is capped. When the table is full an entry is replaced either
+by least recently used order ("lru") or by keeping the entry closest to the root,
+which guards the largest subtree ("depth", a fixed size hash table).
+"""
+from collections import OrderedDict
+
+POLICIES = ("lru", "depth")
+
+
+class TranspositionTable:
+    """ bounded map of state key -> (g, h, bound), see the module docstring
+
+    an entry takes roughly 200 bytes with a 54 byte key, so the default of 2^20 entries
+    is about 200 MiB at most
+    """
+
+    def __init__(self, max_entries=1 << 20, policy="lru"):
+        """
+        :param max_entries: maximum number of states remembered
+        :param policy: replacement policy when full, "lru" or "depth"
+        :raises ValueError: for an unknown policy or a non positive size
+        """
+        if policy not in POLICIES:
+            raise ValueError("policy must be one of %s, not %r" % (", ".join(POLICIES), policy))
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.clear()
+
+    def clear(self):
+        """ forget every entry, the counters are kept
+        """
+        if self.policy == "lru":
+            self.entries = OrderedDict()
+        else:
+            self.entries = [None] * self.max_entries
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def lookup(self, key):
+        """ find a state
+
+        :param key: state key
+        :return: (g, h, bound) stored for the state, None if it is not in the table
+        """
+        if self.policy == "lru":
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+        else:
+            slot = self.entries[hash(key) % self.max_entries]
+            entry = slot[1] if slot is not None and slot[0] == key else None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def store(self, key, g, h, bound):
+        """ remember a state after its subtree was searched
+
+        :param key: state key
+        :param g: cost from the root the state was searched with
+        :param h: lower bound on the cost from the state to the goal
+        :param bound: the IDA* bound of the iteration that searched it
+        """
+        self.stores += 1
+        entry = (g, h, bound)
+        if self.policy == "lru":
+            if key not in self.entries:
+                if self.size == self.max_entries:
+                    self.entries.popitem(last=False)
+                    self.evictions += 1
+                else:
+                    self.size += 1
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            return
+
+        index = hash(key) % self.max_entries
+        slot = self.entries[index]
+        if slot is None:
+            self.size += 1
+        elif slot[0] != key:
+            # keep the entry nearer the root, its subtree is the more expensive one to redo
+            if slot[1][2] == bound and slot[1][0] < g:
+                return
+            self.evictions += 1
+        self.entries[index] = (key, entry)
+
+    def stats(self):
+        """ :return: dict of the counters and the current size
+        """
+        lookups = self.hits + self.misses
+        return {"size": self.size, "hits": self.hits, "misses": self.misses, "stores": self.stores,
+                "evictions": self.evictions, "hit rate": self.hits / lookups if lookups else 0.0}